@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文本处理性能基准：比较单次遍历的process_text与逐步处理流程（清洗、分词、去停用词、词干提取）
+
+用法: python benchmark_text_processing.py [数据文件] [重复次数]
+"""
+
+import sys
+import os
+import json
+import time
+sys.path.append('src')
+
+from src.preprocessing.text_processor import TextProcessor
+
+
+def load_texts(data_file: str):
+    """读取文章的标题、内容和摘要"""
+    with open(data_file, 'r', encoding='utf-8') as f:
+        articles = json.load(f)
+    return [article.get(field) or '' for article in articles for field in ('title', 'content', 'summary')]
+
+
+def staged_process_text(text_processor: TextProcessor, text: str):
+    """逐步处理流程：每一步都构建完整的中间列表"""
+    tokens = text_processor.tokenize(text_processor.clean_text(text))
+    return text_processor.stem_words(text_processor.remove_stopwords(tokens))
+
+
+def time_runs(function, texts, repeats: int) -> float:
+    """重复处理所有文本，返回最快一次的耗时（秒）"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for text in texts:
+            function(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_benchmark(data_file: str = 'data/npr_articles.json', repeats: int = 5) -> None:
+    """对每种分词器分别比较两种流程的耗时，并确认结果一致"""
+    texts = load_texts(data_file)
+    print(f"数据文件: {data_file}，文本段数: {len(texts)}，重复次数: {repeats}")
+    
+    for tokenizer in TextProcessor.TOKENIZERS:
+        text_processor = TextProcessor(tokenizer=tokenizer)
+        
+        # 像构建索引一样预热词干缓存，只比较清洗、分词和过滤的耗时
+        for text in texts:
+            text_processor.process_text_ids(text)
+        for text in texts:
+            if text_processor.process_text(text) != staged_process_text(text_processor, text):
+                print(f"❌ {tokenizer}: 处理结果不一致: {text[:50]!r}")
+                return
+        
+        staged_time = time_runs(lambda text: staged_process_text(text_processor, text), texts, repeats)
+        fused_time = time_runs(text_processor.process_text, texts, repeats)
+        print(f"{tokenizer:>10} (实际: {text_processor.get_active_tokenizer()}): "
+              f"逐步处理 {staged_time * 1000:.1f}ms, process_text {fused_time * 1000:.1f}ms, "
+              f"加速 {staged_time / fused_time:.2f}x")
+
+
+if __name__ == "__main__":
+    data_file = sys.argv[1] if len(sys.argv) > 1 else 'data/npr_articles.json'
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    run_benchmark(data_file, repeats)
@@ -8,9 +8,10 @@ import sys
 import os
 sys.path.append('src')
 
-from src.retrieval.search_engine import EnhancedSearchEngine
 import argparse
+import datetime
 import json
+import time
 
 def load_config(config_file: str = None) -> dict:
     """加载配置文件"""
@@ -25,7 +26,17 @@ def load_config(config_file: str = None) -> dict:
         'summary_weight': 2.0,
         'content_weight': 1.0,
         'bm25_k1': 1.5,
-        'bm25_b': 0.75
+        'bm25_b': 0.75,
+        'compress_postings': False,
+        'use_positions': False,
+        'use_bm25f': False,
+        'bm25f_k1': 1.2,
+        'bm25f_field_weights': {'title': 3.0, 'summary': 2.0, 'content': 1.0},
+        'bm25f_field_b': {'title': 0.75, 'summary': 0.75, 'content': 0.75},
+        'num_workers': 1,
+        'tokenizer': 'auto',
+        'use_index_snapshot': True,
+        'snapshot_dir': 'data/index_cache'
     }
     
     if config_file and os.path.exists(config_file):
@@ -39,6 +50,96 @@ def load_config(config_file: str = None) -> dict:
     
     return default_config
 
+def create_search_engine(data_file: str, config: dict):
+    """创建增强搜索引擎。检索模块（NLTK、numpy等）在这里才导入，--help等命令无需加载"""
+    from src.retrieval.search_engine import EnhancedSearchEngine
+    return EnhancedSearchEngine(data_file, config)
+
+class ImportTimeProfiler:
+    """导入耗时统计：记录每个模块执行的自身耗时和累计耗时，格式与 python -X importtime 相同"""
+    
+    def __init__(self):
+        self.records = []  # (模块名, 自身耗时us, 累计耗时us, 嵌套深度)，按导入完成顺序
+        self._child_times = []  # 正在导入的模块栈，记录各自子模块的累计耗时
+    
+    def find_spec(self, fullname, path, target=None):
+        """元路径查找器接口：委托给其余查找器，并为找到的加载器计时"""
+        for finder in sys.meta_path:
+            find_spec = getattr(finder, 'find_spec', None)
+            if finder is self or find_spec is None:
+                continue
+            spec = find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        
+        # 内置和冻结模块的加载器是类本身，不计时
+        loader = spec.loader
+        if loader is not None and not isinstance(loader, type) and hasattr(loader, 'exec_module'):
+            loader.exec_module = self._timed(fullname, loader.exec_module)
+        return spec
+    
+    def _timed(self, fullname, exec_module):
+        """包装加载器的exec_module，统计模块代码的执行耗时"""
+        def exec_module_timed(module):
+            depth = len(self._child_times)
+            self._child_times.append(0.0)
+            start = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                cumulative = (time.perf_counter() - start) * 1e6
+                children = self._child_times.pop()
+                if self._child_times:
+                    self._child_times[-1] += cumulative
+                self.records.append((fullname, cumulative - children, cumulative, depth))
+        return exec_module_timed
+    
+    def install(self):
+        sys.meta_path.insert(0, self)
+    
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+    
+    def print_report(self, min_cumulative_ms: float = 1.0):
+        """打印累计耗时不少于min_cumulative_ms的模块"""
+        print("import time: self [us] | cumulative | imported package")
+        for name, self_us, cumulative_us, depth in self.records:
+            if cumulative_us >= min_cumulative_ms * 1000:
+                print(f"import time: {self_us:9.0f} | {cumulative_us:10.0f} | {'  ' * depth}{name}")
+        total = sum(record[2] for record in self.records if record[3] == 0)
+        print(f"共导入 {len(self.records)} 个模块，累计 {total / 1000:.1f} ms"
+              f"（只列出累计耗时不少于 {min_cumulative_ms:g} ms 的模块）")
+
+def profile_startup(config_file: str = None, rebuild_index: bool = False):
+    """测量启动耗时：导入检索模块和初始化搜索引擎，打印导入耗时明细和各阶段耗时"""
+    data_file = "data/npr_articles.json"
+    if not os.path.exists(data_file):
+        print(f"❌ 错误：数据文件不存在 - {data_file}")
+        return
+    
+    profiler = ImportTimeProfiler()
+    profiler.install()
+    try:
+        start = time.perf_counter()
+        config = load_config(config_file)
+        search_engine = create_search_engine(data_file, config)
+        created = time.perf_counter()
+        initialized = search_engine.initialize(rebuild_index=rebuild_index)
+        finished = time.perf_counter()
+    finally:
+        profiler.uninstall()
+    
+    print(f"\n{'='*60}")
+    print("⏱️ 启动耗时分析")
+    print(f"{'='*60}")
+    profiler.print_report()
+    print(f"\n导入模块并创建搜索引擎: {(created - start) * 1000:.1f} ms")
+    print(f"初始化搜索引擎: {(finished - created) * 1000:.1f} ms" + ("" if initialized else "（失败）"))
+    print(f"总计（不含解释器启动）: {(finished - start) * 1000:.1f} ms")
+
 def print_welcome():
     """打印欢迎信息"""
     print("🚀" + "=" * 78 + "🚀")
@@ -51,7 +152,7 @@ def print_welcome():
     print("   • 智能融合 - 多维度综合评分")
     print("🚀" + "=" * 78 + "🚀")
 
-def main():
+def main(config_file: str = None, rebuild_index: bool = False):
     """主函数"""
     print_welcome()
     
@@ -65,14 +166,14 @@ def main():
         return
     
     # 加载配置
-    config = load_config()
+    config = load_config(config_file)
     
     # 创建增强搜索引擎
-    search_engine = EnhancedSearchEngine(data_file, config)
+    search_engine = create_search_engine(data_file, config)
     
     # 初始化搜索引擎
     print("\n🔧 正在初始化增强搜索引擎，请稍候...")
-    if not search_engine.initialize():
+    if not search_engine.initialize(rebuild_index=rebuild_index):
         print("❌ 搜索引擎初始化失败")
         return
     
@@ -81,7 +182,7 @@ def main():
     # 启动交互式搜索
     search_engine.interactive_search()
 
-def demo_search():
+def demo_search(config_file: str = None, rebuild_index: bool = False):
     """演示搜索功能"""
     print_welcome()
     print("\n🎯 演示模式：预设查询测试")
@@ -94,12 +195,12 @@ def demo_search():
         return
     
     # 加载配置
-    config = load_config()
+    config = load_config(config_file)
     
     # 创建和初始化搜索引擎
-    search_engine = EnhancedSearchEngine(data_file, config)
+    search_engine = create_search_engine(data_file, config)
     
-    if not search_engine.initialize():
+    if not search_engine.initialize(rebuild_index=rebuild_index):
         print("❌ 搜索引擎初始化失败")
         return
     
@@ -170,7 +271,7 @@ def demo_search():
     
     print("\n🎯 演示完成！")
 
-def benchmark_algorithms():
+def benchmark_algorithms(config_file: str = None, rebuild_index: bool = False):
     """算法性能基准测试"""
     print_welcome()
     print("\n🏁 算法性能基准测试")
@@ -183,12 +284,12 @@ def benchmark_algorithms():
         return
     
     # 加载配置
-    config = load_config()
+    config = load_config(config_file)
     
     # 创建搜索引擎
-    search_engine = EnhancedSearchEngine(data_file, config)
+    search_engine = create_search_engine(data_file, config)
     
-    if not search_engine.initialize():
+    if not search_engine.initialize(rebuild_index=rebuild_index):
         print("❌ 搜索引擎初始化失败")
         return
     
@@ -215,7 +316,6 @@ def benchmark_algorithms():
         print(f"\n测试查询 {i+1}/{len(benchmark_queries)}: '{query}'")
         
         for algorithm in algorithms:
-            import time
             start_time = time.time()
             
             results = search_engine.search(query, top_k=10, algorithm=algorithm)
@@ -258,7 +358,17 @@ def create_sample_config():
         "summary_weight": 2.0,
         "content_weight": 1.0,
         "bm25_k1": 1.5,
-        "bm25_b": 0.75
+        "bm25_b": 0.75,
+        "compress_postings": False,
+        "use_positions": False,
+        "use_bm25f": False,
+        "bm25f_k1": 1.2,
+        "bm25f_field_weights": {"title": 3.0, "summary": 2.0, "content": 1.0},
+        "bm25f_field_b": {"title": 0.75, "summary": 0.75, "content": 0.75},
+        "num_workers": 1,
+        "tokenizer": "auto",
+        "use_index_snapshot": True,
+        "snapshot_dir": "data/index_cache"
     }
     
     config_file = "config_sample.json"
@@ -281,8 +391,11 @@ if __name__ == "__main__":
   python main.py --demo                    # 运行演示模式
   python main.py --benchmark               # 运行性能基准测试
   python main.py --query "climate change" # 单次查询
+  python main.py --query "tariffs" --last-days 30   # 只搜索最近30天的文章
   python main.py --config config.json     # 使用自定义配置
   python main.py --create-config          # 创建示例配置文件
+  python main.py --rebuild-index          # 忽略索引快照重新构建索引
+  python main.py --startup-profile        # 分析启动耗时
                                    """)
     
     parser.add_argument("--demo", action="store_true", help="运行演示模式")
@@ -292,7 +405,13 @@ if __name__ == "__main__":
                        default="enhanced", help="指定搜索算法")
     parser.add_argument("--config", type=str, help="指定配置文件路径")
     parser.add_argument("--top-k", type=int, default=10, help="返回结果数量")
+    parser.add_argument("--since", type=str, help="只搜索此日期之后发布的文章，如 2025-06-01")
+    parser.add_argument("--until", type=str, help="只搜索此日期之前发布的文章（含当天）")
+    parser.add_argument("--last-days", type=int, help="只搜索最近N天发布的文章")
     parser.add_argument("--create-config", action="store_true", help="创建示例配置文件")
+    parser.add_argument("--rebuild-index", action="store_true", help="忽略索引快照，重新构建索引")
+    parser.add_argument("--startup-profile", action="store_true",
+                       help="打印启动耗时明细（各模块导入耗时和初始化耗时）后退出")
     
     args = parser.parse_args()
     
@@ -300,11 +419,14 @@ if __name__ == "__main__":
         if args.create_config:
             create_sample_config()
             
+        elif args.startup_profile:
+            profile_startup(args.config, args.rebuild_index)
+            
         elif args.benchmark:
-            benchmark_algorithms()
+            benchmark_algorithms(args.config, args.rebuild_index)
             
         elif args.demo:
-            demo_search()
+            demo_search(args.config, args.rebuild_index)
             
         elif args.query:
             # 单次查询模式
@@ -314,11 +436,13 @@ if __name__ == "__main__":
                 sys.exit(1)
             
             config = load_config(args.config)
-            search_engine = EnhancedSearchEngine(data_file, config)
+            search_engine = create_search_engine(data_file, config)
             
-            if search_engine.initialize():
+            if search_engine.initialize(rebuild_index=args.rebuild_index):
                 print(f"\n🔍 执行查询: '{args.query}' (算法: {args.algorithm})")
-                results = search_engine.search(args.query, top_k=args.top_k, algorithm=args.algorithm)
+                since = datetime.timedelta(days=args.last_days) if args.last_days else args.since
+                results = search_engine.search(args.query, top_k=args.top_k, algorithm=args.algorithm,
+                                               since=since, until=args.until)
                 search_engine.display_results(results, show_snippet=True, show_scores=True)
                 
                 # 显示搜索统计
@@ -334,7 +458,7 @@ if __name__ == "__main__":
                 print("❌ 搜索引擎初始化失败")
         else:
             # 默认交互模式
-            main()
+            main(args.config, args.rebuild_index)
     
     except KeyboardInterrupt:
         print("\n\n👋 程序被用户中断，再见！")
@@ -0,0 +1,108 @@
+import datetime
+from typing import List, Dict, Any, Union
+import numpy as np
+
+DateBound = Union[None, str, datetime.date, datetime.datetime, datetime.timedelta]
+
+
+class DateIndex:
+    """
+    日期索引：按发布时间排序的文档ID排列，用于按时间范围过滤搜索
+    
+    有日期的文档按发布时间升序排列（同一时间按文档ID），时间范围查询用两次二分查找
+    定位区间，直接得到范围内的文档ID，无需遍历全部文档。没有日期的文档不在任何时间范围内。
+    时间按发布地的本地时间比较（忽略时区），与时间新鲜度评分一致。
+    """
+    
+    def __init__(self):
+        self.document_count = 0
+        self.doc_ids_by_date = np.zeros(0, dtype=np.int32)  # 按发布时间升序排列的文档ID
+        self.sorted_dates = np.zeros(0, dtype='datetime64[us]')  # 与doc_ids_by_date对应的发布时间
+    
+    def build(self, document_dates: List[datetime.datetime]) -> None:
+        """根据每个文档解析后的发布时间（无日期为None）构建日期索引"""
+        self.document_count = len(document_dates)
+        doc_ids = [doc_id for doc_id, date in enumerate(document_dates) if date is not None]
+        dates = np.array([document_dates[doc_id].replace(tzinfo=None) for doc_id in doc_ids], dtype='datetime64[us]')
+        
+        order = np.argsort(dates, kind='stable')
+        self.doc_ids_by_date = np.array(doc_ids, dtype=np.int32)[order]
+        self.sorted_dates = dates[order]
+        print(f"日期索引构建完成，有日期的文档: {len(self.doc_ids_by_date)}/{self.document_count}")
+    
+    def get_doc_ids(self, since: DateBound = None, until: DateBound = None,
+                    now: datetime.datetime = None) -> np.ndarray:
+        """
+        获取发布时间在 [since, until] 范围内的文档ID（按发布时间升序）
+        
+        Args:
+            since: 起始时间（含），可以是datetime、date、ISO-8601字符串，或timedelta（表示当前时间之前多久）
+            until: 结束时间（含），为date或只有日期的字符串时包含当天全天
+            now: timedelta边界相对的当前时间，默认为系统时间（搜索时传入时间新鲜度评分使用的当前日期）
+        """
+        start, end = 0, len(self.sorted_dates)
+        if since is not None:
+            start = int(np.searchsorted(self.sorted_dates, self._to_datetime64(since, now=now), side='left'))
+        if until is not None:
+            end = int(np.searchsorted(self.sorted_dates, self._to_datetime64(until, end_of_day=True, now=now),
+                                      side='right'))
+        return self.doc_ids_by_date[start:max(start, end)]
+    
+    def get_sorted_doc_ids(self, since: DateBound = None, until: DateBound = None,
+                           now: datetime.datetime = None) -> np.ndarray:
+        """获取发布时间在 [since, until] 范围内的文档ID（按文档ID升序，可与倒排列表二分求交集）"""
+        return np.sort(self.get_doc_ids(since, until, now))
+    
+    @staticmethod
+    def _to_datetime64(value: DateBound, end_of_day: bool = False, now: datetime.datetime = None) -> np.datetime64:
+        """将时间边界转换为datetime64；只有日期时，结束边界取当天最后一刻；timedelta相对now（默认系统时间）"""
+        if isinstance(value, datetime.timedelta):
+            value = (now if now is not None else datetime.datetime.now()) - value
+        elif isinstance(value, str):
+            text = value.strip()
+            try:
+                value = datetime.date.fromisoformat(text) if len(text) == 10 else datetime.datetime.fromisoformat(text)
+            except ValueError:
+                raise ValueError(f"无法解析的时间范围: {value}，请使用ISO-8601格式，如 2025-06-01")
+        
+        if isinstance(value, datetime.datetime):
+            return np.datetime64(value.replace(tzinfo=None), 'us')
+        if isinstance(value, datetime.date):
+            day = np.datetime64(value, 'D')
+            if end_of_day:
+                return (day + np.timedelta64(1, 'D')).astype('datetime64[us]') - np.timedelta64(1, 'us')
+            return day.astype('datetime64[us]')
+        raise ValueError(f"不支持的时间范围类型: {type(value).__name__}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取日期索引统计信息"""
+        stats = {
+            "文档数": self.document_count,
+            "有日期的文档数": len(self.doc_ids_by_date)
+        }
+        if len(self.sorted_dates):
+            stats["最早日期"] = str(self.sorted_dates[0].astype('datetime64[D]'))
+            stats["最新日期"] = str(self.sorted_dates[-1].astype('datetime64[D]'))
+        return stats
+
+
+# 测试代码
+if __name__ == "__main__":
+    print("=== 日期索引测试 ===")
+    
+    document_dates = [
+        datetime.datetime(2025, 6, 3),
+        datetime.datetime(2025, 5, 15, 8, 30),
+        None,
+        datetime.datetime(2025, 6, 1, 23, 59),
+        datetime.datetime(2024, 12, 1),
+    ]
+    
+    date_index = DateIndex()
+    date_index.build(document_dates)
+    for key, value in date_index.get_stats().items():
+        print(f"{key}: {value}")
+    
+    for since, until in [("2025-06-01", None), (None, "2025-06-01"), ("2025-05-01", "2025-05-31"),
+                         (datetime.timedelta(days=30), None)]:
+        print(f"\n范围 [{since}, {until}]: {date_index.get_doc_ids(since, until).tolist()}")
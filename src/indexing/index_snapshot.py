@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import pickle
+import hashlib
+from typing import Dict, Any, Optional
+
+
+class IndexSnapshot:
+    """索引快照：将处理后的文档和构建好的模型持久化到磁盘，加速系统启动"""
+    
+    # 快照格式版本：文档或模型的存储结构变化时递增，旧快照会被自动重建
+    SNAPSHOT_VERSION = 10
+    SNAPSHOT_FORMAT = "npr-index-snapshot"
+    
+    def __init__(self, snapshot_dir: str = "data/index_cache"):
+        """
+        初始化索引快照管理器
+        
+        Args:
+            snapshot_dir: 快照文件存放目录
+        """
+        self.snapshot_dir = snapshot_dir
+    
+    def compute_key(self, data_file_path: str, config: Dict[str, Any]) -> str:
+        """根据数据文件内容、处理配置和快照版本计算快照键"""
+        hasher = hashlib.sha256()
+        hasher.update(f"{self.SNAPSHOT_FORMAT}:{self.SNAPSHOT_VERSION}".encode('utf-8'))
+        hasher.update(json.dumps(config, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+        
+        with open(data_file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                hasher.update(chunk)
+        
+        return hasher.hexdigest()
+    
+    def get_snapshot_path(self, key: str) -> str:
+        """获取快照键对应的文件路径"""
+        return os.path.join(self.snapshot_dir, f"snapshot_{key[:16]}.pkl")
+    
+    def load(self, data_file_path: str, config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        加载与数据文件和配置匹配的快照
+        
+        Returns:
+            快照内容字典；快照不存在、版本不符或已损坏时返回None
+        """
+        key = self.compute_key(data_file_path, config)
+        snapshot_path = self.get_snapshot_path(key)
+        
+        if not os.path.exists(snapshot_path):
+            print(f"未找到索引快照: {snapshot_path}")
+            return None
+        
+        start_time = time.time()
+        try:
+            with open(snapshot_path, 'rb') as f:
+                # 先读取文件头，版本或键不匹配时无需反序列化整个快照
+                header = pickle.load(f)
+                if (header.get('format') != self.SNAPSHOT_FORMAT or
+                        header.get('version') != self.SNAPSHOT_VERSION or
+                        header.get('key') != key):
+                    print(f"索引快照已过期（版本 {header.get('version')}），需要重建")
+                    return None
+                payload = pickle.load(f)
+        except Exception as e:
+            print(f"加载索引快照失败: {e}")
+            return None
+        
+        print(f"索引快照已加载: {snapshot_path} (耗时 {(time.time() - start_time) * 1000:.1f} 毫秒)")
+        return payload
+    
+    def save(self, data_file_path: str, config: Dict[str, Any], payload: Dict[str, Any]) -> bool:
+        """保存快照（先写临时文件再原子替换），并清理过期快照"""
+        key = self.compute_key(data_file_path, config)
+        snapshot_path = self.get_snapshot_path(key)
+        temp_path = snapshot_path + ".tmp"
+        
+        header = {
+            'format': self.SNAPSHOT_FORMAT,
+            'version': self.SNAPSHOT_VERSION,
+            'key': key,
+            'data_file': os.path.abspath(data_file_path),
+            'config': config,
+            'created_at': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+        
+        try:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            with open(temp_path, 'wb') as f:
+                pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, snapshot_path)
+        except Exception as e:
+            print(f"保存索引快照失败: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+        
+        self._remove_stale_snapshots(snapshot_path)
+        print(f"索引快照已保存: {snapshot_path}")
+        return True
+    
+    def _remove_stale_snapshots(self, current_path: str) -> None:
+        """删除目录中除当前快照外的其他快照文件"""
+        for filename in os.listdir(self.snapshot_dir):
+            path = os.path.join(self.snapshot_dir, filename)
+            if filename.startswith("snapshot_") and filename.endswith(".pkl") and path != current_path:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
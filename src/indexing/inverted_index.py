@@ -1,7 +1,14 @@
 from collections import defaultdict
-from typing import List, Dict, Set, Tuple
+from typing import List, Dict, Set, Tuple, Sequence
+import os
+import mmap
 import json
 import pickle
+import struct
+from array import array
+from bisect import bisect_left
+from itertools import chain
+import numpy as np
 
 class PostingList:
     """倒排列表：存储包含某个词汇的文档信息"""
@@ -27,63 +34,391 @@ class PostingList:
         return f"PostingList(df={self.document_frequency}, docs={self.documents})"
 
 
+def vbyte_encode(values) -> bytearray:
+    """变长字节编码：每字节低7位存数据，最高位为1表示后面还有字节"""
+    encoded = bytearray()
+    for value in values:
+        while value >= 0x80:
+            encoded.append((value & 0x7F) | 0x80)
+            value >>= 7
+        encoded.append(value)
+    return encoded
+
+
+def vbyte_decode(data) -> np.ndarray:
+    """变长字节解码（向量化），返回int64数组"""
+    codes = np.frombuffer(data, dtype=np.uint8)
+    if not len(codes) or codes.max() < 0x80:
+        # 所有值都小于128时每个字节就是一个值
+        return codes.astype(np.int64)
+    
+    ends = np.flatnonzero(codes < 0x80)
+    starts = np.empty(len(ends), dtype=np.int64)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    positions = np.arange(len(codes)) - np.repeat(starts, ends - starts + 1)
+    values = (codes & 0x7F).astype(np.int64) << (7 * positions)
+    return np.bitwise_or.reduceat(values, starts)
+
+
+class CompressedPostingList:
+    """
+    压缩倒排列表：文档ID按差值编码，与词频一起用变长字节存储
+    
+    数据布局: [所有文档ID差值][所有词频]，每128个倒排项为一块。
+    多于一块时记录每块的最大文档ID和字节偏移（跳表指针），
+    求交集时可以跳过整块而不必解码。
+    """
+    
+    BLOCK_SIZE = 128
+    __slots__ = ('data', 'document_frequency', 'tf_offset', 'skips')
+    
+    def __init__(self, data, document_frequency: int, tf_offset: int, skips=None):
+        """
+        Args:
+            data: 编码后的字节（bytes或memoryview）
+            document_frequency: 倒排项数
+            tf_offset: 词频部分在data中的起始位置
+            skips: 跳表指针 (每块最大文档ID, 每块文档ID字节偏移, 每块词频字节偏移)，只有一块时为None
+        """
+        self.data = data
+        self.document_frequency = document_frequency
+        self.tf_offset = tf_offset
+        self.skips = skips
+    
+    @classmethod
+    def encode(cls, documents: List[Tuple[int, int]]) -> 'CompressedPostingList':
+        """压缩编码[(doc_id, term_frequency), ...]"""
+        doc_bytes = bytearray()
+        tf_bytes = bytearray()
+        doc_offsets = array('I', [0])
+        tf_offsets = array('I', [0])
+        last_doc_ids = array('I')
+        previous_doc_id = 0
+        for start in range(0, len(documents), cls.BLOCK_SIZE):
+            block = documents[start:start + cls.BLOCK_SIZE]
+            gaps = []
+            for doc_id, _ in block:
+                gaps.append(doc_id - previous_doc_id)
+                previous_doc_id = doc_id
+            doc_bytes += vbyte_encode(gaps)
+            tf_bytes += vbyte_encode(tf for _, tf in block)
+            doc_offsets.append(len(doc_bytes))
+            tf_offsets.append(len(tf_bytes))
+            last_doc_ids.append(previous_doc_id)
+        
+        skips = (last_doc_ids, doc_offsets, tf_offsets) if len(last_doc_ids) > 1 else None
+        return cls(bytes(doc_bytes + tf_bytes), len(documents), len(doc_bytes), skips)
+    
+    def decode(self) -> Tuple[np.ndarray, np.ndarray]:
+        """解码全部倒排项，返回(文档ID数组, 词频数组)"""
+        data = memoryview(self.data)
+        doc_ids = np.cumsum(vbyte_decode(data[:self.tf_offset]))
+        term_frequencies = vbyte_decode(data[self.tf_offset:])
+        return doc_ids, term_frequencies
+    
+    @property
+    def documents(self) -> List[Tuple[int, int]]:
+        """[(doc_id, term_frequency), ...]"""
+        doc_ids, term_frequencies = self.decode()
+        return list(zip(doc_ids.tolist(), term_frequencies.tolist()))
+    
+    def get_documents(self) -> List[Tuple[int, int]]:
+        """获取包含该词汇的所有文档"""
+        return self.documents
+    
+    def get_document_ids(self) -> List[int]:
+        """获取包含该词汇的文档ID列表"""
+        return self.decode_document_ids().tolist()
+    
+    def get_block_count(self) -> int:
+        """获取块数"""
+        if self.skips is None:
+            return 1 if self.document_frequency else 0
+        return len(self.skips[0])
+    
+    def find_block(self, doc_id: int, start_block: int = 0) -> int:
+        """利用跳表指针查找可能包含doc_id的第一个块（块内最大文档ID >= doc_id）"""
+        if self.skips is None:
+            return start_block
+        return bisect_left(self.skips[0], doc_id, start_block)
+    
+    def get_block_document_ids(self, block: int) -> List[int]:
+        """只解码指定块的文档ID"""
+        return self.decode_document_ids([block]).tolist()
+    
+    def decode_document_ids(self, blocks: List[int] = None) -> np.ndarray:
+        """解码指定块（默认全部）的文档ID，返回升序数组"""
+        data = memoryview(self.data)
+        if self.skips is None or blocks is None:
+            return np.cumsum(vbyte_decode(data[:self.tf_offset]))
+        
+        last_doc_ids, doc_offsets, _ = self.skips
+        chunks = []
+        for block in blocks:
+            gaps = vbyte_decode(data[doc_offsets[block]:doc_offsets[block + 1]])
+            base = last_doc_ids[block - 1] if block > 0 else 0
+            chunks.append(np.cumsum(gaps) + base)
+        return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int64)
+    
+    def __str__(self):
+        return f"CompressedPostingList(df={self.document_frequency}, bytes={len(self.data)})"
+
+
+class MappedPostingList:
+    """内存映射的倒排列表：直接引用索引文件中的文档ID和词频数组，访问时才解码"""
+    
+    def __init__(self, doc_ids: np.ndarray, term_frequencies: np.ndarray):
+        self.doc_ids = doc_ids
+        self.term_frequencies = term_frequencies
+        self.document_frequency = len(doc_ids)
+    
+    @property
+    def documents(self) -> List[Tuple[int, int]]:
+        """[(doc_id, term_frequency), ...]"""
+        return list(zip(self.doc_ids.tolist(), self.term_frequencies.tolist()))
+    
+    def get_documents(self) -> List[Tuple[int, int]]:
+        """获取包含该词汇的所有文档"""
+        return self.documents
+    
+    def get_document_ids(self) -> List[int]:
+        """获取包含该词汇的文档ID列表"""
+        return self.doc_ids.tolist()
+    
+    def __str__(self):
+        return f"MappedPostingList(df={self.document_frequency})"
+
+
 class InvertedIndex:
     """倒排索引：核心数据结构，支持快速检索"""
     
-    def __init__(self):
+    # 二进制索引文件格式（独立格式：搜索引擎的索引快照保存全局词典数组，不使用该文件）
+    # 文件头: 魔数(8字节) 版本 文档数 词汇数 倒排项总数，随后为各数据段的偏移量
+    # 数据段: 词汇字节偏移(uint64, 词汇数+1) 词汇UTF-8字节串 倒排列表偏移(uint64, 词汇数+1)
+    #         文档ID数组(uint32) 词频数组(uint32) 文档长度数组(uint32)
+    # 词汇按字典序排列；每个数据段按8字节对齐
+    INDEX_MAGIC = b'NPRINDEX'
+    INDEX_VERSION = 1
+    HEADER_FORMAT = '<8sIIIQ6Q'
+    
+    # AND搜索中候选文档数 × GALLOP_RATIO 小于倒排列表长度时才使用倍增查找
+    GALLOP_RATIO = 32
+    
+    # 按字段构建位置索引时相邻字段之间的位置间隔，远大于任何短语长度和邻近距离，
+    # 短语和邻近查询不会跨越字段边界
+    FIELD_POSITION_GAP = 1 << 20
+    
+    def __init__(self, compress_postings: bool = False, store_positions: bool = False):
+        """
+        初始化倒排索引
+        
+        Args:
+            compress_postings: 是否以差值+变长字节编码压缩存储倒排列表
+            store_positions: 是否记录词汇在文档中的位置（用于短语和邻近查询）
+        """
+        self.compress_postings = compress_postings
+        self.store_positions = store_positions
         self.index = {}  # {term: PostingList}
         self.document_count = 0
         self.vocabulary = set()
         self.document_lengths = {}  # {doc_id: document_length}
+        
+        # 位置信息：每个词汇的所有位置按倒排列表顺序连续存放，
+        # 每篇文档的位置数等于词频，因此不需要另存偏移量
+        self.positions = {}  # {term: array('I')}
+        
+        # 压缩模式：所有倒排列表编码后连续存放在同一字节串中，避免每个词汇一个对象
+        self._compressed_terms = []  # 按字典序排列的词汇，下标即词汇序号（二分查找，不额外建字典）
+        self._compressed_data = b''
+        self._compressed_offsets = array('Q')  # 每个倒排列表在字节串中的起止位置
+        self._compressed_tf_offsets = array('I')  # 词频部分相对起始位置的偏移
+        self._compressed_frequencies = array('I')  # 文档频率
+        self._compressed_skips = {}  # {词汇序号: 跳表指针}，只记录多于一块的长倒排列表
+        
+        # 内存映射模式（load_index加载二进制索引后）
+        self._mapped_file = None
+        self._mapped_path = None
+        self._mapped_terms = {}  # {term: 词汇序号}
+        self._mapped_posting_offsets = None
+        self._mapped_doc_ids = None
+        self._mapped_term_frequencies = None
     
     def build_index(self, documents_tokens: List[List[str]]) -> None:
         """从文档词汇列表构建倒排索引"""
-        self.document_count = len(documents_tokens)
+        self.build_field_index([(tokens,) for tokens in documents_tokens])
+    
+    def build_field_index(self, documents_fields: List[Tuple[Sequence[str], ...]]) -> None:
+        """
+        从文档各字段的词汇列表构建倒排索引，词频按所有字段合计
+        
+        记录位置时每个字段的起始位置比上一字段末尾多FIELD_POSITION_GAP，
+        字段末尾的词与下一字段开头的词不会组成短语或邻近匹配。
+        
+        Args:
+            documents_fields: 每个文档的字段词汇列表元组，如 (标题词汇, 正文词汇, 摘要词汇)
+        """
+        self.close()
+        self.document_count = len(documents_fields)
         self.index = {}
+        self._compressed_terms = []
         self.vocabulary = set()
         self.document_lengths = {}
         
         print(f"开始构建倒排索引，共{self.document_count}个文档...")
         
-        for doc_id, tokens in enumerate(documents_tokens):
+        self.positions = {}
+        
+        for doc_id, fields in enumerate(documents_fields):
             # 记录文档长度
-            self.document_lengths[doc_id] = len(tokens)
-            
-            # 计算词频
-            term_freq = {}
-            for token in tokens:
-                term_freq[token] = term_freq.get(token, 0) + 1
-                self.vocabulary.add(token)
+            self.document_lengths[doc_id] = sum(len(tokens) for tokens in fields)
             
-            # 更新倒排索引
-            for term, freq in term_freq.items():
-                if term not in self.index:
-                    self.index[term] = PostingList()
-                self.index[term].add_document(doc_id, freq)
+            if self.store_positions:
+                self._add_document_positions(doc_id, fields)
+            else:
+                # 计算词频
+                term_freq = {}
+                for token in chain.from_iterable(fields):
+                    term_freq[token] = term_freq.get(token, 0) + 1
+                    self.vocabulary.add(token)
+                
+                # 更新倒排索引
+                for term, freq in term_freq.items():
+                    if term not in self.index:
+                        self.index[term] = PostingList()
+                    self.index[term].add_document(doc_id, freq)
             
             # 显示进度
             if (doc_id + 1) % 100 == 0:
                 print(f"已处理 {doc_id + 1}/{self.document_count} 个文档")
         
+        if self.compress_postings:
+            self._compress_index()
+        
         print(f"倒排索引构建完成！")
         print(f"词汇表大小: {len(self.vocabulary)}")
-        print(f"索引条目数: {len(self.index)}")
+        print(f"索引条目数: {len(self.get_terms())}")
+    
+    def build_from_postings(self, terms: List[str], indptr, doc_ids, term_frequencies,
+                            document_lengths: List[int]) -> None:
+        """
+        从按词汇排列的倒排数据（如TermDictionary的字段倒排）构建倒排索引，无需重新统计词频
+        
+        Args:
+            terms: 词汇列表
+            indptr: 第i个词汇的倒排列表为 doc_ids[indptr[i]:indptr[i + 1]]
+            doc_ids: 文档ID数组（每个倒排列表内递增）
+            term_frequencies: 与doc_ids对应的词频数组
+            document_lengths: 每个文档的长度
+        """
+        if self.store_positions:
+            raise ValueError("位置索引需要从文档词汇列表构建")
+        
+        self.close()
+        self.document_count = len(document_lengths)
+        self.index = {}
+        self._compressed_terms = []
+        self.positions = {}
+        self.vocabulary = set(terms)
+        self.document_lengths = dict(enumerate(document_lengths))
+        
+        doc_ids = doc_ids.tolist()
+        term_frequencies = term_frequencies.tolist()
+        indptr = indptr.tolist()
+        for term_number, term in enumerate(terms):
+            start, end = indptr[term_number], indptr[term_number + 1]
+            posting_list = PostingList()
+            posting_list.documents = list(zip(doc_ids[start:end], term_frequencies[start:end]))
+            posting_list.document_frequency = end - start
+            self.index[term] = posting_list
+        
+        if self.compress_postings:
+            self._compress_index()
+    
+    def _add_document_positions(self, doc_id: int, fields: Tuple[Sequence[str], ...]) -> None:
+        """记录文档中每个词汇的位置（字段之间相隔FIELD_POSITION_GAP），并以位置数作为词频更新倒排索引"""
+        term_positions = {}
+        field_start = 0
+        for tokens in fields:
+            for position, token in enumerate(tokens, field_start):
+                if token in term_positions:
+                    term_positions[token].append(position)
+                else:
+                    term_positions[token] = [position]
+                    self.vocabulary.add(token)
+            field_start += len(tokens) + self.FIELD_POSITION_GAP
+        
+        for term, positions in term_positions.items():
+            if term not in self.index:
+                self.index[term] = PostingList()
+                self.positions[term] = array('I')
+            self.index[term].add_document(doc_id, len(positions))
+            self.positions[term].extend(positions)
+    
+    def _compress_index(self) -> None:
+        """把self.index中的倒排列表压缩编码到连续的字节串中"""
+        data = bytearray()
+        self._compressed_terms = sorted(self.index)
+        self._compressed_offsets = array('Q', [0])
+        self._compressed_tf_offsets = array('I')
+        self._compressed_frequencies = array('I')
+        self._compressed_skips = {}
+        
+        for term_number, term in enumerate(self._compressed_terms):
+            compressed = CompressedPostingList.encode(self.index[term].get_documents())
+            data += compressed.data
+            self._compressed_offsets.append(len(data))
+            self._compressed_tf_offsets.append(compressed.tf_offset)
+            self._compressed_frequencies.append(compressed.document_frequency)
+            if compressed.skips is not None:
+                self._compressed_skips[term_number] = compressed.skips
+        
+        self._compressed_data = bytes(data)
+        self.index = {}
     
     def get_posting_list(self, term: str) -> PostingList:
         """获取词汇的倒排列表"""
+        if self._mapped_file is not None:
+            term_index = self._mapped_terms.get(term)
+            if term_index is None:
+                return PostingList()
+            start = int(self._mapped_posting_offsets[term_index])
+            end = int(self._mapped_posting_offsets[term_index + 1])
+            return MappedPostingList(self._mapped_doc_ids[start:end],
+                                     self._mapped_term_frequencies[start:end])
+        
+        if self._compressed_terms:
+            term_number = bisect_left(self._compressed_terms, term)
+            if term_number == len(self._compressed_terms) or self._compressed_terms[term_number] != term:
+                return PostingList()
+            start = self._compressed_offsets[term_number]
+            end = self._compressed_offsets[term_number + 1]
+            return CompressedPostingList(memoryview(self._compressed_data)[start:end],
+                                         self._compressed_frequencies[term_number],
+                                         self._compressed_tf_offsets[term_number],
+                                         self._compressed_skips.get(term_number))
+        
         return self.index.get(term, PostingList())
     
+    def get_terms(self) -> List[str]:
+        """获取索引中的所有词汇"""
+        if self._mapped_file is not None:
+            return list(self._mapped_terms)
+        if self._compressed_terms:
+            return list(self._compressed_terms)
+        return list(self.index)
+    
     def get_documents_containing_term(self, term: str) -> List[int]:
         """获取包含指定词汇的文档ID列表"""
         posting_list = self.get_posting_list(term)
         return posting_list.get_document_ids()
     
     def get_term_frequency_in_document(self, term: str, doc_id: int) -> int:
-        """获取词汇在指定文档中的频率"""
-        posting_list = self.get_posting_list(term)
-        for document_id, freq in posting_list.get_documents():
-            if document_id == doc_id:
-                return freq
+        """获取词汇在指定文档中的频率（倒排列表按文档ID有序，二分查找）"""
+        documents = self.get_posting_list(term).get_documents()
+        position = bisect_left(documents, (doc_id, 0))
+        if position < len(documents) and documents[position][0] == doc_id:
+            return documents[position][1]
         return 0
     
     def get_document_length(self, doc_id: int) -> int:
@@ -96,22 +431,178 @@ class InvertedIndex:
         return posting_list.get_documents()
     
     def search_and(self, terms: List[str]) -> List[int]:
-        """AND搜索：返回包含所有词汇的文档ID"""
+        """
+        AND搜索：返回包含所有词汇的文档ID（升序）
+        
+        从文档频率最低的词汇开始，依次在更长的倒排列表中查找候选文档，
+        不再为每个词汇构建完整的文档集合：普通倒排列表用倍增查找（galloping），
+        压缩倒排列表用跳表指针只解码可能命中的块，内存映射倒排列表直接二分查找。
+        """
         if not terms:
             return []
         
-        # 获取每个词汇的文档列表
-        doc_sets = []
-        for term in terms:
-            doc_ids = set(self.get_documents_containing_term(term))
-            doc_sets.append(doc_ids)
+        posting_lists = [self.get_posting_list(term) for term in set(terms)]
+        posting_lists.sort(key=lambda posting_list: posting_list.document_frequency)
+        if posting_lists[0].document_frequency == 0:
+            return []
+        
+        if isinstance(posting_lists[0], PostingList):
+            candidates = posting_lists[0].get_document_ids()
+            for posting_list in posting_lists[1:]:
+                candidates = self._intersect_galloping(candidates, posting_list.documents)
+                if not candidates:
+                    break
+            return candidates
+        
+        # 压缩和内存映射倒排列表：候选文档保存在数组中批量查找
+        if isinstance(posting_lists[0], CompressedPostingList):
+            candidates = posting_lists[0].decode_document_ids()
+        else:
+            candidates = posting_lists[0].doc_ids
+        for posting_list in posting_lists[1:]:
+            if isinstance(posting_list, CompressedPostingList):
+                candidates = self._intersect_with_skips(candidates, posting_list)
+            else:
+                candidates = self._intersect_sorted_array(candidates, posting_list.doc_ids)
+            if not len(candidates):
+                break
+        return candidates.tolist()
+    
+    @staticmethod
+    def _intersect_galloping(candidates: List[int], documents: List[Tuple[int, int]]) -> List[int]:
+        """在按文档ID排序的[(doc_id, tf), ...]中倍增查找每个候选文档"""
+        if len(candidates) * InvertedIndex.GALLOP_RATIO >= len(documents):
+            # 候选文档与倒排列表规模相近时，顺序扫描比逐个查找更快
+            candidate_set = set(candidates)
+            return [doc_id for doc_id, _ in documents if doc_id in candidate_set]
+        
+        result = []
+        position = 0
+        length = len(documents)
+        for doc_id in candidates:
+            # 以1, 2, 4, ...的步长向后探测，再在最后一段内二分查找
+            low = high = position
+            step = 1
+            while high < length and documents[high][0] < doc_id:
+                low = high + 1
+                high = low + step
+                step *= 2
+            position = bisect_left(documents, (doc_id,), low, min(high, length))
+            if position == length:
+                break
+            if documents[position][0] == doc_id:
+                result.append(doc_id)
+                position += 1
+        return result
+    
+    @staticmethod
+    def _intersect_sorted_array(candidates: np.ndarray, doc_ids: np.ndarray) -> np.ndarray:
+        """在升序文档ID数组中批量二分查找候选文档"""
+        positions = np.searchsorted(doc_ids, candidates)
+        found = positions < len(doc_ids)
+        found[found] = doc_ids[positions[found]] == candidates[found]
+        return candidates[found]
+    
+    @classmethod
+    def _intersect_with_skips(cls, candidates: np.ndarray, posting_list: CompressedPostingList) -> np.ndarray:
+        """利用跳表指针只解码可能包含候选文档的块"""
+        blocks = None
+        if posting_list.skips is not None:
+            block_last_doc_ids = np.frombuffer(posting_list.skips[0], dtype=np.uint32)
+            blocks = np.searchsorted(block_last_doc_ids, candidates)
+            blocks = blocks[blocks < len(block_last_doc_ids)]
+            if len(blocks) * 2 > len(block_last_doc_ids):
+                # 大部分块都可能命中时整体解码
+                blocks = None
+            else:
+                blocks = np.unique(blocks).tolist()
+        return cls._intersect_sorted_array(candidates, posting_list.decode_document_ids(blocks))
+    
+    def get_term_positions(self, term: str) -> Dict[int, array]:
+        """获取词汇在各文档中的位置，返回{doc_id: 升序位置数组}"""
+        term_positions = self.positions.get(term)
+        if term_positions is None:
+            return {}
+        
+        result = {}
+        offset = 0
+        for doc_id, term_frequency in self.get_posting_list(term).get_documents():
+            result[doc_id] = term_positions[offset:offset + term_frequency]
+            offset += term_frequency
+        return result
+    
+    def search_phrase(self, terms: List[str]) -> Dict[int, int]:
+        """
+        短语搜索：返回词汇按顺序相邻出现的文档
+        
+        Returns:
+            {doc_id: 短语出现次数}
+        """
+        if not self.store_positions:
+            print("索引未记录位置信息，无法进行短语搜索")
+            return {}
+        if not terms:
+            return {}
+        if len(terms) == 1:
+            return {doc_id: len(positions) for doc_id, positions in self.get_term_positions(terms[0]).items()}
+        
+        candidates = self.search_and(terms)
+        if not candidates:
+            return {}
+        
+        positions_by_term = {term: self.get_term_positions(term) for term in set(terms)}
+        result = {}
+        for doc_id in candidates:
+            following_positions = [set(positions_by_term[term][doc_id]) for term in terms[1:]]
+            count = 0
+            for start in positions_by_term[terms[0]][doc_id]:
+                if all(start + offset in positions
+                       for offset, positions in enumerate(following_positions, 1)):
+                    count += 1
+            if count:
+                result[doc_id] = count
+        return result
+    
+    def search_near(self, term1: str, term2: str, max_distance: int) -> Dict[int, int]:
+        """
+        邻近搜索：返回两个词汇相距不超过max_distance个位置的文档（不限先后顺序）
+        
+        Returns:
+            {doc_id: 两个词汇的最小距离}
+        """
+        if not self.store_positions:
+            print("索引未记录位置信息，无法进行邻近搜索")
+            return {}
         
-        # 求交集
-        result = doc_sets[0]
-        for doc_set in doc_sets[1:]:
-            result = result.intersection(doc_set)
+        candidates = self.search_and([term1, term2])
+        if not candidates:
+            return {}
         
-        return list(result)
+        positions1 = self.get_term_positions(term1)
+        positions2 = self.get_term_positions(term2)
+        result = {}
+        for doc_id in candidates:
+            distance = self.get_min_distance(positions1[doc_id], positions2[doc_id])
+            if distance <= max_distance:
+                result[doc_id] = distance
+        return result
+    
+    @staticmethod
+    def get_min_distance(positions1, positions2) -> int:
+        """归并两个升序位置序列，求两者之间的最小距离（同一位置视为距离0）"""
+        i = j = 0
+        min_distance = float('inf')
+        while i < len(positions1) and j < len(positions2):
+            distance = positions1[i] - positions2[j]
+            if distance < 0:
+                min_distance = min(min_distance, -distance)
+                i += 1
+            else:
+                min_distance = min(min_distance, distance)
+                j += 1
+            if min_distance == 0:
+                break
+        return min_distance
     
     def search_or(self, terms: List[str]) -> List[int]:
         """OR搜索：返回包含任意词汇的文档ID"""
@@ -127,45 +618,176 @@ class InvertedIndex:
     
     def get_index_stats(self) -> Dict[str, any]:
         """获取索引统计信息"""
-        if not self.index:
+        terms = self.get_terms()
+        if not terms:
             return {}
         
-        posting_list_sizes = [len(posting_list.documents) for posting_list in self.index.values()]
+        posting_list_sizes = [self.get_posting_list(term).document_frequency for term in terms]
         
         return {
             "文档总数": self.document_count,
             "词汇总数": len(self.vocabulary),
-            "索引条目数": len(self.index),
+            "索引条目数": len(terms),
             "平均倒排列表长度": sum(posting_list_sizes) / len(posting_list_sizes),
             "最长倒排列表": max(posting_list_sizes),
             "最短倒排列表": min(posting_list_sizes),
+            "倒排列表存储": "内存映射" if self._mapped_file is not None
+                          else ("压缩" if self.compress_postings else "原始"),
+            "位置信息": "✓" if self.store_positions else "✗",
             "总文档长度": sum(self.document_lengths.values()),
             "平均文档长度": sum(self.document_lengths.values()) / len(self.document_lengths)
         }
     
     def save_index(self, filepath: str) -> None:
-        """保存索引到文件"""
-        index_data = {
-            'index': self.index,
-            'document_count': self.document_count,
-            'vocabulary': self.vocabulary,
-            'document_lengths': self.document_lengths
-        }
+        """
+        保存索引到二进制文件
+        
+        倒排列表以连续的uint32数组存储，load_index通过mmap按需读取，
+        多个进程加载同一索引文件时共享操作系统页缓存。位置信息不写入索引文件，
+        因此搜索引擎的位置索引仍随索引快照保存，不使用这种文件。
+        """
+        terms = sorted(self.get_terms())
+        term_bytes = [term.encode('utf-8') for term in terms]
+        
+        term_offsets = np.zeros(len(terms) + 1, dtype='<u8')
+        np.cumsum([len(b) for b in term_bytes], out=term_offsets[1:])
+        
+        posting_offsets = np.zeros(len(terms) + 1, dtype='<u8')
+        doc_id_chunks = []
+        tf_chunks = []
+        for i, term in enumerate(terms):
+            posting_list = self.get_posting_list(term)
+            doc_ids = np.array(posting_list.get_document_ids(), dtype='<u4')
+            tfs = np.array([tf for _, tf in posting_list.get_documents()], dtype='<u4')
+            doc_id_chunks.append(doc_ids)
+            tf_chunks.append(tfs)
+            posting_offsets[i + 1] = posting_offsets[i] + len(doc_ids)
         
-        with open(filepath, 'wb') as f:
-            pickle.dump(index_data, f)
+        doc_ids = np.concatenate(doc_id_chunks) if doc_id_chunks else np.zeros(0, dtype='<u4')
+        tfs = np.concatenate(tf_chunks) if tf_chunks else np.zeros(0, dtype='<u4')
+        doc_lengths = np.array([self.document_lengths.get(doc_id, 0) for doc_id in range(self.document_count)],
+                               dtype='<u4')
+        
+        sections = [term_offsets.tobytes(), b''.join(term_bytes), posting_offsets.tobytes(),
+                    doc_ids.tobytes(), tfs.tobytes(), doc_lengths.tobytes()]
+        
+        # 计算各数据段的8字节对齐偏移量
+        offset = struct.calcsize(self.HEADER_FORMAT)
+        section_offsets = []
+        for section in sections:
+            offset = (offset + 7) // 8 * 8
+            section_offsets.append(offset)
+            offset += len(section)
+        
+        header = struct.pack(self.HEADER_FORMAT, self.INDEX_MAGIC, self.INDEX_VERSION,
+                             self.document_count, len(terms), len(doc_ids), *section_offsets)
+        
+        temp_path = filepath + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(header)
+            for section_offset, section in zip(section_offsets, sections):
+                f.write(b'\0' * (section_offset - f.tell()))
+                f.write(section)
+        os.replace(temp_path, filepath)
         print(f"索引已保存到: {filepath}")
     
     def load_index(self, filepath: str) -> None:
-        """从文件加载索引"""
+        """从文件加载索引（二进制索引使用mmap按需读取倒排列表）"""
+        with open(filepath, 'rb') as f:
+            magic = f.read(len(self.INDEX_MAGIC))
+        
+        if magic != self.INDEX_MAGIC:
+            self._load_pickle_index(filepath)
+            return
+        
+        self.close()
+        with open(filepath, 'rb') as f:
+            mapped_file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        header_size = struct.calcsize(self.HEADER_FORMAT)
+        (_, version, document_count, term_count, posting_count,
+         term_offsets_at, term_bytes_at, posting_offsets_at,
+         doc_ids_at, tfs_at, doc_lengths_at) = struct.unpack(self.HEADER_FORMAT, mapped_file[:header_size])
+        
+        if version != self.INDEX_VERSION:
+            mapped_file.close()
+            raise ValueError(f"不支持的索引文件版本: {version}")
+        
+        # 词汇表需要常驻内存用于查找；倒排列表只保留对映射区域的引用
+        term_offsets = np.frombuffer(mapped_file, dtype='<u8', count=term_count + 1, offset=term_offsets_at)
+        term_blob = mapped_file[term_bytes_at:term_bytes_at + int(term_offsets[-1])]
+        terms = [term_blob[int(term_offsets[i]):int(term_offsets[i + 1])].decode('utf-8')
+                 for i in range(term_count)]
+        
+        self._mapped_file = mapped_file
+        self._mapped_path = filepath
+        self._mapped_terms = {term: i for i, term in enumerate(terms)}
+        self._mapped_posting_offsets = np.frombuffer(mapped_file, dtype='<u8', count=term_count + 1,
+                                                     offset=posting_offsets_at)
+        self._mapped_doc_ids = np.frombuffer(mapped_file, dtype='<u4', count=posting_count, offset=doc_ids_at)
+        self._mapped_term_frequencies = np.frombuffer(mapped_file, dtype='<u4', count=posting_count, offset=tfs_at)
+        
+        doc_lengths = np.frombuffer(mapped_file, dtype='<u4', count=document_count, offset=doc_lengths_at)
+        self.index = {}
+        self._compressed_terms = []
+        self.store_positions = False
+        self.positions = {}
+        self.document_count = document_count
+        self.vocabulary = set(terms)
+        self.document_lengths = dict(enumerate(doc_lengths.tolist()))
+        print(f"索引已从文件加载（内存映射）: {filepath}")
+    
+    def _load_pickle_index(self, filepath: str) -> None:
+        """加载旧版pickle格式的索引文件"""
         with open(filepath, 'rb') as f:
             index_data = pickle.load(f)
         
+        self.close()
+        self._compressed_terms = []
+        self.store_positions = False
+        self.positions = {}
         self.index = index_data['index']
+        if self.compress_postings:
+            self._compress_index()
         self.document_count = index_data['document_count']
         self.vocabulary = index_data['vocabulary']
         self.document_lengths = index_data['document_lengths']
         print(f"索引已从文件加载: {filepath}")
+    
+    def close(self) -> None:
+        """释放内存映射的索引文件"""
+        if self._mapped_file is None:
+            return
+        
+        # numpy视图引用映射区域，需先释放才能关闭mmap
+        self._mapped_posting_offsets = None
+        self._mapped_doc_ids = None
+        self._mapped_term_frequencies = None
+        self._mapped_terms = {}
+        try:
+            self._mapped_file.close()
+        except BufferError:
+            # 仍有外部持有的倒排列表视图，交由垃圾回收释放
+            pass
+        self._mapped_file = None
+        self._mapped_path = None
+    
+    def __getstate__(self):
+        """序列化时不复制映射内容，只记录索引文件路径"""
+        state = self.__dict__.copy()
+        if self._mapped_file is not None:
+            for key in ['_mapped_file', '_mapped_terms', '_mapped_posting_offsets',
+                        '_mapped_doc_ids', '_mapped_term_frequencies']:
+                state[key] = None
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self._mapped_path is not None:
+            mapped_path = self._mapped_path
+            self._mapped_path = None
+            self._mapped_terms = {}
+            self.load_index(mapped_path)
 
 
 # 测试代码
@@ -226,4 +848,34 @@ if __name__ == "__main__":
     for doc_id in range(min(3, len(documents))):
         length = inverted_index.get_document_length(doc_id)
         apple_freq = inverted_index.get_term_frequency_in_document("apple", doc_id)
-        print(f"文档{doc_id}: 长度={length}, 'apple'频率={apple_freq}")
\ No newline at end of file
+        print(f"文档{doc_id}: 长度={length}, 'apple'频率={apple_freq}")
+    
+    # 测试二进制索引的保存与内存映射加载
+    print(f"\n=== 索引保存与加载测试 ===")
+    import tempfile
+    index_path = os.path.join(tempfile.mkdtemp(), "test_index.bin")
+    inverted_index.save_index(index_path)
+    
+    mapped_index = InvertedIndex()
+    mapped_index.load_index(index_path)
+    for term in ["apple", "fig", "xyz"]:
+        print(f"'{term}': 原索引 {inverted_index.search_term(term)}, 映射索引 {mapped_index.search_term(term)}")
+    print(f"AND搜索 {and_terms}: 映射索引文档 {mapped_index.search_and(and_terms)}")
+    mapped_index.close()
+    
+    # 测试压缩倒排列表
+    print(f"\n=== 压缩倒排列表测试 ===")
+    compressed_index = InvertedIndex(compress_postings=True)
+    compressed_index.build_index(documents)
+    for term in ["apple", "fig", "xyz"]:
+        print(f"'{term}': {compressed_index.get_posting_list(term)} -> {compressed_index.search_term(term)}")
+    print(f"OR搜索 {or_terms}: 压缩索引文档 {compressed_index.search_or(or_terms)}")
+    
+    # 测试位置索引
+    print(f"\n=== 位置索引测试 ===")
+    positional_index = InvertedIndex(store_positions=True)
+    positional_index.build_index(documents)
+    print(f"'apple'位置: {dict((doc_id, list(p)) for doc_id, p in positional_index.get_term_positions('apple').items())}")
+    print(f"短语搜索 ['banana', 'cherry']: {positional_index.search_phrase(['banana', 'cherry'])}")
+    print(f"短语搜索 ['date', 'elderberry']: {positional_index.search_phrase(['date', 'elderberry'])}")
+    print(f"邻近搜索 apple NEAR/2 cherry: {positional_index.search_near('apple', 'cherry', 2)}")
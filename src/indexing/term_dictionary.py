@@ -0,0 +1,211 @@
+from collections import Counter
+from typing import List, Dict, Any, Tuple
+import numpy as np
+
+
+class TermDictionary:
+    """
+    全局词典：一次遍历所有文档，统计各字段的词频、文档频率和集合频率，供各检索模型共享
+    
+    词汇按字典序编号，词汇ID即在terms中的下标。每个字段的倒排数据按词汇ID顺序
+    连续存放（CSR）：词汇t的文档为 doc_ids[indptr[t]:indptr[t + 1]]（文档ID递增），
+    对应词频为 term_frequencies[同一区间]。
+    """
+    
+    FIELDS = ('title', 'content', 'summary')  # 与Document.all_tokens的拼接顺序一致
+    ALL_FIELDS = 'all'  # 所有字段合并
+    
+    def __init__(self):
+        self.terms = []  # 按字典序排列的词汇
+        self.term_ids = {}  # {term: term_id}
+        self.document_count = 0
+        self.fields = ()  # 已统计的字段（含'all'）
+        self.field_lengths = {}  # {field: [每个文档的词数]}
+        self.document_frequencies = {}  # {field: np.ndarray}，按词汇ID
+        self.collection_frequencies = np.zeros(0, dtype=np.int64)  # 所有字段中的总出现次数
+        self.postings = {}  # {field: (indptr, doc_ids, term_frequencies)}
+    
+    def build(self, documents: List[Any]) -> None:
+        """从文档对象构建词典（一次遍历，统计标题、内容、摘要三个字段）"""
+        print(f"开始构建全局词典，共{len(documents)}个文档...")
+        field_counts = {field: [] for field in self.FIELDS}
+        for doc in documents:
+            for field in self.FIELDS:
+                field_counts[field].append(self._count_field_terms(doc, field))
+        self._build_from_counts(field_counts)
+    
+    @classmethod
+    def from_token_lists(cls, documents_tokens: List[List[str]]) -> 'TermDictionary':
+        """从每个文档的词汇列表构建词典（只有'all'一个字段）"""
+        dictionary = cls()
+        dictionary._build_from_counts({cls.ALL_FIELDS: [Counter(tokens) for tokens in documents_tokens]})
+        return dictionary
+    
+    @staticmethod
+    def _count_field_terms(doc: Any, field: str) -> Dict[str, int]:
+        """统计文档某个字段的词频。Document直接按词汇ID计数，其他文档对象使用processed_*词汇列表"""
+        term_ids = getattr(doc, f'{field}_ids', None)
+        if term_ids is None:
+            return Counter(getattr(doc, f'processed_{field}'))
+        terms = doc.terms
+        return {terms[term_id]: count for term_id, count in Counter(term_ids).items()}
+    
+    def _build_from_counts(self, field_counts: Dict[str, List[Dict[str, int]]]) -> None:
+        """根据各字段每个文档的词频统计生成词汇表和倒排数据"""
+        vocabulary = set()
+        for counts_list in field_counts.values():
+            for counts in counts_list:
+                vocabulary.update(counts)
+        self.terms = sorted(vocabulary)
+        self.term_ids = {term: term_id for term_id, term in enumerate(self.terms)}
+        self.document_count = len(next(iter(field_counts.values()), []))
+        self.field_lengths = {}
+        self.document_frequencies = {}
+        self.postings = {}
+        
+        # 逐字段展开为 (词汇ID, 文档ID, 词频) 三元组
+        term_ids = self.term_ids
+        entries = {}
+        for field, counts_list in field_counts.items():
+            field_term_ids, field_doc_ids, field_tfs, lengths = [], [], [], []
+            for doc_id, counts in enumerate(counts_list):
+                lengths.append(sum(counts.values()))
+                for term, count in counts.items():
+                    field_term_ids.append(term_ids[term])
+                    field_doc_ids.append(doc_id)
+                    field_tfs.append(count)
+            self.field_lengths[field] = lengths
+            entries[field] = (np.array(field_term_ids, dtype=np.int64), np.array(field_doc_ids, dtype=np.int64),
+                              np.array(field_tfs, dtype=np.int64))
+        
+        if self.ALL_FIELDS not in entries:
+            # 合并各字段：同一(词汇, 文档)的词频相加
+            all_term_ids = np.concatenate([entries[field][0] for field in field_counts])
+            all_doc_ids = np.concatenate([entries[field][1] for field in field_counts])
+            all_tfs = np.concatenate([entries[field][2] for field in field_counts])
+            keys, inverse = np.unique(all_term_ids * max(self.document_count, 1) + all_doc_ids, return_inverse=True)
+            entries[self.ALL_FIELDS] = (keys // max(self.document_count, 1), keys % max(self.document_count, 1),
+                                        np.bincount(inverse, weights=all_tfs, minlength=len(keys)).astype(np.int64))
+            self.field_lengths[self.ALL_FIELDS] = [sum(lengths) for lengths in
+                                                   zip(*(self.field_lengths[field] for field in field_counts))]
+        
+        for field, (field_term_ids, field_doc_ids, field_tfs) in entries.items():
+            self._set_field_postings(field, field_term_ids, field_doc_ids, field_tfs)
+        self.fields = tuple(entries)
+        
+        all_term_ids, _, all_tfs = entries[self.ALL_FIELDS]
+        self.collection_frequencies = np.bincount(all_term_ids, weights=all_tfs,
+                                                  minlength=len(self.terms)).astype(np.int64)
+        print(f"全局词典构建完成，包含{len(self.terms)}个词汇，字段: {list(self.fields)}")
+    
+    def _set_field_postings(self, field: str, term_ids: np.ndarray, doc_ids: np.ndarray, tfs: np.ndarray) -> None:
+        """按词汇ID（其次文档ID）排序，生成字段的CSR倒排数据和文档频率"""
+        order = np.lexsort((doc_ids, term_ids))
+        frequencies = np.bincount(term_ids, minlength=len(self.terms)).astype(np.int32)
+        indptr = np.zeros(len(self.terms) + 1, dtype=np.int64)
+        np.cumsum(frequencies, out=indptr[1:])
+        self.document_frequencies[field] = frequencies
+        self.postings[field] = (indptr, doc_ids[order].astype(np.int32), tfs[order].astype(np.int32))
+    
+    def get_term_id(self, term: str) -> int:
+        """获取词汇ID，不存在时返回-1"""
+        return self.term_ids.get(term, -1)
+    
+    def get_document_frequency(self, term: str, field: str = ALL_FIELDS) -> int:
+        """获取词汇在某个字段中的文档频率"""
+        term_id = self.term_ids.get(term)
+        return int(self.document_frequencies[field][term_id]) if term_id is not None else 0
+    
+    def get_collection_frequency(self, term: str) -> int:
+        """获取词汇在所有文档所有字段中的总出现次数"""
+        term_id = self.term_ids.get(term)
+        return int(self.collection_frequencies[term_id]) if term_id is not None else 0
+    
+    def get_postings(self, term: str, field: str = ALL_FIELDS) -> Tuple[np.ndarray, np.ndarray]:
+        """获取词汇在某个字段中的倒排列表 (文档ID数组, 词频数组)"""
+        indptr, doc_ids, tfs = self.postings[field]
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            return doc_ids[:0], tfs[:0]
+        start, end = indptr[term_id], indptr[term_id + 1]
+        return doc_ids[start:end], tfs[start:end]
+    
+    @staticmethod
+    def select_postings(doc_ids: np.ndarray, candidate_ids: np.ndarray) -> np.ndarray:
+        """
+        获取倒排列表中文档ID属于候选文档的条目下标（递增）
+        
+        两个数组都按文档ID递增，在较长的数组中二分查找较短数组的元素，代价为 O(短 * log 长)。
+        """
+        if len(candidate_ids) < len(doc_ids):
+            positions = np.searchsorted(doc_ids, candidate_ids)
+            found = positions < len(doc_ids)
+            found[found] = doc_ids[positions[found]] == candidate_ids[found]
+            return positions[found]
+        positions = np.searchsorted(candidate_ids, doc_ids)
+        found = positions < len(candidate_ids)
+        found[found] = candidate_ids[positions[found]] == doc_ids[found]
+        return np.flatnonzero(found)
+    
+    def get_term_frequency(self, term: str, doc_id: int, field: str = ALL_FIELDS) -> int:
+        """获取词汇在某个文档某个字段中的词频（倒排列表内文档ID递增，二分查找）"""
+        doc_ids, tfs = self.get_postings(term, field)
+        position = int(np.searchsorted(doc_ids, doc_id))
+        if position < len(doc_ids) and doc_ids[position] == doc_id:
+            return int(tfs[position])
+        return 0
+    
+    def get_field_postings(self, field: str = ALL_FIELDS) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+        """
+        获取字段中出现过的词汇及其倒排数据
+        
+        Returns:
+            (词汇列表, indptr, 文档ID数组, 词频数组)，indptr只包含这些词汇，
+            字段包含全部词汇时直接返回共享的terms列表
+        """
+        indptr, doc_ids, tfs = self.postings[field]
+        present = np.flatnonzero(self.document_frequencies[field])
+        if len(present) == len(self.terms):
+            return self.terms, indptr, doc_ids, tfs
+        terms = [self.terms[term_id] for term_id in present.tolist()]
+        return terms, np.append(indptr[present], indptr[-1]), doc_ids, tfs
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取词典统计信息"""
+        return {
+            "词汇数": len(self.terms),
+            "文档数": self.document_count,
+            "字段": list(self.fields),
+            "各字段词汇数": {field: int(np.count_nonzero(self.document_frequencies[field])) for field in self.fields},
+            "倒排条目数": {field: len(self.postings[field][1]) for field in self.fields},
+            "总词数": int(self.collection_frequencies.sum())
+        }
+
+
+# 测试代码
+if __name__ == "__main__":
+    print("=== 全局词典测试 ===")
+    
+    class MockDocument:
+        def __init__(self, title, content, summary):
+            self.processed_title = title.split()
+            self.processed_content = content.split()
+            self.processed_summary = summary.split()
+    
+    documents = [
+        MockDocument("climat chang", "global warm climat polici", "climat chang"),
+        MockDocument("health care", "medic treatment health", "care"),
+        MockDocument("climat scienc", "research climat data", "scienc"),
+    ]
+    
+    dictionary = TermDictionary()
+    dictionary.build(documents)
+    for key, value in dictionary.get_stats().items():
+        print(f"{key}: {value}")
+    
+    for term in ["climat", "care", "unknown"]:
+        doc_ids, tfs = dictionary.get_postings(term)
+        print(f"\n词汇 '{term}': 文档频率 {dictionary.get_document_frequency(term)}, "
+              f"标题文档频率 {dictionary.get_document_frequency(term, 'title')}, "
+              f"集合频率 {dictionary.get_collection_frequency(term)}")
+        print(f"  倒排列表: {list(zip(doc_ids.tolist(), tfs.tolist()))}")
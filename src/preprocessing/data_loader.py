@@ -1,37 +1,131 @@
 import json
-import pandas as pd
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 
 class DataLoader:
     """数据加载器：负责从JSON文件中加载NPR文章数据"""
     
+    # 流式读取JSON数组时每次读入的字符数
+    CHUNK_SIZE = 1 << 16
+    
     def __init__(self, file_path: str):
         self.file_path = file_path
         self.articles = []
+        self._reset_info()
     
     def load_articles(self) -> List[Dict[str, Any]]:
         """加载文章数据"""
         try:
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                self.articles = json.load(f)
-            print(f"成功加载 {len(self.articles)} 篇文章")
+            self.articles = list(self.iter_articles())
             return self.articles
         except Exception as e:
             print(f"加载数据时出错: {e}")
+            self.articles = []
             return []
     
+    def iter_articles(self) -> Iterator[Dict[str, Any]]:
+        """
+        逐篇读取文章，不把整个文件读入内存
+        
+        支持JSON数组（如npr_articles.json）和JSON Lines（每行一篇文章）两种格式，
+        根据文件的第一个非空白字符自动判断。数据格式错误时抛出ValueError。
+        """
+        self._reset_info()
+        with open(self.file_path, 'r', encoding='utf-8') as f:
+            is_json_array = f.read(self.CHUNK_SIZE).lstrip().startswith('[')
+            f.seek(0)
+            articles = self._iter_json_array(f) if is_json_array else self._iter_json_lines(f)
+            
+            for article in articles:
+                if not isinstance(article, dict):
+                    raise ValueError(f"第 {self._article_count + 1} 篇文章不是JSON对象")
+                self._update_info(article)
+                yield article
+        print(f"成功加载 {self._article_count} 篇文章")
+    
+    def _iter_json_array(self, f) -> Iterator[Any]:
+        """增量解析JSON数组：每次读入一块文本，解析出完整的元素后立即产出"""
+        decoder = json.JSONDecoder()
+        buffer = f.read(self.CHUNK_SIZE).lstrip()[1:]  # 去掉开头的 '['
+        pos = 0
+        count = 0
+        expect_value = True  # 数组开头和逗号之后应为元素，元素之后应为逗号或 ']'
+        eof = False
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            
+            if pos < len(buffer):
+                char = buffer[pos]
+                if not expect_value:
+                    if char == ']':
+                        return
+                    if char != ',':
+                        raise ValueError(f"JSON数组第 {count} 个元素之后缺少逗号")
+                    pos += 1
+                    expect_value = True
+                    continue
+                if char == ']' and count == 0:
+                    return
+                
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise ValueError(f"JSON数组第 {count + 1} 个元素格式错误")
+                else:
+                    # 元素恰好结束在缓冲区末尾时可能被块边界截断（如数字），读入更多文本后再解析
+                    if end < len(buffer) or eof:
+                        yield value
+                        count += 1
+                        pos = end
+                        expect_value = False
+                        continue
+            elif eof:
+                raise ValueError("JSON数组不完整：缺少 ']'")
+            
+            # 缓冲区用完或元素不完整，丢弃已解析部分并读入下一块
+            chunk = f.read(self.CHUNK_SIZE)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+    
+    def _iter_json_lines(self, f) -> Iterator[Any]:
+        """逐行解析JSON Lines，跳过空行"""
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"第 {line_number} 行不是合法的JSON: {e}")
+    
+    def _reset_info(self) -> None:
+        """清空数据集统计"""
+        self._article_count = 0
+        self._field_names = []
+        self._field_counts = {'url': 0, 'title': 0, 'content': 0, 'summary': 0}
+    
+    def _update_info(self, article: Dict[str, Any]) -> None:
+        """读取文章时累计数据集统计，流式读取时无需保留文章"""
+        if self._article_count == 0:
+            self._field_names = list(article.keys())
+        self._article_count += 1
+        for field in self._field_counts:
+            if article.get(field):
+                self._field_counts[field] += 1
+    
     def get_article_info(self) -> Dict[str, Any]:
-        """获取数据集的基本信息"""
-        if not self.articles:
+        """获取数据集的基本信息（最近一次读取的文章）"""
+        if not self._article_count:
             return {}
         
         info = {
-            "总文章数": len(self.articles),
-            "字段信息": list(self.articles[0].keys()) if self.articles else [],
-            "有URL的文章数": sum(1 for article in self.articles if article.get('url')),
-            "有标题的文章数": sum(1 for article in self.articles if article.get('title')),
-            "有内容的文章数": sum(1 for article in self.articles if article.get('content')),
-            "有摘要的文章数": sum(1 for article in self.articles if article.get('summary')),
+            "总文章数": self._article_count,
+            "字段信息": self._field_names,
+            "有URL的文章数": self._field_counts['url'],
+            "有标题的文章数": self._field_counts['title'],
+            "有内容的文章数": self._field_counts['content'],
+            "有摘要的文章数": self._field_counts['summary'],
         }
         return info
     
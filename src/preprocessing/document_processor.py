@@ -1,76 +1,287 @@
-from typing import List, Dict, Any
+import os
+import zlib
+from array import array
+from collections import deque
+from collections.abc import Sequence
+from itertools import chain
+from typing import List, Dict, Any, Tuple, Iterable
 from .data_loader import DataLoader
 from .text_processor import TextProcessor
 
+class DocumentTextStore:
+    """文档原文存储：正文、摘要等原文以zlib压缩的UTF-8字节依次保存在内存中的同一个缓冲区，每次读取都重新解压（不缓存）"""
+    
+    COMPRESSION_LEVEL = 6
+    
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array('Q', [0])  # 第i段文本位于 data[offsets[i]:offsets[i + 1]]
+    
+    def add(self, text: str) -> int:
+        """追加一段文本，返回其编号"""
+        if text:
+            self.data += zlib.compress(text.encode('utf-8'), self.COMPRESSION_LEVEL)
+        self.offsets.append(len(self.data))
+        return len(self.offsets) - 2
+    
+    def get(self, slot: int) -> str:
+        """读取一段文本"""
+        start, end = self.offsets[slot], self.offsets[slot + 1]
+        if start == end:
+            return ""
+        return zlib.decompress(self.data[start:end]).decode('utf-8')
+    
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+
+class TokenView(Sequence):
+    """多个词汇ID数组拼接后的只读词汇序列视图，按需把ID还原为词汇，不复制词汇列表"""
+    
+    __slots__ = ('_id_arrays', '_terms')
+    
+    def __init__(self, id_arrays: Tuple[array, ...], terms: List[str]):
+        self._id_arrays = id_arrays
+        self._terms = terms
+    
+    def __len__(self) -> int:
+        return sum(len(ids) for ids in self._id_arrays)
+    
+    def __iter__(self):
+        return map(self._terms.__getitem__, chain.from_iterable(self._id_arrays))
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += len(self)
+        for ids in self._id_arrays:
+            if 0 <= index < len(ids):
+                return self._terms[ids[index]]
+            index -= len(ids)
+        raise IndexError("TokenView index out of range")
+    
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (TokenView, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+    
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
 class Document:
-    """文档类：表示一篇文章"""
+    """
+    文档类：表示一篇文章
+    
+    处理后的词汇按字段保存为词汇ID数组（array('I')）。processed_title等属性每次访问都会重新构建词汇列表，
+    all_tokens为三个字段的拼接视图；正文和摘要原文压缩保存在内存中的DocumentTextStore里，每次访问都会重新解压。
+    这些属性只用于构建索引和展示结果，检索评分应使用词汇ID数组或全局词典的倒排数据。
+    """
+    
+    __slots__ = ('doc_id', 'title', 'url', 'publish_time', 'author',
+                 'title_ids', 'content_ids', 'summary_ids', 'terms',
+                 'text_store', 'content_slot', 'summary_slot')
     
     def __init__(self, doc_id: int, title: str, content: str, summary: str, 
-                 url: str, publish_time: str, author: str = ""):
+                 url: str, publish_time: str, author: str = "",
+                 text_store: DocumentTextStore = None, terms: List[str] = None):
         self.doc_id = doc_id
         self.title = title
-        self.content = content
-        self.summary = summary
         self.url = url
         self.publish_time = publish_time
         self.author = author
         
-        # 处理后的文本
-        self.processed_title = []
-        self.processed_content = []
-        self.processed_summary = []
-        self.all_tokens = []  # 所有处理后的词汇
+        # 原文存入文本存储（未指定时单独创建）
+        self.text_store = text_store if text_store is not None else DocumentTextStore()
+        self.content_slot = self.text_store.add(content)
+        self.summary_slot = self.text_store.add(summary)
+        
+        # 处理后的词汇ID，terms为词汇ID到词汇的映射（与文本处理器共享）
+        self.terms = terms if terms is not None else []
+        self.title_ids = array('I')
+        self.content_ids = array('I')
+        self.summary_ids = array('I')
+    
+    @property
+    def content(self) -> str:
+        return self.text_store.get(self.content_slot)
+    
+    @property
+    def summary(self) -> str:
+        return self.text_store.get(self.summary_slot)
+    
+    @property
+    def processed_title(self) -> List[str]:
+        return list(map(self.terms.__getitem__, self.title_ids))
+    
+    @property
+    def processed_content(self) -> List[str]:
+        return list(map(self.terms.__getitem__, self.content_ids))
+    
+    @property
+    def processed_summary(self) -> List[str]:
+        return list(map(self.terms.__getitem__, self.summary_ids))
+    
+    @property
+    def all_tokens(self) -> TokenView:
+        """所有处理后的词汇（标题、内容、摘要依次拼接）"""
+        return TokenView((self.title_ids, self.content_ids, self.summary_ids), self.terms)
     
     def __str__(self):
         return f"Document(id={self.doc_id}, title='{self.title[:50]}...', tokens={len(self.all_tokens)})"
 
 
+# 工作进程中的文本处理器（由进程池初始化函数设置）
+_worker_text_processor = None
+
+
+def _init_worker(text_processor: TextProcessor) -> None:
+    """进程池初始化：复用主进程的文本处理器配置，避免每个进程重新下载NLTK数据"""
+    global _worker_text_processor
+    _worker_text_processor = text_processor
+
+
+def _process_text_batch(texts: List[Tuple[str, str, str]]) -> List[Tuple[List[str], List[str], List[str]]]:
+    """
+    在工作进程中处理一批文章的(标题, 内容, 摘要)，返回对应的词汇列表
+    
+    工作进程用自己的词汇表副本登记词汇（复用词干缓存），只返回词汇，词汇ID由主进程统一登记。
+    """
+    terms = _worker_text_processor.terms
+    return [
+        tuple([terms[term_id] for term_id in _worker_text_processor.iter_term_ids(text)] if text else []
+              for text in fields)
+        for fields in texts
+    ]
+
+
 class DocumentProcessor:
     """文档处理器：将原始文章数据转换为结构化文档"""
     
-    def __init__(self):
-        self.text_processor = TextProcessor()
-        self.documents = []
+    # 并行处理时每块的文章数，以及每个工作进程最多排队的块数（限制主进程同时保留的原文）
+    PARALLEL_CHUNK_SIZE = 50
+    MAX_PENDING_CHUNKS_PER_WORKER = 2
     
-    def process_articles(self, articles: List[Dict[str, Any]]) -> List[Document]:
-        """处理文章列表，返回Document对象列表"""
+    def __init__(self, num_workers: int = 1, tokenizer: str = 'auto'):
+        """
+        初始化文档处理器
+        
+        Args:
+            num_workers: 并行处理文档的进程数，1为串行处理，0或None为使用全部CPU核心
+            tokenizer: 分词方式，见 TextProcessor.TOKENIZERS
+        """
+        self.text_processor = TextProcessor(tokenizer)
+        self.num_workers = num_workers if num_workers else (os.cpu_count() or 1)
+        self.text_store = DocumentTextStore()
         self.documents = []
+    
+    def process_articles(self, articles: Iterable[Dict[str, Any]]) -> List[Document]:
+        """
+        处理文章，返回Document对象列表（与输入顺序一致）
         
+        articles可以是列表，也可以是DataLoader.iter_articles()这样逐篇产生文章的迭代器，
+        后者每读入一篇文章即创建文档，不需要同时保留全部原始文章数据（并行处理时也是边读边分块提交）。
+        """
         print("开始处理文档...")
-        for i, article in enumerate(articles):
-            # 创建文档对象
-            doc = Document(
-                doc_id=i,
-                title=article.get('title', ''),
-                content=article.get('content', ''),
-                summary=article.get('summary', ''),
-                url=article.get('url', ''),
-                publish_time=article.get('publish_time', ''),
-                author=article.get('author', '')
-            )
-            
-            # 处理文本
-            if doc.title:
-                doc.processed_title = self.text_processor.process_text(doc.title)
-            
-            if doc.content:
-                doc.processed_content = self.text_processor.process_text(doc.content)
-            
-            if doc.summary:
-                doc.processed_summary = self.text_processor.process_text(doc.summary)
-            
-            # 合并所有处理后的词汇
-            doc.all_tokens = doc.processed_title + doc.processed_content + doc.processed_summary
-            
-            self.documents.append(doc)
-            
-            # 显示进度
-            if (i + 1) % 50 == 0:
-                print(f"已处理 {i + 1}/{len(articles)} 篇文档")
+        self.text_store = DocumentTextStore()
+        self.text_processor.reset_vocabulary()
+        self.text_processor.load_resources()  # 分发到工作进程前加载分词资源
+        self.documents = []
+        if self.num_workers > 1:
+            self._process_articles_parallel(articles)
+        else:
+            # 串行处理时读入一篇处理一篇，不保留原始文章
+            for i, article in enumerate(articles):
+                doc = self._create_document(i, article)
+                self.documents.append(doc)
+                texts = (article.get('title'), article.get('content'), article.get('summary'))
+                self._process_document_texts(doc, texts)
+                
+                # 显示进度
+                if (i + 1) % 50 == 0:
+                    print(f"已处理 {i + 1} 篇文档")
         
         print(f"文档处理完成！共处理 {len(self.documents)} 篇文档")
         return self.documents
     
+    def _create_document(self, doc_id: int, article: Dict[str, Any]) -> Document:
+        """根据文章数据创建文档对象（不处理文本），原文存入文本存储"""
+        return Document(
+            doc_id=doc_id,
+            title=article.get('title', ''),
+            content=article.get('content', ''),
+            summary=article.get('summary', ''),
+            url=article.get('url', ''),
+            publish_time=article.get('publish_time', ''),
+            author=article.get('author', ''),
+            text_store=self.text_store,
+            terms=self.text_processor.terms
+        )
+    
+    def _process_document_texts(self, doc: Document, texts: Tuple[str, str, str]) -> None:
+        """在主进程中处理文档的(标题, 内容, 摘要)并设置词汇ID"""
+        self._set_document_term_ids(doc, [self.text_processor.process_text_ids(text) if text else array('I')
+                                          for text in texts])
+    
+    @staticmethod
+    def _set_document_term_ids(doc: Document, field_term_ids: List[array]) -> None:
+        """设置文档标题、内容、摘要的词汇ID数组"""
+        doc.title_ids, doc.content_ids, doc.summary_ids = field_term_ids
+    
+    def _iter_article_chunks(self, articles: Iterable[Dict[str, Any]]):
+        """逐篇读入文章并创建文档，每PARALLEL_CHUNK_SIZE篇产出一次 (文档列表, (标题, 内容, 摘要)列表)"""
+        chunk_docs, chunk_texts = [], []
+        for article in articles:
+            doc = self._create_document(len(self.documents), article)
+            self.documents.append(doc)
+            chunk_docs.append(doc)
+            chunk_texts.append((article.get('title'), article.get('content'), article.get('summary')))
+            if len(chunk_docs) == self.PARALLEL_CHUNK_SIZE:
+                yield chunk_docs, chunk_texts
+                chunk_docs, chunk_texts = [], []
+        if chunk_docs:
+            yield chunk_docs, chunk_texts
+    
+    def _process_articles_parallel(self, articles: Iterable[Dict[str, Any]]) -> None:
+        """
+        多进程处理文章：边读入边按固定大小分块提交给工作进程
+        
+        同时最多有 进程数 * MAX_PENDING_CHUNKS_PER_WORKER 块在处理中，已满时先等待最早的一块完成，
+        因此主进程只保留这些块的原文。结果按提交顺序写回文档，词汇ID的登记顺序与串行处理一致。
+        进程池无法启动或处理失败时，尚未写回结果的文档改为串行处理。
+        """
+        from concurrent.futures import ProcessPoolExecutor  # 只在并行处理时导入
+        
+        chunks = self._iter_article_chunks(articles)
+        pending = deque()  # 已提交的块 (文档列表, future)，按提交顺序
+        max_pending = self.num_workers * self.MAX_PENDING_CHUNKS_PER_WORKER
+        processed = 0  # 已写回结果的文档数（文档按顺序写回）
+        try:
+            with ProcessPoolExecutor(max_workers=self.num_workers, initializer=_init_worker,
+                                     initargs=(self.text_processor,)) as executor:
+                print(f"使用 {self.num_workers} 个进程并行处理，每块 {self.PARALLEL_CHUNK_SIZE} 篇")
+                for chunk_docs, chunk_texts in chunks:
+                    if len(pending) >= max_pending:
+                        processed += self._apply_chunk_result(*pending.popleft())
+                    pending.append((chunk_docs, executor.submit(_process_text_batch, chunk_texts)))
+                while pending:
+                    processed += self._apply_chunk_result(*pending.popleft())
+        except (OSError, RuntimeError) as e:
+            print(f"并行处理失败，改为串行处理: {e}")
+            for _ in chunks:  # 读完剩余文章（只创建文档）
+                pass
+            for doc in self.documents[processed:]:
+                self._process_document_texts(doc, (doc.title, doc.content, doc.summary))
+    
+    def _apply_chunk_result(self, chunk_docs: List[Document], future) -> int:
+        """等待一块的处理结果：工作进程返回词汇，在主进程中统一登记词汇ID，返回该块的文档数"""
+        add_term = self.text_processor.add_term
+        for doc, field_tokens in zip(chunk_docs, future.result()):
+            self._set_document_term_ids(doc, [array('I', map(add_term, tokens)) for tokens in field_tokens])
+        print(f"已处理 {chunk_docs[-1].doc_id + 1} 篇文档")
+        return len(chunk_docs)
+    
     def get_document_stats(self) -> Dict[str, Any]:
         """获取文档统计信息"""
         if not self.documents:
@@ -125,6 +336,11 @@ if __name__ == "__main__":
         doc_processor = DocumentProcessor()
         documents = doc_processor.process_articles(test_articles)
         
+        # 并行处理结果应与串行一致
+        parallel_documents = DocumentProcessor(num_workers=2).process_articles(test_articles)
+        print(f"并行处理结果与串行一致: "
+              f"{[d.all_tokens for d in parallel_documents] == [d.all_tokens for d in documents]}")
+        
         # 显示统计信息
         print("\n=== 文档统计 ===")
         stats = doc_processor.get_document_stats()
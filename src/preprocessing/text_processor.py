@@ -1,31 +1,121 @@
 import re
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import PorterStemmer
-from typing import List, Set
+from typing import List, Set, Dict, Any, Iterator, Iterable
 import string
+import hashlib
+from array import array
 
 class TextProcessor:
     """文本处理器：负责文本清洗、分词、去停用词等操作"""
     
-    def __init__(self):
-        # 下载必需的NLTK数据
-        self._download_nltk_data()
+    # 预编译的清洗正则
+    HTML_TAG_PATTERN = re.compile(r'<[^>]+>')
+    URL_PATTERN = re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
+    EMAIL_PATTERN = re.compile(r'\S+@\S+')
+    WHITESPACE_PATTERN = re.compile(r'\s+')
+    
+    # 一次扫描判断文本中是否可能含有HTML标签、URL或邮箱；
+    # 都不含时清洗只是转小写和合并空白，可以直接按空白切分
+    NOISE_PATTERN = re.compile(r'<[^>]+>|https?://|@')
+    
+    # 分词器：auto - NLTK分词（不可用时退回空格分词）；
+    #        regex - 内置正则分词，不需要任何NLTK数据；whitespace - 空格分词
+    TOKENIZERS = ('auto', 'regex', 'whitespace')
+    
+    # 内置正则分词规则，依次替换后按空白切分。规则仿照NLTK的Treebank分词器，
+    # 由于没有分句，所有后接空白的句点都按句末句点拆开
+    REGEX_TOKENIZER_RULES = [
+        # 引号：开头或空白、括号后的双引号为``，其余为''
+        (re.compile(r'(?:^|(?<=[\s(\[{<]))"'), ' `` '),
+        (re.compile(r'"|\'\''), " '' "),
+        # 总是单独成词的标点
+        (re.compile(r'[«“‘„»”’;@#$%&?!*\[\](){}<>\u2012-\u2015]|\.{2,}|--|`+'), r' \g<0> '),
+        # 不在数字之间的逗号和冒号
+        (re.compile(r'[:,](?!\d)'), r' \g<0> '),
+        # 句末句点（单个字母后的句点视为姓名缩写，不拆开）
+        (re.compile(r'(?<=[^.\s])(?<!\s[a-z])(?<!^[a-z])\.(?=\s|$)'), ' . '),
+        # 词首单引号（缩写除外）和词尾单引号
+        (re.compile(r"(?<!\w)'(?!(?:re|ve|ll|m|t|s|d|n)\b)(?=\w)"), "' "),
+        # 附着词：'s 'm 'd 're 've 'll n't
+        (re.compile(r"(?<=[^'\s])('s|'m|'d|'re|'ve|'ll|n't|')(?=\s|$)"), r' \1'),
+        # 合写词：cannot gonna gotta gimme lemme wanna d'ye more'n 'tis 'twas
+        (re.compile(r"\b(can)(not)\b|\b(gon)(na)\b|\b(got)(ta)\b|\b(gim)(me)\b|\b(lem)(me)\b|"
+                    r"\b(wan)(na)(?=\s)|\b(d)('ye)\b|\b(more)('n)\b|(?<!\S)('t)(is|was)\b"),
+         lambda match: ' '.join(part for part in match.groups() if part)),
+    ]
+    
+    # 自定义停用词（各分词模式共用）
+    CUSTOM_STOPWORDS = frozenset({'said', 'say', 'says', 'npr', 'new', 'also', 'one', 'two', 'would', 'could'})
+    
+    def __init__(self, tokenizer: str = 'auto'):
+        """
+        初始化文本处理器
+        
+        Args:
+            tokenizer: 分词器（'auto'、'regex'或'whitespace'）。
+                       'regex'和'whitespace'不下载也不读取任何NLTK数据，使用内置停用词表；
+                       'auto'在首次分词时（构建文档或第一次查询）才导入NLTK并加载其数据
+        """
+        if tokenizer not in self.TOKENIZERS:
+            raise ValueError(f"不支持的分词器: {tokenizer}")
+        self.tokenizer = tokenizer
         
-        # 初始化组件
-        self.stemmer = PorterStemmer()
+        # 词干提取器在首次用到时创建，避免启动时导入NLTK
+        self._stemmer = None
         
-        # 尝试加载停用词，如果失败则使用默认列表
-        try:
-            self.stop_words = set(stopwords.words('english'))
-        except LookupError:
-            print("使用默认停用词列表...")
-            self.stop_words = self._get_default_stopwords()
+        # 停用词表：auto模式由load_resources从NLTK加载，其余模式使用内置停用词表
+        self._stop_words = None
+        if tokenizer != 'auto':
+            self._stop_words = self._get_default_stopwords() | self.CUSTOM_STOPWORDS
         
-        # 添加自定义停用词
-        custom_stops = {'said', 'say', 'says', 'npr', 'new', 'also', 'one', 'two', 'would', 'could'}
-        self.stop_words.update(custom_stops)
+        # 词汇缓存：新闻文本中少量词形占了大部分出现次数，每个词形只提取一次词干
+        # 只有文档处理登记新词汇，每次构建重新开始；查询处理只读取缓存，不会使缓存增长
+        self.reset_vocabulary()
+        
+        # 实际使用的分词方式（'nltk'、'regex'或'whitespace'），auto模式首次分词时检测
+        self._active_tokenizer = None if tokenizer == 'auto' else tokenizer
+    
+    @property
+    def stemmer(self):
+        """Porter词干提取器（延迟导入NLTK）"""
+        if self._stemmer is None:
+            from nltk.stem import PorterStemmer
+            self._stemmer = PorterStemmer()
+        return self._stemmer
+    
+    @property
+    def stop_words(self) -> Set[str]:
+        """停用词表（auto模式首次访问时加载NLTK停用词）"""
+        if self._stop_words is None:
+            self.load_resources()
+        return self._stop_words
+    
+    def load_resources(self) -> None:
+        """
+        加载分词所需的资源：auto模式下载NLTK数据、加载停用词并检测NLTK分词器是否可用
+        
+        首次分词时自动调用；构建文档时在分发到工作进程之前调用，各进程不必重复加载。
+        """
+        if self._stop_words is None:
+            # 下载必需的NLTK数据
+            self._download_nltk_data()
+            
+            # 尝试加载停用词，如果失败则使用默认列表
+            try:
+                from nltk.corpus import stopwords
+                stop_words = set(stopwords.words('english'))
+            except LookupError:
+                print("使用默认停用词列表...")
+                stop_words = self._get_default_stopwords()
+            self._stop_words = stop_words | self.CUSTOM_STOPWORDS
+        
+        if self._active_tokenizer is None:
+            try:
+                from nltk.tokenize import word_tokenize
+                word_tokenize("probe")
+                self._active_tokenizer = 'nltk'
+            except Exception:
+                print("NLTK分词器不可用，使用简单分词...")
+                self._active_tokenizer = 'whitespace'
     
     def _download_nltk_data(self):
         """下载必需的NLTK数据"""
@@ -80,34 +170,26 @@ class TextProcessor:
         text = text.lower()
         
         # 去除HTML标签
-        text = re.sub(r'<[^>]+>', '', text)
+        text = self.HTML_TAG_PATTERN.sub('', text)
         
         # 去除URL
-        text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', text)
+        text = self.URL_PATTERN.sub('', text)
         
         # 去除邮箱
-        text = re.sub(r'\S+@\S+', '', text)
+        text = self.EMAIL_PATTERN.sub('', text)
         
         # 去除数字（可选）
         # text = re.sub(r'\d+', '', text)
         
         # 去除多余的空白
-        text = re.sub(r'\s+', ' ', text)
+        text = self.WHITESPACE_PATTERN.sub(' ', text)
         
         return text.strip()
     
     def tokenize(self, text: str) -> List[str]:
         """分词"""
-        if not text:
-            return []
-        
-        try:
-            # 尝试使用NLTK分词
-            tokens = word_tokenize(text)
-        except:
-            # 如果NLTK分词失败，使用简单的空格分词
-            print("NLTK分词失败，使用简单分词...")
-            tokens = text.split()
+        # NLTK分词器不可用时使用简单的空格分词
+        tokens = self.tokenize_words(text)
         
         # 过滤掉标点符号和单字符词
         tokens = [token for token in tokens 
@@ -120,25 +202,216 @@ class TextProcessor:
         return [token for token in tokens if token.lower() not in self.stop_words]
     
     def stem_words(self, tokens: List[str]) -> List[str]:
-        """词干提取"""
-        return [self.stemmer.stem(token) for token in tokens]
+        """词干提取（只读取词干缓存，不登记新词汇）"""
+        return list(self._lookup_terms(tokens))
+    
+    def _lookup_terms(self, tokens: Iterable[str]) -> Iterator[str]:
+        """
+        只读的词干提取：缓存中有的词形直接取得词汇，没有的直接提取词干
+        
+        不登记词汇ID也不写入缓存，查询、诊断等非构建调用不会使词汇表增长。
+        """
+        token_cache = self._token_cache
+        terms = self.terms
+        for token in tokens:
+            term_id = token_cache.get(token)
+            if term_id is None:
+                self.cache_misses += 1
+                yield self.stemmer.stem(token)
+            else:
+                self.cache_hits += 1
+                yield terms[term_id]
+    
+    def get_term_ids(self, tokens: List[str]) -> List[int]:
+        """
+        提取词干并返回词汇ID（构建用：登记新词汇，只应由DocumentProcessor构建文档时调用）
+        
+        同一词形只在第一次出现时调用词干提取器，之后直接从缓存取得词汇ID。
+        不同词形提取出相同词干时共用同一个词汇ID。
+        """
+        token_cache = self._token_cache
+        term_ids = []
+        misses = 0
+        for token in tokens:
+            term_id = token_cache.get(token)
+            if term_id is None:
+                term_id = self._add_token(token)
+                misses += 1
+            term_ids.append(term_id)
+        
+        self.cache_misses += misses
+        self.cache_hits += len(tokens) - misses
+        return term_ids
+    
+    def _add_token(self, token: str) -> int:
+        """提取新词形的词干，登记词汇ID并写入缓存"""
+        term_id = self.add_term(self.stemmer.stem(token))
+        self._token_cache[token] = term_id
+        return term_id
+    
+    def add_term(self, term: str) -> int:
+        """登记词汇（已提取词干的词），返回词汇ID（构建用）"""
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            term_id = len(self.terms)
+            self.term_ids[term] = term_id
+            self.terms.append(term)
+        return term_id
+    
+    def get_term(self, term_id: int) -> str:
+        """根据词汇ID获取词汇"""
+        return self.terms[term_id]
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取词干缓存的命中统计"""
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "缓存词形数": len(self._token_cache),
+            "词汇数": len(self.terms),
+            "命中次数": self.cache_hits,
+            "未命中次数": self.cache_misses,
+            "命中率": self.cache_hits / lookups if lookups else 0.0
+        }
+    
+    def reset_vocabulary(self) -> None:
+        """开始新的构建：创建新的词汇表和词形缓存（之前构建的文档仍引用原来的词汇表）"""
+        self.terms = []  # 词汇ID -> 词干提取后的词汇
+        self.term_ids = {}  # 词干提取后的词汇 -> 词汇ID
+        self._token_cache = {}  # 规范化后的词形 -> 词汇ID
+        self._regex_word_cache = {}  # 正则分词：空白切分的词 -> 分词并过滤后的词
+        self.cache_hits = 0
+        self.cache_misses = 0
+    
+    def clear_cache(self) -> None:
+        """清空词形缓存和命中统计（词汇ID保持不变）"""
+        self._token_cache = {}
+        self._regex_word_cache = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
     
     def process_text(self, text: str, use_stemming: bool = True) -> List[str]:
-        """完整的文本处理流程"""
-        # 清洗文本
-        cleaned_text = self.clean_text(text)
+        """完整的文本处理流程（清洗、分词、去停用词、词干提取），只读取缓存，不登记新词汇"""
+        return list(self.iter_tokens(text, use_stemming))
+    
+    def process_query(self, text: str) -> List[str]:
+        """查询文本处理：与process_text相同，只读取词干缓存，查询不会使词汇表增长"""
+        return self.process_text(text)
+    
+    def process_text_ids(self, text: str) -> array:
+        """完整的文本处理流程，返回处理后词汇的ID数组（array('I')）；构建用，登记新词汇"""
+        return array('I', self.iter_term_ids(text))
+    
+    def iter_tokens(self, text: str, use_stemming: bool = True) -> Iterator[str]:
+        """
+        单次遍历的文本处理流程，逐个产出处理后的词汇
         
-        # 分词
-        tokens = self.tokenize(cleaned_text)
+        结果与依次调用clean_text、tokenize、remove_stopwords、stem_words相同，
+        但不构建中间列表：不含HTML标签、URL和邮箱的文本（绝大多数）跳过clean_text的正则替换，
+        按空白切分后每个词在一次循环中完成分词、过滤、去停用词和词干提取（经词干缓存）。
+        正则分词规则只依赖空白之间的内容，每个词的分词结果按词缓存，重复出现的词不再执行正则替换。
+        NLTK分词需要先分句，无法逐词处理，仍对整段文本分词后再逐词过滤。
+        只读取词干缓存和正则分词缓存，不登记新词汇（构建文档使用iter_term_ids）。
+        """
+        words = self._iter_words(text, cache_words=False)
+        return self._lookup_terms(words) if use_stemming else words
+    
+    def iter_term_ids(self, text: str) -> Iterator[int]:
+        """单次遍历的文本处理流程，逐个产出处理后词汇的ID；构建用，新词形登记词汇ID并写入缓存"""
+        token_cache = self._token_cache
+        for word in self._iter_words(text):
+            term_id = token_cache.get(word)
+            if term_id is None:
+                term_id = self._add_token(word)
+                self.cache_misses += 1
+            else:
+                self.cache_hits += 1
+            yield term_id
+    
+    def _iter_words(self, text: str, cache_words: bool = True) -> Iterator[str]:
+        """
+        清洗、分词并过滤标点、单字符词和停用词（不提取词干），逐个产出词
         
-        # 去停用词
-        tokens = self.remove_stopwords(tokens)
+        Args:
+            text: 原始文本
+            cache_words: 正则分词时是否把新词的分词结果写入缓存（查询处理不写入，缓存不随查询增长）
+        """
+        if not text:
+            return
         
-        # 词干提取（可选）
-        if use_stemming:
-            tokens = self.stem_words(tokens)
+        lowered = text.lower()
+        if self.NOISE_PATTERN.search(lowered):
+            lowered = self.clean_text(text)
+        # 不含HTML标签、URL和邮箱时清洗只剩合并空白，按空白切分的结果与clean_text后相同
         
-        return tokens
+        punctuation = string.punctuation
+        stop_words = self.stop_words
+        active_tokenizer = self.get_active_tokenizer()
+        if active_tokenizer == 'whitespace':
+            for word in lowered.split():
+                if len(word) > 1 and word not in punctuation and word not in stop_words:
+                    yield word
+        elif active_tokenizer == 'regex':
+            # 正则规则的前后文只到相邻的空白为止：词前的空白与文本开头等价，
+            # 词后补一个空白与后面还有词等价（最后一个词不补，也不缓存）
+            word_cache = self._regex_word_cache
+            words = lowered.split()
+            last = len(words) - 1
+            for i, word in enumerate(words):
+                tokens = word_cache.get(word) if i < last else None
+                if tokens is None:
+                    tokens = tuple(token for token in self.regex_tokenize(word + ' ' if i < last else word)
+                                   if len(token) > 1 and token not in punctuation and token not in stop_words)
+                    if cache_words and i < last:
+                        word_cache[word] = tokens
+                yield from tokens
+        else:
+            # NLTK分词需要先分句，对整段文本分词后再逐词过滤
+            for word in self.tokenize_words(' '.join(lowered.split())):
+                if len(word) > 1 and word not in punctuation and word not in stop_words:
+                    yield word
+    
+    def tokenize_words(self, text: str) -> List[str]:
+        """分词（不过滤标点和单字符词）"""
+        if not text:
+            return []
+        
+        active_tokenizer = self.get_active_tokenizer()
+        if active_tokenizer == 'nltk':
+            from nltk.tokenize import word_tokenize
+            return word_tokenize(text)
+        if active_tokenizer == 'regex':
+            return self.regex_tokenize(text)
+        return text.split()
+    
+    def regex_tokenize(self, text: str) -> List[str]:
+        """内置正则分词（输入应为clean_text清洗后的文本）"""
+        for pattern, replacement in self.REGEX_TOKENIZER_RULES:
+            text = pattern.sub(replacement, text)
+        return text.split()
+    
+    def get_active_tokenizer(self) -> str:
+        """获取实际使用的分词方式，auto模式下只检测一次NLTK分词器是否可用"""
+        if self._active_tokenizer is None:
+            self.load_resources()
+        return self._active_tokenizer
+    
+    def get_processing_config(self) -> Dict[str, Any]:
+        """
+        获取影响处理结果的配置（分词器、停用词表、词干提取器），用于判断索引快照是否可复用
+        
+        只使用配置的分词器名称，不加载NLTK：auto模式的停用词来自NLTK数据，
+        NLTK数据变化（如新安装punkt）后需要用 --rebuild-index 重建索引。
+        """
+        if self.tokenizer == 'auto':
+            stopwords = "nltk"
+        else:
+            stopwords = hashlib.md5("\n".join(sorted(self._stop_words)).encode('utf-8')).hexdigest()
+        
+        return {
+            "tokenizer": self.tokenizer,
+            "stemmer": "PorterStemmer",
+            "stopwords": stopwords
+        }
     
     def get_vocabulary(self, texts: List[str]) -> Set[str]:
         """获取词汇表"""
@@ -180,6 +453,7 @@ if __name__ == "__main__":
         # 词干提取
         stemmed = processor.stem_words(no_stops)
         print(f"词干提取: {stemmed}")
+        print(f"词汇ID: {processor.get_term_ids(no_stops)}")
         
         # 完整处理
         processed = processor.process_text(text)
@@ -189,4 +463,9 @@ if __name__ == "__main__":
     print(f"\n=== 词汇表 ===")
     vocab = processor.get_vocabulary(test_texts)
     print(f"词汇表大小: {len(vocab)}")
-    print(f"词汇表示例: {list(vocab)[:10]}")
\ No newline at end of file
+    print(f"词汇表示例: {list(vocab)[:10]}")
+    
+    # 词干缓存统计
+    print(f"\n=== 词干缓存 ===")
+    for key, value in processor.get_cache_stats().items():
+        print(f"{key}: {value:.2%}" if isinstance(value, float) else f"{key}: {value}")
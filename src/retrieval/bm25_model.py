@@ -1,6 +1,13 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
 import math
 from typing import List, Dict, Tuple
-from collections import defaultdict, Counter
+from collections import Counter
+import numpy as np
+from indexing.term_dictionary import TermDictionary
+from retrieval.similarity_calculator import SimilarityCalculator
 
 class BM25Model:
     """BM25检索模型：更适合短查询和实际检索场景的算法"""
@@ -22,64 +29,64 @@ class BM25Model:
         self.document_lengths = []  # 每个文档的长度
         self.average_doc_length = 0
         self.document_count = 0
-        self.document_term_frequencies = []  # 每个文档的词频字典
+        
+        # 倒排数据（CSR）：第i行对应vocabulary[i]，文档ID和词频数组直接引用全局词典的数组，不另存副本
+        self.term_rows = {}  # {term: row}
+        self.posting_indptr = np.zeros(1, dtype=np.int64)
+        self.posting_doc_ids = np.zeros(0, dtype=np.int32)
+        self.posting_tfs = np.zeros(0, dtype=np.int32)
+        self.idf_array = np.zeros(0, dtype=np.float64)  # 按词汇行排列的IDF值
+        self.length_norm_array = np.zeros(0, dtype=np.float64)  # 文档长度归一化项数组
         
         # 预计算的IDF值
         self.idf_values = {}
+        
+        # 预计算的文档长度归一化项：k1 * (1 - b + b * dl / avgdl)
+        self.length_norms = []
     
     def build_model(self, documents_tokens: List[List[str]]) -> None:
         """构建BM25模型"""
-        self.document_count = len(documents_tokens)
-        print(f"开始构建BM25模型，共{self.document_count}个文档...")
+        self.build_from_dictionary(TermDictionary.from_token_lists(documents_tokens))
+    
+    def build_from_dictionary(self, term_dictionary: TermDictionary, field: str = TermDictionary.ALL_FIELDS) -> None:
+        """
+        从全局词典构建BM25模型，直接使用词典中统计好的文档频率、文档长度和倒排数据
         
-        # 1. 构建词汇表和统计文档频率
-        self._build_vocabulary_and_df(documents_tokens)
+        Args:
+            term_dictionary: 已构建的全局词典
+            field: 使用的字段（'title'、'content'、'summary'或'all'）
+        """
+        self.document_count = term_dictionary.document_count
+        print(f"开始构建BM25模型，共{self.document_count}个文档...")
         
-        # 2. 计算文档长度统计
-        self._calculate_document_lengths(documents_tokens)
+        # 1. 词汇表和文档频率（只包含该字段中出现过的词汇）
+        terms, indptr, doc_ids, term_frequencies = term_dictionary.get_field_postings(field)
+        self.vocabulary = terms
+        if terms is term_dictionary.terms:
+            self.term_rows = term_dictionary.term_ids
+        else:
+            self.term_rows = {term: row for row, term in enumerate(terms)}
+        self.document_frequencies = dict(zip(terms, np.diff(indptr).tolist()))
+        print(f"词汇表构建完成，包含{len(self.vocabulary)}个唯一词汇")
         
-        # 3. 构建每个文档的词频统计
-        self._build_document_term_frequencies(documents_tokens)
+        # 2. 文档长度统计
+        self.document_lengths = term_dictionary.field_lengths[field]
+        self.average_doc_length = sum(self.document_lengths) / len(self.document_lengths)
+        print(f"文档长度统计完成，平均长度: {self.average_doc_length:.1f}")
         
-        # 4. 预计算IDF值
+        # 3. 预计算IDF值
         self._calculate_idf_values()
         
+        # 4. 引用词典的倒排数据并预计算长度归一化项
+        self.posting_indptr = indptr
+        self.posting_doc_ids = doc_ids
+        self.posting_tfs = term_frequencies
+        self._calculate_length_norms()
+        
         print(f"BM25模型构建完成！")
         print(f"词汇表大小: {len(self.vocabulary)}")
         print(f"平均文档长度: {self.average_doc_length:.1f}")
     
-    def _build_vocabulary_and_df(self, documents_tokens: List[List[str]]) -> None:
-        """构建词汇表并计算文档频率"""
-        vocab_set = set()
-        self.document_frequencies = defaultdict(int)
-        
-        for tokens in documents_tokens:
-            unique_tokens = set(tokens)
-            vocab_set.update(unique_tokens)
-            
-            # 统计文档频率
-            for token in unique_tokens:
-                self.document_frequencies[token] += 1
-        
-        self.vocabulary = sorted(list(vocab_set))
-        print(f"词汇表构建完成，包含{len(self.vocabulary)}个唯一词汇")
-    
-    def _calculate_document_lengths(self, documents_tokens: List[List[str]]) -> None:
-        """计算文档长度统计"""
-        self.document_lengths = [len(tokens) for tokens in documents_tokens]
-        self.average_doc_length = sum(self.document_lengths) / len(self.document_lengths)
-        print(f"文档长度统计完成，平均长度: {self.average_doc_length:.1f}")
-    
-    def _build_document_term_frequencies(self, documents_tokens: List[List[str]]) -> None:
-        """构建每个文档的词频统计"""
-        self.document_term_frequencies = []
-        
-        for tokens in documents_tokens:
-            tf_dict = dict(Counter(tokens))
-            self.document_term_frequencies.append(tf_dict)
-        
-        print(f"文档词频统计完成")
-    
     def _calculate_idf_values(self) -> None:
         """预计算所有词汇的IDF值"""
         self.idf_values = {}
@@ -90,33 +97,131 @@ class BM25Model:
             idf = math.log((self.document_count - df + 0.5) / (df + 0.5))
             self.idf_values[term] = idf
         
+        self.idf_array = np.array(list(self.idf_values.values()), dtype=np.float64)
         print(f"IDF值计算完成")
     
-    def get_query_document_scores(self, query_tokens: List[str]) -> List[float]:
-        """计算查询与所有文档的BM25分数"""
-        scores = []
+    def _calculate_length_norms(self) -> None:
+        """预计算每个文档的长度归一化项，查询时无需重复计算"""
+        self.length_norms = []
         
-        for doc_id in range(self.document_count):
-            score = self._calculate_bm25_score(query_tokens, doc_id)
-            scores.append(score)
+        for doc_length in self.document_lengths:
+            relative_length = doc_length / self.average_doc_length if self.average_doc_length else 0.0
+            self.length_norms.append(self.k1 * (1 - self.b + self.b * relative_length))
         
-        return scores
+        self.length_norm_array = np.array(self.length_norms, dtype=np.float64)
+    
+    def _tf_components(self, doc_ids: np.ndarray, term_frequencies: np.ndarray) -> np.ndarray:
+        """批量计算BM25公式的TF部分：tf * (k1 + 1) / (tf + 长度归一化项)"""
+        return (term_frequencies * (self.k1 + 1)) / (term_frequencies + self.length_norm_array[doc_ids])
+    
+    def _get_postings(self, term: str, candidate_ids: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """获取词汇的倒排列表 (文档ID数组, 词频数组)，文档ID递增；指定candidate_ids时只保留其中的文档"""
+        row = self.term_rows.get(term)
+        if row is None:
+            return self.posting_doc_ids[:0], self.posting_tfs[:0]
+        start, end = self.posting_indptr[row], self.posting_indptr[row + 1]
+        doc_ids, term_frequencies = self.posting_doc_ids[start:end], self.posting_tfs[start:end]
+        if candidate_ids is not None:
+            positions = TermDictionary.select_postings(doc_ids, candidate_ids)
+            return doc_ids[positions], term_frequencies[positions]
+        return doc_ids, term_frequencies
+    
+    def _get_term_frequency(self, term: str, doc_id: int) -> int:
+        """获取词汇在文档中的词频（倒排列表内二分查找）"""
+        doc_ids, term_frequencies = self._get_postings(term)
+        position = int(np.searchsorted(doc_ids, doc_id))
+        if position < len(doc_ids) and doc_ids[position] == doc_id:
+            return int(term_frequencies[position])
+        return 0
+    
+    def get_term_entries(self, term: str, candidate_ids: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        获取词汇的倒排条目 (文档ID数组, 条目得分 idf * tf_component)，条目得分在查询时按需计算
+        
+        指定candidate_ids（按文档ID升序）时只取其中文档的条目。
+        """
+        doc_ids, term_frequencies = self._get_postings(term, candidate_ids)
+        if len(doc_ids) == 0:
+            return doc_ids, np.zeros(0, dtype=np.float64)
+        return doc_ids, self.idf_array[self.term_rows[term]] * self._tf_components(doc_ids, term_frequencies)
+    
+    def _gather_query_postings(self, query_tokens: List[str], candidate_ids: np.ndarray = None
+                               ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        拼接查询词汇的倒排列表（按查询词汇首次出现的顺序），指定candidate_ids时只保留其中的文档
+        
+        Returns:
+            (文档ID数组, 词频数组, 每个条目所属词汇的IDF数组, 每个条目所属词汇的查询词频数组)
+        """
+        rows, query_tfs, postings = [], [], []
+        for term, query_tf in Counter(query_tokens).items():
+            row = self.term_rows.get(term)
+            if row is not None:
+                rows.append(row)
+                query_tfs.append(query_tf)
+                postings.append(self._get_postings(term, candidate_ids))
+        
+        if not rows:
+            empty = np.zeros(0, dtype=np.float64)
+            return np.zeros(0, dtype=np.int64), empty, empty, empty
+        
+        row_sizes = [len(doc_ids) for doc_ids, _ in postings]
+        doc_ids = np.concatenate([doc_ids for doc_ids, _ in postings])
+        term_frequencies = np.concatenate([term_frequencies for _, term_frequencies in postings])
+        entry_idfs = np.repeat(self.idf_array[rows], row_sizes)
+        entry_query_tfs = np.repeat(np.array(query_tfs, dtype=np.float64), row_sizes)
+        return doc_ids, term_frequencies, entry_idfs, entry_query_tfs
+    
+    def get_query_score_array(self, query_tokens: List[str], candidate_ids: np.ndarray = None) -> np.ndarray:
+        """
+        向量化计算查询与所有文档的BM25分数，返回长度为文档数的数组
+        
+        拼接所有查询词汇的倒排列表后一次计算全部条目的得分，再用bincount按文档累加。
+        bincount按条目顺序（即查询词汇顺序）累加，与逐词汇累加的浮点结果完全一致。
+        指定candidate_ids（按文档ID升序的数组）时，各倒排列表先用二分查找与候选文档求交集，
+        只为候选文档计分，其余文档分数为0。
+        """
+        return self._score_postings(*self._gather_query_postings(query_tokens, candidate_ids))
+    
+    def _score_postings(self, doc_ids: np.ndarray, term_frequencies: np.ndarray, entry_idfs: np.ndarray,
+                        entry_query_tfs: np.ndarray) -> np.ndarray:
+        """计算拼接后的倒排条目得分并按文档累加，返回长度为文档数的数组"""
+        if len(doc_ids) == 0:
+            return np.zeros(self.document_count, dtype=np.float64)
+        
+        contributions = entry_idfs * self._tf_components(doc_ids, term_frequencies) * entry_query_tfs
+        return np.bincount(doc_ids, weights=contributions, minlength=self.document_count)
+    
+    def score_candidates(self, query_tokens: List[str]) -> Dict[int, float]:
+        """
+        计算查询词汇倒排列表中文档的BM25分数
+        
+        只包含出现在查询词汇倒排列表中的文档，返回 {doc_id: score}，
+        未出现在任何倒排列表中的文档分数为0，不包含在结果中。
+        """
+        postings = self._gather_query_postings(query_tokens)
+        candidates = np.unique(postings[0])
+        scores = self._score_postings(*postings)
+        return dict(zip(candidates.tolist(), scores[candidates].tolist()))
+    
+    def get_query_document_scores(self, query_tokens: List[str]) -> List[float]:
+        """计算查询与所有文档的BM25分数"""
+        return self.get_query_score_array(query_tokens).tolist()
     
     def _calculate_bm25_score(self, query_tokens: List[str], doc_id: int) -> float:
         """计算查询与特定文档的BM25分数"""
         score = 0.0
-        doc_tf = self.document_term_frequencies[doc_id]
         doc_length = self.document_lengths[doc_id]
         
         # 对查询中的每个词汇计算BM25得分
         query_term_counts = Counter(query_tokens)
         
         for term, query_tf in query_term_counts.items():
-            if term not in self.vocabulary:
+            if term not in self.idf_values:
                 continue
             
             # 获取词汇在文档中的频率
-            term_freq = doc_tf.get(term, 0)
+            term_freq = self._get_term_frequency(term, doc_id)
             
             if term_freq == 0:
                 continue
@@ -138,26 +243,27 @@ class BM25Model:
         return score
     
     def search(self, query_tokens: List[str], top_k: int = 10) -> List[Tuple[int, float]]:
-        """执行BM25搜索"""
+        """
+        执行BM25搜索：向量化计算所有文档分数后部分选择Top-K
+        
+        Args:
+            query_tokens: 查询词汇列表
+            top_k: 返回结果数量
+            
+        Returns:
+            [(doc_id, score), ...]，按分数降序、文档ID升序排列
+        """
         if not query_tokens:
             return []
         
         # 计算所有文档的BM25分数
-        scores = self.get_query_document_scores(query_tokens)
-        
-        # 创建(文档ID, 分数)对并排序
-        doc_score_pairs = [(doc_id, score) for doc_id, score in enumerate(scores)]
-        doc_score_pairs.sort(key=lambda x: x[1], reverse=True)
-        
-        # 返回前top_k个结果
-        return doc_score_pairs[:top_k]
+        return SimilarityCalculator().select_top_k(self.get_query_score_array(query_tokens), top_k)
     
     def explain_score(self, query_tokens: List[str], doc_id: int) -> Dict[str, any]:
         """解释BM25分数计算过程"""
         if doc_id >= self.document_count:
             return {}
         
-        doc_tf = self.document_term_frequencies[doc_id]
         doc_length = self.document_lengths[doc_id]
         query_term_counts = Counter(query_tokens)
         
@@ -173,10 +279,10 @@ class BM25Model:
         total_score = 0.0
         
         for term, query_tf in query_term_counts.items():
-            if term not in self.vocabulary:
+            if term not in self.idf_values:
                 continue
             
-            term_freq = doc_tf.get(term, 0)
+            term_freq = self._get_term_frequency(term, doc_id)
             if term_freq == 0:
                 continue
             
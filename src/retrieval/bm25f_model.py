@@ -0,0 +1,263 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import math
+from typing import List, Dict, Tuple, Any
+from collections import Counter
+import numpy as np
+from indexing.term_dictionary import TermDictionary
+from retrieval.similarity_calculator import SimilarityCalculator
+
+class BM25FModel:
+    """
+    BM25F检索模型：在同一个索引上对标题、摘要、内容三个字段加权计分
+    
+    每个字段的词频先按该字段的长度归一化并乘以字段权重，累加为伪词频，再统一做词频饱和：
+        tf~ = Σ_f w_f * tf_f / (1 - b_f + b_f * len_f / avglen_f)
+        score = Σ_t idf(t) * tf~ * (k1 + 1) / (k1 + tf~) * 查询词频
+    倒排条目与全局词典'all'字段一致，每个条目保存各字段的词频，一次遍历即可得到多字段分数。
+    """
+    
+    FIELDS = ('title', 'summary', 'content')
+    
+    def __init__(self, k1: float = 1.2, field_weights: Dict[str, float] = None, field_b: Dict[str, float] = None):
+        """
+        初始化BM25F模型
+        
+        Args:
+            k1: 控制伪词频饱和度的参数
+            field_weights: 各字段权重，默认标题3.0、摘要2.0、内容1.0
+            field_b: 各字段的长度归一化参数，默认均为0.75
+        """
+        self.k1 = k1
+        self.field_weights = dict(field_weights or {'title': 3.0, 'summary': 2.0, 'content': 1.0})
+        self.field_b = dict(field_b or {field: 0.75 for field in self.FIELDS})
+        
+        # 模型数据
+        self.vocabulary = []
+        self.term_rows = {}  # {term: row}，与全局词典共享
+        self.document_frequencies = {}  # {term: df}
+        self.document_count = 0
+        self.idf_values = {}
+        self.idf_array = np.zeros(0, dtype=np.float64)
+        
+        # 倒排数据（CSR）：第i个词汇的条目为 posting_doc_ids[posting_indptr[i]:posting_indptr[i + 1]]
+        self.posting_indptr = np.zeros(1, dtype=np.int64)
+        self.posting_doc_ids = np.zeros(0, dtype=np.int32)
+        self.field_tfs = {}  # {field: 与倒排条目对应的字段词频数组}
+        self.field_lengths = {}  # {field: 每个文档的字段长度数组}
+        self.average_field_lengths = {}  # {field: 平均字段长度}
+        
+        # 预计算的条目得分 idf * tf~ * (k1 + 1) / (k1 + tf~)
+        self.entry_scores = np.zeros(0, dtype=np.float64)
+    
+    def build_from_dictionary(self, term_dictionary: TermDictionary) -> None:
+        """从全局词典构建BM25F模型：条目取'all'字段的倒排数据，各字段词频按(词汇, 文档)对齐"""
+        self.document_count = term_dictionary.document_count
+        print(f"开始构建BM25F模型，共{self.document_count}个文档...")
+        
+        # 1. 词汇表、文档频率和IDF（与BM25相同，基于整篇文档）
+        self.vocabulary = term_dictionary.terms
+        self.term_rows = term_dictionary.term_ids
+        indptr, doc_ids, _ = term_dictionary.postings[TermDictionary.ALL_FIELDS]
+        self.posting_indptr = indptr
+        self.posting_doc_ids = doc_ids
+        self.document_frequencies = dict(zip(self.vocabulary, np.diff(indptr).tolist()))
+        self.idf_values = {}
+        for term, df in self.document_frequencies.items():
+            self.idf_values[term] = math.log((self.document_count - df + 0.5) / (df + 0.5))
+        self.idf_array = np.array(list(self.idf_values.values()), dtype=np.float64)
+        
+        # 2. 各字段词频对齐到'all'字段的倒排条目：条目键为 词汇ID * 文档数 + 文档ID，两边均已排序
+        document_count = max(self.document_count, 1)
+        entry_term_ids = np.repeat(np.arange(len(self.vocabulary), dtype=np.int64), np.diff(indptr))
+        entry_keys = entry_term_ids * document_count + doc_ids
+        for field in self.FIELDS:
+            field_indptr, field_doc_ids, field_tfs = term_dictionary.postings[field]
+            field_term_ids = np.repeat(np.arange(len(self.vocabulary), dtype=np.int64), np.diff(field_indptr))
+            positions = np.searchsorted(entry_keys, field_term_ids * document_count + field_doc_ids)
+            self.field_tfs[field] = np.zeros(len(entry_keys), dtype=np.float64)
+            self.field_tfs[field][positions] = field_tfs
+            
+            self.field_lengths[field] = np.array(term_dictionary.field_lengths[field], dtype=np.float64)
+            self.average_field_lengths[field] = float(self.field_lengths[field].mean()) if self.document_count else 0.0
+        
+        # 3. 预计算条目得分
+        self._calculate_entry_scores()
+        
+        print(f"BM25F模型构建完成！")
+        print(f"词汇表大小: {len(self.vocabulary)}")
+        print(f"平均字段长度: " + ", ".join(f"{field} {self.average_field_lengths[field]:.1f}" for field in self.FIELDS))
+    
+    def set_parameters(self, k1: float = None, field_weights: Dict[str, float] = None,
+                       field_b: Dict[str, float] = None) -> None:
+        """调整k1、字段权重或字段长度归一化参数，只重新计算条目得分，无需重建索引"""
+        if k1 is not None:
+            self.k1 = k1
+        if field_weights is not None:
+            self.field_weights.update(field_weights)
+        if field_b is not None:
+            self.field_b.update(field_b)
+        self._calculate_entry_scores()
+    
+    def _calculate_entry_scores(self) -> None:
+        """根据各字段词频和长度计算每个倒排条目的伪词频和得分"""
+        pseudo_tfs = np.zeros(len(self.posting_doc_ids), dtype=np.float64)
+        for field in self.FIELDS:
+            weight = self.field_weights.get(field, 0.0)
+            if weight == 0 or field not in self.field_tfs:
+                continue
+            length_norms = self._field_length_norms(field)
+            pseudo_tfs += weight * self.field_tfs[field] / length_norms[self.posting_doc_ids]
+        
+        entry_idfs = np.repeat(self.idf_array, np.diff(self.posting_indptr))
+        self.entry_scores = entry_idfs * pseudo_tfs * (self.k1 + 1) / (self.k1 + pseudo_tfs)
+    
+    def _field_length_norms(self, field: str) -> np.ndarray:
+        """字段的长度归一化项 1 - b + b * len / avglen，字段在所有文档中为空时为1"""
+        average_length = self.average_field_lengths[field]
+        if average_length <= 0:
+            return np.ones(self.document_count, dtype=np.float64)
+        b = self.field_b.get(field, 0.75)
+        return 1 - b + b * self.field_lengths[field] / average_length
+    
+    def get_entry_scores(self) -> np.ndarray:
+        """每个倒排条目与查询无关的得分，与posting_doc_ids一一对应"""
+        return self.entry_scores
+    
+    def get_term_entries(self, term: str, candidate_ids: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """获取词汇的倒排条目 (文档ID数组, 条目得分)，均为模型数组的切片；指定candidate_ids时只保留其中的文档"""
+        row = self.term_rows.get(term)
+        if row is None:
+            return self.posting_doc_ids[:0], self.entry_scores[:0]
+        start, end = self.posting_indptr[row], self.posting_indptr[row + 1]
+        doc_ids, entry_scores = self.posting_doc_ids[start:end], self.entry_scores[start:end]
+        if candidate_ids is not None:
+            positions = TermDictionary.select_postings(doc_ids, candidate_ids)
+            return doc_ids[positions], entry_scores[positions]
+        return doc_ids, entry_scores
+    
+    def get_query_score_array(self, query_tokens: List[str], candidate_ids: np.ndarray = None) -> np.ndarray:
+        """一次遍历查询词汇的倒排条目，计算查询与所有文档的BM25F分数；指定candidate_ids时只为其中的文档计分"""
+        entries, query_tfs = [], []
+        for term, query_tf in Counter(query_tokens).items():
+            if term in self.term_rows:
+                entries.append(self.get_term_entries(term, candidate_ids))
+                query_tfs.append(query_tf)
+        
+        if not entries:
+            return np.zeros(self.document_count, dtype=np.float64)
+        
+        doc_ids = np.concatenate([doc_ids for doc_ids, _ in entries])
+        entry_query_tfs = np.repeat(np.array(query_tfs, dtype=np.float64), [len(doc_ids) for doc_ids, _ in entries])
+        weights = np.concatenate([entry_scores for _, entry_scores in entries]) * entry_query_tfs
+        return np.bincount(doc_ids, weights=weights, minlength=self.document_count)
+    
+    def get_query_document_scores(self, query_tokens: List[str]) -> List[float]:
+        """计算查询与所有文档的BM25F分数"""
+        return self.get_query_score_array(query_tokens).tolist()
+    
+    def search(self, query_tokens: List[str], top_k: int = 10) -> List[Tuple[int, float]]:
+        """执行BM25F搜索，返回 [(doc_id, score), ...]，按分数降序、文档ID升序排列"""
+        if not query_tokens:
+            return []
+        
+        return SimilarityCalculator().select_top_k(self.get_query_score_array(query_tokens), top_k)
+    
+    def explain_score(self, query_tokens: List[str], doc_id: int) -> Dict[str, Any]:
+        """解释BM25F分数计算过程"""
+        if doc_id >= self.document_count:
+            return {}
+        
+        explanation = {
+            'document_id': doc_id,
+            'field_lengths': {field: float(self.field_lengths[field][doc_id]) for field in self.FIELDS},
+            'bm25f_parameters': {'k1': self.k1, 'field_weights': self.field_weights, 'field_b': self.field_b},
+            'term_scores': [],
+            'total_score': 0.0
+        }
+        
+        total_score = 0.0
+        for term, query_tf in Counter(query_tokens).items():
+            row = self.term_rows.get(term)
+            if row is None:
+                continue
+            start, end = self.posting_indptr[row], self.posting_indptr[row + 1]
+            position = start + int(np.searchsorted(self.posting_doc_ids[start:end], doc_id))
+            if position >= end or self.posting_doc_ids[position] != doc_id:
+                continue
+            
+            field_tfs = {field: float(self.field_tfs[field][position]) for field in self.FIELDS}
+            pseudo_tf = sum(self.field_weights.get(field, 0.0) * field_tfs[field] /
+                            self._field_length_norms(field)[doc_id] for field in self.FIELDS)
+            term_score = float(self.entry_scores[position]) * query_tf
+            total_score += term_score
+            
+            explanation['term_scores'].append({
+                'term': term,
+                'query_tf': query_tf,
+                'field_tfs': field_tfs,
+                'pseudo_tf': pseudo_tf,
+                'idf': self.idf_values[term],
+                'term_score': term_score
+            })
+        
+        explanation['total_score'] = total_score
+        return explanation
+    
+    def get_model_stats(self) -> Dict[str, Any]:
+        """获取模型统计信息"""
+        if not self.vocabulary:
+            return {}
+        
+        return {
+            'document_count': self.document_count,
+            'vocabulary_size': len(self.vocabulary),
+            'posting_entries': len(self.posting_doc_ids),
+            'average_field_lengths': self.average_field_lengths,
+            'bm25f_parameters': {
+                'k1': self.k1,
+                'field_weights': self.field_weights,
+                'field_b': self.field_b
+            }
+        }
+
+
+# 测试代码
+if __name__ == "__main__":
+    print("=== BM25F模型测试 ===")
+    
+    class MockDocument:
+        def __init__(self, title, content, summary):
+            self.processed_title = title.split()
+            self.processed_content = content.split()
+            self.processed_summary = summary.split()
+    
+    documents = [
+        MockDocument("climat chang", "global warm climat polici", "climat chang"),
+        MockDocument("health care", "medic treatment health climat", "care"),
+        MockDocument("climat scienc", "research climat data", "scienc"),
+        MockDocument("trade war", "tariff china trade polici", "trade"),
+        MockDocument("school budget", "educ school student teacher", "school"),
+    ]
+    
+    dictionary = TermDictionary()
+    dictionary.build(documents)
+    bm25f = BM25FModel(k1=1.2)
+    bm25f.build_from_dictionary(dictionary)
+    
+    for query in [["school", "trade"], ["trade", "polici"]]:
+        print(f"\n查询: {query}")
+        for doc_id, score in bm25f.search(query, top_k=3):
+            print(f"  文档{doc_id}: BM25F分数 = {score:.3f}")
+    
+    print("\n提高标题权重后:")
+    bm25f.set_parameters(field_weights={'title': 6.0})
+    for doc_id, score in bm25f.search(["school", "trade"], top_k=3):
+        print(f"  文档{doc_id}: BM25F分数 = {score:.3f}")
+    
+    explanation = bm25f.explain_score(["school", "trade"], 4)
+    for term_info in explanation['term_scores']:
+        print(f"  {term_info['term']}: 字段词频={term_info['field_tfs']}, 伪词频={term_info['pseudo_tf']:.3f}, "
+              f"得分={term_info['term_score']:.3f}")
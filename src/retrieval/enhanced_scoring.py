@@ -0,0 +1,162 @@
+import numpy as np
+from typing import List, Dict, Any
+from collections import Counter
+
+class EnhancedScoring:
+    """
+    增强算法的融合评分器：一次遍历倒排数据得到全文BM25和多字段（各字段BM25或BM25F）分数，再与邻近度、时间新鲜度混合
+    
+    评分器不另存倒排条目，只引用各组件模型：查询时从每个模型取出查询词汇的倒排切片及条目得分
+    （idf * tf_component），以 组件编号 * 文档数 + 文档ID 作为累加键拼接后用一次bincount得到所有组件的分数。
+    同一组件内按查询词汇顺序累加，与逐模型计分一致；模型参数调整后下一次查询即使用新的条目得分。
+    """
+    
+    COMPONENTS = ('all', 'title', 'summary', 'content', 'bm25f')  # 全文模型、各字段模型及BM25F模型
+    
+    def __init__(self, field_weights: Dict[str, float] = None, multi_field_weight: float = 0.4,
+                 temporal_weight: float = 0.2):
+        """
+        初始化融合评分器
+        
+        Args:
+            field_weights: 各字段BM25分数的权重 {'title': w, 'summary': w, 'content': w}，
+                           为None且没有BM25F模型时不使用多字段分数
+            multi_field_weight: 多字段分数在内容分数中的权重
+            temporal_weight: 时间新鲜度在最终分数中的权重
+        """
+        self.field_weights = field_weights
+        self.multi_field_weight = multi_field_weight
+        self.temporal_weight = temporal_weight
+        
+        self.document_count = 0
+        self.models = {}  # {组件名: 模型}，模型需提供get_term_entries
+        self.use_bm25f = False  # 多字段分数是否来自BM25F模型
+    
+    def build(self, bm25_model: Any, field_models: Dict[str, Any] = None, bm25f_model: Any = None) -> None:
+        """
+        登记全文BM25模型和多字段模型
+        
+        Args:
+            bm25_model: 全文BM25模型，其词汇表包含所有字段的词汇
+            field_models: 各字段的BM25模型 {'title': BM25Model, ...}，缺少的字段分数为0
+            bm25f_model: BM25F模型，提供时多字段分数直接使用BM25F分数
+        """
+        models = dict(field_models or {}, all=bm25_model, bm25f=bm25f_model)
+        self.models = {name: models[name] for name in self.COMPONENTS if models.get(name) is not None}
+        self.use_bm25f = bm25f_model is not None
+        self.document_count = bm25_model.document_count
+        
+        print(f"融合评分器构建完成，多字段模型: {[name for name in self.COMPONENTS[1:] if name in self.models]}")
+    
+    def score_components(self, query_tokens: List[str], candidate_ids: np.ndarray = None) -> Dict[str, np.ndarray]:
+        """
+        一次遍历计算查询的各组件BM25原始分数，指定candidate_ids（按文档ID升序）时只为其中的文档计分
+        
+        Returns:
+            {'all': 全文BM25分数数组, 'title': ..., 'summary': ..., 'content': ..., 'bm25f': ...}
+        """
+        query_tfs = Counter(query_tokens)
+        keys, weights = [], []
+        for component, name in enumerate(self.COMPONENTS):
+            model = self.models.get(name)
+            if model is None:
+                continue
+            for term, query_tf in query_tfs.items():
+                doc_ids, entry_scores = model.get_term_entries(term, candidate_ids)
+                keys.append(component * self.document_count + doc_ids.astype(np.int64))
+                weights.append(entry_scores * query_tf)
+        
+        component_count = len(self.COMPONENTS)
+        if keys:
+            scores = np.bincount(np.concatenate(keys), weights=np.concatenate(weights),
+                                 minlength=component_count * self.document_count)
+        else:
+            scores = np.zeros(component_count * self.document_count, dtype=np.float64)
+        
+        scores = scores.reshape(component_count, self.document_count)
+        return {name: scores[component] for component, name in enumerate(self.COMPONENTS)}
+    
+    def combine(self, components: Dict[str, np.ndarray], proximity_scores: Dict[int, float] = None,
+                proximity_weight: float = 0.0, temporal_scores: np.ndarray = None) -> np.ndarray:
+        """
+        将各组件分数混合为最终分数
+        
+        全文分数按最高分归一化；多字段分数为BM25F分数或各字段分数的加权和，同样归一化后与全文分数线性组合；
+        再加上邻近度加分，最后与时间新鲜度线性组合。
+        """
+        content_scores = self._normalize(components['all'])
+        
+        if self.use_bm25f or self.field_weights is not None:
+            if self.use_bm25f:
+                multi_field_scores = components['bm25f']
+            else:
+                multi_field_scores = (self.field_weights['title'] * components['title'] +
+                                      self.field_weights['summary'] * components['summary'] +
+                                      self.field_weights['content'] * components['content'])
+            multi_field_scores = self._normalize(multi_field_scores)
+            content_scores = ((1.0 - self.multi_field_weight) * content_scores +
+                              self.multi_field_weight * multi_field_scores)
+        
+        if proximity_scores:
+            proximity_array = np.zeros(self.document_count, dtype=np.float64)
+            proximity_array[list(proximity_scores.keys())] = list(proximity_scores.values())
+            content_scores = content_scores + proximity_weight * proximity_array
+        
+        if temporal_scores is not None:
+            content_scores = (1.0 - self.temporal_weight) * content_scores + self.temporal_weight * temporal_scores
+        
+        return content_scores
+    
+    def score(self, query_tokens: List[str], proximity_scores: Dict[int, float] = None,
+              proximity_weight: float = 0.0, temporal_scores: np.ndarray = None) -> np.ndarray:
+        """计算查询与所有文档的增强算法最终分数"""
+        return self.combine(self.score_components(query_tokens), proximity_scores, proximity_weight, temporal_scores)
+    
+    @staticmethod
+    def _normalize(scores: np.ndarray) -> np.ndarray:
+        """按最高分归一化到[0,1]范围，最高分不为正时保持不变"""
+        if len(scores) and scores.max() > 0:
+            return scores / scores.max()
+        return scores
+
+
+# 测试代码
+if __name__ == "__main__":
+    import sys
+    import os
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+    from indexing.term_dictionary import TermDictionary
+    from retrieval.bm25_model import BM25Model
+    
+    print("=== 融合评分器测试 ===")
+    
+    class MockDocument:
+        def __init__(self, title, content, summary):
+            self.processed_title = title.split()
+            self.processed_content = content.split()
+            self.processed_summary = summary.split()
+    
+    documents = [
+        MockDocument("climat chang", "global warm climat polici", "climat chang"),
+        MockDocument("health care", "medic treatment health", "care"),
+        MockDocument("climat scienc", "research climat data", "scienc"),
+        MockDocument("trade war", "tariff china trade polici", "trade"),
+    ]
+    
+    dictionary = TermDictionary()
+    dictionary.build(documents)
+    bm25 = BM25Model(k1=1.2, b=0.75)
+    bm25.build_from_dictionary(dictionary)
+    field_models = {}
+    for field in ('title', 'summary', 'content'):
+        field_models[field] = BM25Model(k1=1.2, b=0.75)
+        field_models[field].build_from_dictionary(dictionary, field)
+    
+    scorer = EnhancedScoring(field_weights={'title': 0.5, 'summary': 1 / 3, 'content': 1 / 6})
+    scorer.build(bm25, field_models)
+    
+    query = ["trade", "health", "trade"]
+    components = scorer.score_components(query)
+    for name, scores in components.items():
+        print(f"{name}: {np.round(scores, 3).tolist()}")
+    print(f"最终分数: {np.round(scorer.score(query, temporal_scores=np.full(4, 0.5)), 3).tolist()}")
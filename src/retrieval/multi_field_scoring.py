@@ -1,6 +1,12 @@
-from typing import List, Dict, Any, Tuple
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from typing import List, Dict, Any, Tuple, Set, Iterable
 import math
 from collections import defaultdict, Counter
+import numpy as np
+from indexing.term_dictionary import TermDictionary
 
 class MultiFieldScoring:
     """多字段权重评分：为不同字段（标题、摘要、内容）分配不同权重"""
@@ -24,13 +30,40 @@ class MultiFieldScoring:
         self.normalized_summary_weight = summary_weight / total_weight
         self.normalized_content_weight = content_weight / total_weight
         
+        # 各字段的对数TF倒排数据，由build_field_postings从全局词典生成
+        self.field_term_ids = {}  # {term: term_id}，与全局词典共享
+        self.field_postings = {}  # {field: (indptr, doc_ids, log_tfs)}
+        self.field_lengths = {}  # {field: 每个文档的字段长度}，与全局词典共享
+        self.document_count = 0
+        
         print(f"多字段权重设置:")
         print(f"  标题权重: {self.title_weight} (归一化: {self.normalized_title_weight:.3f})")
         print(f"  摘要权重: {self.summary_weight} (归一化: {self.normalized_summary_weight:.3f})")
         print(f"  内容权重: {self.content_weight} (归一化: {self.normalized_content_weight:.3f})")
     
+    def build_field_postings(self, term_dictionary: Any) -> None:
+        """
+        从全局词典生成各字段的对数TF倒排数据（1 + log(tf)），TF-IDF多字段评分时只访问查询词汇的倒排列表
+        
+        Args:
+            term_dictionary: 已构建的全局词典（TermDictionary）
+        """
+        self.field_term_ids = term_dictionary.term_ids
+        self.field_lengths = term_dictionary.field_lengths
+        self.document_count = term_dictionary.document_count
+        self.field_postings = {}
+        
+        for field in ('title', 'summary', 'content'):
+            indptr, doc_ids, tfs = term_dictionary.postings[field]
+            max_tf = int(tfs.max()) if len(tfs) else 0
+            log_tf = np.array([0.0] + [self._log_tf(freq) for freq in range(1, max_tf + 1)], dtype=np.float64)
+            self.field_postings[field] = (indptr, doc_ids, log_tf[tfs])
+        
+        print(f"多字段对数TF倒排数据构建完成，"
+              f"条目数: {sum(len(postings[1]) for postings in self.field_postings.values())}")
+    
     def calculate_field_scores_tfidf(self, query_tokens: List[str], documents: List[Any], 
-                                   vector_space_model: Any) -> List[float]:
+                                   vector_space_model: Any, candidate_ids: np.ndarray = None) -> List[float]:
         """
         使用TF-IDF为多字段计算分数
         
@@ -38,13 +71,19 @@ class MultiFieldScoring:
             query_tokens: 查询词汇列表
             documents: 文档对象列表
             vector_space_model: 向量空间模型
-            
+            candidate_ids: 只为这些文档计分（按文档ID升序），其余文档分数为0；None表示所有文档
+        
         Returns:
             多字段加权分数列表
         """
-        multi_field_scores = []
+        if self.field_postings and len(documents) == self.document_count:
+            return self._calculate_field_scores_tfidf_from_postings(query_tokens, vector_space_model, candidate_ids)
+        
+        multi_field_scores = [0.0] * len(documents)
+        doc_ids = range(len(documents)) if candidate_ids is None else candidate_ids.tolist()
         
-        for doc_id, doc in enumerate(documents):
+        for doc_id in doc_ids:
+            doc = documents[doc_id]
             # 为每个字段计算TF-IDF分数
             title_score = self._calculate_field_tfidf_score(
                 query_tokens, doc.processed_title, vector_space_model
@@ -65,12 +104,12 @@ class MultiFieldScoring:
                 self.normalized_content_weight * content_score
             )
             
-            multi_field_scores.append(weighted_score)
+            multi_field_scores[doc_id] = weighted_score
         
         return multi_field_scores
     
     def calculate_field_scores_bm25(self, query_tokens: List[str], documents: List[Any], 
-                                  bm25_models: Dict[str, Any]) -> List[float]:
+                                  bm25_models: Dict[str, Any], candidate_ids: np.ndarray = None) -> List[float]:
         """
         使用BM25为多字段计算分数
         
@@ -79,16 +118,21 @@ class MultiFieldScoring:
             documents: 文档对象列表
             bm25_models: 包含不同字段BM25模型的字典
                         {'title': BM25Model, 'summary': BM25Model, 'content': BM25Model}
-            
+            candidate_ids: 只为这些文档计分（按文档ID升序），其余文档分数为0；None表示所有文档
+        
         Returns:
             多字段加权BM25分数列表
         """
         multi_field_scores = []
         
         # 获取各字段的BM25分数
-        title_scores = bm25_models['title'].get_query_document_scores(query_tokens) if 'title' in bm25_models else []
-        summary_scores = bm25_models['summary'].get_query_document_scores(query_tokens) if 'summary' in bm25_models else []
-        content_scores = bm25_models['content'].get_query_document_scores(query_tokens) if 'content' in bm25_models else []
+        field_scores = {
+            field: model.get_query_score_array(query_tokens, candidate_ids).tolist()
+            for field, model in bm25_models.items()
+        }
+        title_scores = field_scores.get('title', [])
+        summary_scores = field_scores.get('summary', [])
+        content_scores = field_scores.get('content', [])
         
         # 确保所有字段都有分数
         doc_count = len(documents)
@@ -116,23 +160,71 @@ class MultiFieldScoring:
         
         return multi_field_scores
     
+    def _calculate_field_scores_tfidf_from_postings(self, query_tokens: List[str], vector_space_model: Any,
+                                                    candidate_ids: np.ndarray = None) -> List[float]:
+        """
+        基于字段对数TF倒排数据计算多字段TF-IDF分数，只有包含查询词汇的文档参与计算
+        
+        查询TF权重只计算一次；每个查询词（含重复）对其倒排列表中的文档贡献 log_tf * 查询TF * idf，
+        按查询词顺序用bincount累加，与逐文档计算的浮点结果一致。指定candidate_ids时只保留其中的文档。
+        """
+        field_names = ('title', 'summary', 'content')
+        document_count = self.document_count
+        if not query_tokens:
+            return [0.0] * document_count
+        
+        query_tf = self._calculate_tf_weights(query_tokens)
+        keys, weights = [], []
+        for term in query_tokens:
+            term_id = self.field_term_ids.get(term)
+            if term_id is None or term not in vector_space_model.term_to_id:
+                continue
+            tf_query = query_tf[term]
+            idf = vector_space_model.idf_weights.get(term, 0)
+            for field_number, field in enumerate(field_names):
+                indptr, doc_ids, log_tfs = self.field_postings[field]
+                start, end = indptr[term_id], indptr[term_id + 1]
+                if start == end:
+                    continue
+                term_doc_ids, term_log_tfs = doc_ids[start:end], log_tfs[start:end]
+                if candidate_ids is not None:
+                    positions = TermDictionary.select_postings(term_doc_ids, candidate_ids)
+                    term_doc_ids, term_log_tfs = term_doc_ids[positions], term_log_tfs[positions]
+                keys.append(field_number * document_count + term_doc_ids)
+                weights.append(term_log_tfs * tf_query * idf)
+        
+        if keys:
+            field_scores = np.bincount(np.concatenate(keys), weights=np.concatenate(weights),
+                                       minlength=len(field_names) * document_count)
+        else:
+            field_scores = np.zeros(len(field_names) * document_count, dtype=np.float64)
+        title_scores, summary_scores, content_scores = field_scores.reshape(len(field_names), document_count)
+        
+        # 加权组合
+        multi_field_scores = (self.normalized_title_weight * title_scores +
+                              self.normalized_summary_weight * summary_scores +
+                              self.normalized_content_weight * content_scores)
+        return multi_field_scores.tolist()
+    
     def _calculate_field_tfidf_score(self, query_tokens: List[str], field_tokens: List[str], 
                                    vector_space_model: Any) -> float:
         """计算单个字段的TF-IDF分数"""
         if not query_tokens or not field_tokens:
             return 0.0
         
-        # 计算字段的TF权重
+        # 计算字段和查询的TF权重
         field_tf = self._calculate_tf_weights(field_tokens)
-        
-        # 计算查询的TF权重
         query_tf = self._calculate_tf_weights(query_tokens)
-        
+        return self._score_field_tf(query_tokens, field_tf, query_tf, vector_space_model)
+    
+    def _score_field_tf(self, query_tokens: List[str], field_tf: Dict[str, float], query_tf: Dict[str, float],
+                        vector_space_model: Any) -> float:
+        """根据字段和查询的对数TF权重计算字段的TF-IDF分数"""
         score = 0.0
         
         # 计算查询词汇在字段中的TF-IDF分数
         for term in query_tokens:
-            if term in vector_space_model.vocabulary:
+            if term in vector_space_model.term_to_id:
                 tf_field = field_tf.get(term, 0)
                 tf_query = query_tf.get(term, 0)
                 idf = vector_space_model.idf_weights.get(term, 0)
@@ -149,13 +241,60 @@ class MultiFieldScoring:
         term_freq = Counter(tokens)
         
         for term, freq in term_freq.items():
-            if freq > 0:
-                tf_dict[term] = 1 + math.log(freq)
-            else:
-                tf_dict[term] = 0
+            tf_dict[term] = self._log_tf(freq)
         
         return tf_dict
     
+    @staticmethod
+    def _log_tf(freq: int) -> float:
+        """对数TF：1 + log(tf)，tf为0时为0"""
+        return 1 + math.log(freq) if freq > 0 else 0
+    
+    def _has_field_postings(self, doc: Any) -> bool:
+        """文档是否可以从字段倒排数据中查找词频（字段倒排数据已构建且文档ID在范围内）"""
+        return bool(self.field_postings) and 0 <= getattr(doc, 'doc_id', -1) < self.document_count
+    
+    def _get_field_log_tfs(self, terms: Iterable[str], doc_id: int) -> Dict[str, Dict[str, float]]:
+        """
+        从字段倒排数据中二分查找词汇在文档各字段中的对数TF，无需把文档的词汇ID还原为词汇列表
+        
+        Returns:
+            {field: {term: log_tf}}，只包含在该字段中出现的词汇
+        """
+        field_log_tfs = {field: {} for field in self.field_postings}
+        for term in terms:
+            term_id = self.field_term_ids.get(term)
+            if term_id is None:
+                continue
+            for field, (indptr, doc_ids, log_tfs) in self.field_postings.items():
+                start, end = indptr[term_id], indptr[term_id + 1]
+                position = start + int(np.searchsorted(doc_ids[start:end], doc_id))
+                if position < end and doc_ids[position] == doc_id:
+                    field_log_tfs[field][term] = float(log_tfs[position])
+        return field_log_tfs
+    
+    def _get_field_terms(self, query_terms: Set[str], doc: Any) -> Tuple[Any, Any, Any]:
+        """获取文档标题、摘要、内容字段中可用于判断词汇是否出现的集合（优先使用字段倒排数据）"""
+        if self._has_field_postings(doc):
+            field_log_tfs = self._get_field_log_tfs(query_terms, doc.doc_id)
+            return field_log_tfs['title'], field_log_tfs['summary'], field_log_tfs['content']
+        return set(doc.processed_title), set(doc.processed_summary), set(doc.processed_content)
+    
+    @staticmethod
+    def _calculate_coverage_bonus(query_terms: Set[str], field_terms: Tuple[Any, ...]) -> float:
+        """根据查询词汇出现的字段数计算覆盖度奖励"""
+        bonus = 0.0
+        for term in query_terms:
+            # 检查词汇在哪些字段中出现
+            fields_containing_term = sum(1 for terms in field_terms if term in terms)
+            
+            # 多字段覆盖奖励
+            if fields_containing_term >= 2:
+                bonus += 0.2 * fields_containing_term
+            elif fields_containing_term == 1:
+                bonus += 0.1
+        return bonus
+    
     def calculate_field_coverage_bonus(self, query_tokens: List[str], documents: List[Any]) -> List[float]:
         """
         计算字段覆盖度奖励：查询词汇在多个字段中出现会得到奖励
@@ -167,31 +306,9 @@ class MultiFieldScoring:
         Returns:
             字段覆盖度奖励分数列表
         """
-        coverage_bonuses = []
-        
-        for doc in documents:
-            bonus = 0.0
-            
-            for term in set(query_tokens):
-                fields_containing_term = 0
-                
-                # 检查词汇在哪些字段中出现
-                if term in doc.processed_title:
-                    fields_containing_term += 1
-                if term in doc.processed_summary:
-                    fields_containing_term += 1
-                if term in doc.processed_content:
-                    fields_containing_term += 1
-                
-                # 多字段覆盖奖励
-                if fields_containing_term >= 2:
-                    bonus += 0.2 * fields_containing_term
-                elif fields_containing_term == 1:
-                    bonus += 0.1
-            
-            coverage_bonuses.append(bonus)
-        
-        return coverage_bonuses
+        query_terms = set(query_tokens)
+        return [self._calculate_coverage_bonus(query_terms, self._get_field_terms(query_terms, doc))
+                for doc in documents]
     
     def analyze_field_importance(self, query_tokens: List[str], documents: List[Any]) -> Dict[str, Any]:
         """分析不同字段对查询的重要性"""
@@ -204,20 +321,17 @@ class MultiFieldScoring:
         query_set = set(query_tokens)
         
         for doc in documents:
-            # 标题统计
-            title_matches = len(query_set.intersection(set(doc.processed_title)))
-            field_stats['title']['matches'] += title_matches
-            field_stats['title']['total_terms'] += len(doc.processed_title)
-            
-            # 摘要统计
-            summary_matches = len(query_set.intersection(set(doc.processed_summary)))
-            field_stats['summary']['matches'] += summary_matches
-            field_stats['summary']['total_terms'] += len(doc.processed_summary)
+            if self._has_field_postings(doc):
+                field_log_tfs = self._get_field_log_tfs(query_set, doc.doc_id)
+                for field, stats in field_stats.items():
+                    stats['matches'] += len(field_log_tfs[field])
+                    stats['total_terms'] += int(self.field_lengths[field][doc.doc_id])
+                continue
             
-            # 内容统计
-            content_matches = len(query_set.intersection(set(doc.processed_content)))
-            field_stats['content']['matches'] += content_matches
-            field_stats['content']['total_terms'] += len(doc.processed_content)
+            for field, tokens in (('title', doc.processed_title), ('summary', doc.processed_summary),
+                                  ('content', doc.processed_content)):
+                field_stats[field]['matches'] += len(query_set.intersection(tokens))
+                field_stats[field]['total_terms'] += len(tokens)
         
         # 计算重要性指标
         analysis = {}
@@ -251,17 +365,31 @@ class MultiFieldScoring:
             return {"错误": "文档索引超出范围"}
         
         doc = documents[doc_index]
-        
-        # 计算各字段分数
-        title_score = self._calculate_field_tfidf_score(
-            query_tokens, doc.processed_title, vector_space_model
-        )
-        summary_score = self._calculate_field_tfidf_score(
-            query_tokens, doc.processed_summary, vector_space_model
-        )
-        content_score = self._calculate_field_tfidf_score(
-            query_tokens, doc.processed_content, vector_space_model
-        )
+        query_terms = set(query_tokens)
+        
+        if self._has_field_postings(doc):
+            # 字段词频从字段倒排数据中查找，不还原文档的词汇列表
+            field_log_tfs = self._get_field_log_tfs(query_terms, doc.doc_id)
+            title_terms, summary_terms, content_terms = (
+                set(field_log_tfs['title']), set(field_log_tfs['summary']), set(field_log_tfs['content']))
+            query_tf = self._calculate_tf_weights(query_tokens)
+            title_score, summary_score, content_score = (
+                self._score_field_tf(query_tokens, field_log_tfs[field], query_tf, vector_space_model)
+                for field in ('title', 'summary', 'content'))
+        else:
+            title_terms, summary_terms, content_terms = (
+                set(doc.processed_title), set(doc.processed_summary), set(doc.processed_content))
+            
+            # 计算各字段分数
+            title_score = self._calculate_field_tfidf_score(
+                query_tokens, doc.processed_title, vector_space_model
+            )
+            summary_score = self._calculate_field_tfidf_score(
+                query_tokens, doc.processed_summary, vector_space_model
+            )
+            content_score = self._calculate_field_tfidf_score(
+                query_tokens, doc.processed_content, vector_space_model
+            )
         
         # 计算加权分数
         weighted_score = (
@@ -271,7 +399,7 @@ class MultiFieldScoring:
         )
         
         # 计算字段覆盖度
-        coverage_bonus = self.calculate_field_coverage_bonus(query_tokens, [doc])[0]
+        coverage_bonus = self._calculate_coverage_bonus(query_terms, (title_terms, summary_terms, content_terms))
         
         return {
             "文档索引": doc_index,
@@ -286,12 +414,42 @@ class MultiFieldScoring:
             "字段覆盖度奖励": coverage_bonus,
             "最终分数": weighted_score + coverage_bonus,
             "字段匹配情况": {
-                "标题匹配词": list(set(query_tokens).intersection(set(doc.processed_title))),
-                "摘要匹配词": list(set(query_tokens).intersection(set(doc.processed_summary))),
-                "内容匹配词": list(set(query_tokens).intersection(set(doc.processed_content)))
+                "标题匹配词": sorted(query_terms.intersection(title_terms)),
+                "摘要匹配词": sorted(query_terms.intersection(summary_terms)),
+                "内容匹配词": sorted(query_terms.intersection(content_terms))
             }
         }
     
+    def get_query_tf_weights(self, query_tokens: List[str]) -> Dict[str, float]:
+        """计算查询的对数TF权重，同一查询的多个文档可复用"""
+        return self._calculate_tf_weights(query_tokens)
+    
+    def get_field_scores(self, query_tokens: List[str], doc_index: int, term_dictionary: Any,
+                         vector_space_model: Any, query_tf: Dict[str, float] = None) -> Dict[str, Dict[str, float]]:
+        """
+        计算文档各字段的TF-IDF分数（即get_field_score_explanation中的"字段分数"）
+        
+        字段词频直接从全局词典的字段倒排列表中查找，无需统计文档的字段词汇；
+        query_tf为get_query_tf_weights的结果，同一查询的多个结果可共用。
+        """
+        if query_tf is None:
+            query_tf = self._calculate_tf_weights(query_tokens)
+        
+        query_terms = set(query_tokens)
+        field_scores = {}
+        for name, field, weight in (("标题", 'title', self.normalized_title_weight),
+                                    ("摘要", 'summary', self.normalized_summary_weight),
+                                    ("内容", 'content', self.normalized_content_weight)):
+            field_tf = {}
+            for term in query_terms:
+                term_freq = term_dictionary.get_term_frequency(term, doc_index, field)
+                if term_freq > 0:
+                    field_tf[term] = self._log_tf(term_freq)
+            score = self._score_field_tf(query_tokens, field_tf, query_tf, vector_space_model)
+            field_scores[name] = {"原始分数": score, "权重": weight, "加权分数": weight * score}
+        
+        return field_scores
+    
     def optimize_field_weights(self, query_tokens: List[str], documents: List[Any]) -> Dict[str, float]:
         """根据查询和文档集合优化字段权重"""
         field_analysis = self.analyze_field_importance(query_tokens, documents)
@@ -341,6 +499,7 @@ if __name__ == "__main__":
     class MockVectorSpaceModel:
         def __init__(self):
             self.vocabulary = ["health", "apple", "fruit", "nutrition", "vitamin", "diet", "food", "benefit"]
+            self.term_to_id = {term: term_id for term_id, term in enumerate(self.vocabulary)}
             self.idf_weights = {term: 2.0 for term in self.vocabulary}  # 简化的IDF权重
     
     # 测试文档
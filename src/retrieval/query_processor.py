@@ -2,13 +2,21 @@ import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
+import re
+import numpy as np
 from typing import List, Dict, Tuple, Any
+from collections import defaultdict
 from preprocessing.text_processor import TextProcessor
+from indexing.inverted_index import InvertedIndex
+from indexing.term_dictionary import TermDictionary
+from indexing.date_index import DateIndex
 from retrieval.vector_space_model import VectorSpaceModel
 from retrieval.similarity_calculator import SimilarityCalculator
 from retrieval.bm25_model import BM25Model
+from retrieval.bm25f_model import BM25FModel
 from retrieval.temporal_scoring import TemporalScoring
 from retrieval.multi_field_scoring import MultiFieldScoring
+from retrieval.enhanced_scoring import EnhancedScoring
 
 class SearchResult:
     """搜索结果类：存储单个搜索结果的信息"""
@@ -34,11 +42,45 @@ class SearchResult:
         return f"SearchResult(doc_id={self.doc_id}, similarity={self.similarity:.3f}, title='{self.title[:50]}...')"
 
 
+class QueryScoringContext:
+    """单次查询的评分上下文：保存排序阶段计算出的分数数组，生成搜索结果详情时直接读取，无需重新计分"""
+    
+    def __init__(self, query_tokens: List[str]):
+        self.query_tokens = query_tokens
+        self.bm25_scores = None  # 全文BM25原始分数数组
+        self.tfidf_scores = None  # TF-IDF余弦相似度列表
+        self.query_tf_weights = None  # 查询的对数TF权重（多字段分数详情使用）
+
+
 class EnhancedQueryProcessor:
     """增强的查询处理器：整合BM25、多字段权重、时间新鲜度等优化算法"""
     
+    # 全局BM25模型与各字段BM25模型的参数
+    BM25_PARAMS = {'k1': 1.5, 'b': 0.75}
+    FIELD_BM25_PARAMS = {
+        'title': {'k1': 1.2, 'b': 0.75},
+        'summary': {'k1': 1.5, 'b': 0.75},
+        'content': {'k1': 1.8, 'b': 0.75}
+    }
+    
+    # BM25F模型的默认参数（use_bm25f时代替各字段BM25模型计算多字段分数），可由bm25f_params覆盖
+    BM25F_PARAMS = {
+        'k1': 1.2,
+        'field_weights': {'title': 3.0, 'summary': 2.0, 'content': 1.0},
+        'field_b': {'title': 0.75, 'summary': 0.75, 'content': 0.75}
+    }
+    
+    # 查询语法：双引号短语 "climate change"，邻近查询 word1 NEAR/k word2
+    PHRASE_PATTERN = re.compile(r'"([^"]+)"')
+    NEAR_PATTERN = re.compile(r'([^\s"]+)\s+NEAR/(\d+)\s+([^\s"]+)')
+    
+    # 增强算法中邻近度加分的权重
+    PROXIMITY_WEIGHT = 0.1
+    
     def __init__(self, use_bm25: bool = True, use_temporal: bool = True, 
-                 use_multi_field: bool = True):
+                 use_multi_field: bool = True, compress_postings: bool = False,
+                 use_positions: bool = False, use_bm25f: bool = False, bm25f_params: Dict[str, Any] = None,
+                 text_processor: TextProcessor = None):
         """
         初始化增强查询处理器
         
@@ -46,21 +88,40 @@ class EnhancedQueryProcessor:
             use_bm25: 是否使用BM25算法
             use_temporal: 是否使用时间新鲜度
             use_multi_field: 是否使用多字段权重
+            compress_postings: 位置索引是否压缩存储倒排列表
+            use_positions: 是否构建位置索引（支持短语、邻近查询和邻近度加分）
+            use_bm25f: 多字段分数是否使用单个BM25F模型（代替标题、摘要、内容三个独立的BM25模型）
+            bm25f_params: BM25F参数 {'k1': ..., 'field_weights': {...}, 'field_b': {...}}，未给出的项使用默认值
+            text_processor: 文本处理器，传入文档处理使用的实例可共享词干缓存
         """
-        self.text_processor = TextProcessor()
+        self.text_processor = text_processor or TextProcessor()
         self.similarity_calculator = SimilarityCalculator()
         
         # 配置使用的算法
         self.use_bm25 = use_bm25
         self.use_temporal = use_temporal
         self.use_multi_field = use_multi_field
+        self.compress_postings = compress_postings
+        self.use_positions = use_positions
+        self.use_bm25f = use_bm25f
+        bm25f_params = bm25f_params or {}
+        self.bm25f_params = {
+            'k1': bm25f_params.get('k1', self.BM25F_PARAMS['k1']),
+            'field_weights': dict(self.BM25F_PARAMS['field_weights'], **(bm25f_params.get('field_weights') or {})),
+            'field_b': dict(self.BM25F_PARAMS['field_b'], **(bm25f_params.get('field_b') or {}))
+        }
         
         # 模型组件
+        self.term_dictionary = None  # 全局词典
         self.vector_space_model = VectorSpaceModel()
         self.bm25_model = None
         self.bm25_field_models = {}  # 多字段BM25模型
+        self.bm25f_model = None  # BM25F模型
+        self.positional_index = None  # 位置索引
         self.temporal_scorer = None
+        self.date_index = None  # 日期索引（按发布时间范围过滤）
         self.multi_field_scorer = None
+        self.enhanced_scorer = None  # 增强算法的融合评分器
         
         # 数据
         self.documents = []
@@ -70,66 +131,164 @@ class EnhancedQueryProcessor:
         print(f"  BM25算法: {'✓' if use_bm25 else '✗'}")
         print(f"  时间新鲜度: {'✓' if use_temporal else '✗'}")
         print(f"  多字段权重: {'✓' if use_multi_field else '✗'}")
+        print(f"  位置索引: {'✓' if use_positions else '✗'}")
+        print(f"  BM25F多字段: {'✓' if use_bm25f else '✗'}")
     
     def initialize(self, documents: List[Any]) -> None:
         """初始化查询处理器"""
         print("初始化增强查询处理器...")
         self.documents = documents
         
-        # 提取文档的所有词汇
-        documents_tokens = [doc.all_tokens for doc in documents]
+        # 1. 一次遍历所有文档构建全局词典，各模型共享其中的统计数据
+        print("构建全局词典...")
+        self.term_dictionary = TermDictionary()
+        self.term_dictionary.build(documents)
         
-        # 1. 构建向量空间模型
+        # 2. 构建向量空间模型
         print("构建向量空间模型...")
-        self.vector_space_model.build_model(documents_tokens)
+        self.vector_space_model.build_from_dictionary(self.term_dictionary)
         
-        # 2. 构建BM25模型
+        # 3. 构建BM25模型
         if self.use_bm25:
             print("构建BM25模型...")
-            self.bm25_model = BM25Model(k1=1.5, b=0.75)
-            self.bm25_model.build_model(documents_tokens)
+            self.bm25_model = BM25Model(**self.BM25_PARAMS)
+            self.bm25_model.build_from_dictionary(self.term_dictionary)
             
-            # 构建多字段BM25模型
-            if self.use_multi_field:
+            # 构建多字段模型：单个BM25F模型，或各字段独立的BM25模型
+            if self.use_multi_field and self.use_bm25f:
+                print("构建BM25F模型...")
+                self.bm25f_model = BM25FModel(**self.bm25f_params)
+                self.bm25f_model.build_from_dictionary(self.term_dictionary)
+            elif self.use_multi_field:
                 print("构建多字段BM25模型...")
                 self._build_multi_field_bm25_models()
         
-        # 3. 初始化时间评分器
+        # 4. 构建位置索引（需要词汇位置，按字段分别记录位置，短语和邻近条件不跨越字段）
+        if self.use_positions:
+            print("构建位置索引...")
+            self.positional_index = InvertedIndex(compress_postings=self.compress_postings, store_positions=True)
+            self.positional_index.build_field_index(
+                [(doc.processed_title, doc.processed_content, doc.processed_summary) for doc in documents])
+        
+        # 5. 初始化时间评分器
         if self.use_temporal:
             print("初始化时间评分器...")
             self.temporal_scorer = TemporalScoring(decay_factor=0.2, max_days=365)
             publish_times = [doc.publish_time for doc in documents]
             self.temporal_scorer.analyze_document_dates(publish_times)
         
-        # 4. 初始化多字段评分器
+        # 6. 构建日期索引
+        print("构建日期索引...")
+        self._build_date_index()
+        
+        # 7. 初始化多字段评分器和融合评分器
+        self._init_multi_field_scorer()
+        self._init_enhanced_scorer()
+        
+        self.is_ready = True
+        print("增强查询处理器初始化完成！")
+    
+    def _build_date_index(self) -> None:
+        """构建日期索引，发布时间取自时间评分器；未启用时间新鲜度时单独解析"""
+        if self.temporal_scorer:
+            document_dates = self.temporal_scorer.document_dates
+        else:
+            document_dates = TemporalScoring().parse_document_dates([doc.publish_time for doc in self.documents])
+        self.date_index = DateIndex()
+        self.date_index.build(document_dates)
+    
+    def _init_multi_field_scorer(self) -> None:
+        """初始化多字段评分器"""
         if self.use_multi_field:
             print("初始化多字段评分器...")
             self.multi_field_scorer = MultiFieldScoring(
                 title_weight=3.0, summary_weight=2.0, content_weight=1.0
             )
+            if self.term_dictionary is not None:
+                self.multi_field_scorer.build_field_postings(self.term_dictionary)
+    
+    def _init_enhanced_scorer(self) -> None:
+        """初始化增强算法的融合评分器（需要BM25模型；启用多字段时还需要字段BM25模型，否则使用逐项计算）"""
+        self.enhanced_scorer = None
+        if not (self.use_bm25 and self.bm25_model):
+            return
+        
+        use_field_scores = self.use_multi_field and self.multi_field_scorer is not None
+        if use_field_scores and not (self.bm25_field_models or self.bm25f_model):
+            return
+        
+        field_weights = None
+        if use_field_scores and not self.bm25f_model:
+            field_weights = {
+                'title': self.multi_field_scorer.normalized_title_weight,
+                'summary': self.multi_field_scorer.normalized_summary_weight,
+                'content': self.multi_field_scorer.normalized_content_weight
+            }
+        
+        print("初始化融合评分器...")
+        self.enhanced_scorer = EnhancedScoring(field_weights=field_weights, multi_field_weight=0.4, temporal_weight=0.2)
+        self.enhanced_scorer.build(self.bm25_model, self.bm25_field_models if use_field_scores else None,
+                                   self.bm25f_model if use_field_scores else None)
+    
+    def get_index_config(self) -> Dict[str, Any]:
+        """获取影响索引构建结果的配置（用于判断索引快照是否可复用）"""
+        return {
+            'use_bm25': self.use_bm25,
+            'use_temporal': self.use_temporal,
+            'use_multi_field': self.use_multi_field,
+            'vsm_sparse': self.vector_space_model.use_sparse,
+            'compress_postings': self.compress_postings,
+            'use_positions': self.use_positions,
+            'use_bm25f': self.use_bm25f,
+            'bm25_params': self.BM25_PARAMS,
+            'field_bm25_params': self.FIELD_BM25_PARAMS,
+            'bm25f_params': self.bm25f_params
+        }
+    
+    def export_state(self) -> Dict[str, Any]:
+        """导出已构建的模型状态，用于保存索引快照"""
+        return {
+            'term_dictionary': self.term_dictionary,
+            'vector_space_model': self.vector_space_model,
+            'bm25_model': self.bm25_model,
+            'bm25_field_models': self.bm25_field_models,
+            'bm25f_model': self.bm25f_model,
+            'positional_index': self.positional_index,
+            'date_index': self.date_index,
+            'document_dates': self.temporal_scorer.document_dates if self.temporal_scorer else None
+        }
+    
+    def restore_state(self, documents: List[Any], state: Dict[str, Any]) -> None:
+        """从索引快照恢复模型状态，跳过所有模型构建步骤"""
+        print("从索引快照恢复增强查询处理器...")
+        self.documents = documents
+        self.term_dictionary = state['term_dictionary']
+        self.vector_space_model = state['vector_space_model']
+        self.bm25_model = state['bm25_model']
+        self.bm25_field_models = state['bm25_field_models']
+        self.bm25f_model = state['bm25f_model']
+        self.positional_index = state['positional_index']
+        self.date_index = state['date_index']
+        
+        # 时间新鲜度分数依赖当前日期，只恢复解析后的发布日期
+        if self.use_temporal:
+            self.temporal_scorer = TemporalScoring(decay_factor=0.2, max_days=365)
+            self.temporal_scorer.restore_document_dates(state['document_dates'])
+        
+        self._init_multi_field_scorer()
+        self._init_enhanced_scorer()
         
         self.is_ready = True
-        print("增强查询处理器初始化完成！")
+        print("增强查询处理器恢复完成！")
     
     def _build_multi_field_bm25_models(self) -> None:
-        """构建多字段BM25模型"""
-        # 提取各字段的词汇
-        title_tokens = [doc.processed_title for doc in self.documents]
-        summary_tokens = [doc.processed_summary for doc in self.documents]
-        content_tokens = [doc.processed_content for doc in self.documents]
-        
-        # 构建各字段的BM25模型
-        if any(tokens for tokens in title_tokens):
-            self.bm25_field_models['title'] = BM25Model(k1=1.2, b=0.75)
-            self.bm25_field_models['title'].build_model(title_tokens)
-        
-        if any(tokens for tokens in summary_tokens):
-            self.bm25_field_models['summary'] = BM25Model(k1=1.5, b=0.75)
-            self.bm25_field_models['summary'].build_model(summary_tokens)
-        
-        if any(tokens for tokens in content_tokens):
-            self.bm25_field_models['content'] = BM25Model(k1=1.8, b=0.75)
-            self.bm25_field_models['content'].build_model(content_tokens)
+        """构建多字段BM25模型（各字段的统计数据取自全局词典）"""
+        for field in ('title', 'summary', 'content'):
+            # 字段在所有文档中都为空时不构建模型
+            if not any(self.term_dictionary.field_lengths[field]):
+                continue
+            self.bm25_field_models[field] = BM25Model(**self.FIELD_BM25_PARAMS[field])
+            self.bm25_field_models[field].build_from_dictionary(self.term_dictionary, field)
         
         print(f"多字段BM25模型构建完成，包含字段: {list(self.bm25_field_models.keys())}")
     
@@ -138,10 +297,68 @@ class EnhancedQueryProcessor:
         if not query.strip():
             return []
         
-        query_tokens = self.text_processor.process_text(query)
-        return query_tokens
+        return self.parse_query(query)['tokens']
+    
+    def parse_query(self, query: str) -> Dict[str, Any]:
+        """
+        解析查询语法
+        
+        支持双引号短语 "climate change" 和邻近查询 word1 NEAR/k word2，
+        短语和邻近查询中的词汇同时作为普通查询词参与评分。
+        位置按去停用词后的词汇计算。
+        
+        Returns:
+            {'tokens': 查询词汇, 'phrases': [短语词汇列表, ...], 'near': [(词汇1, 词汇2, k), ...]}
+        """
+        parsed_query = {'tokens': [], 'phrases': [], 'near': []}
+        
+        # 普通查询不含任何语法标记，直接处理
+        if '"' not in query and 'NEAR/' not in query:
+            parsed_query['tokens'] = self.text_processor.process_query(query)
+            return parsed_query
+        
+        for match in self.PHRASE_PATTERN.finditer(query):
+            phrase_tokens = self.text_processor.process_query(match.group(1))
+            if phrase_tokens:
+                parsed_query['phrases'].append(phrase_tokens)
+        
+        for match in self.NEAR_PATTERN.finditer(query):
+            tokens1 = self.text_processor.process_query(match.group(1))
+            tokens2 = self.text_processor.process_query(match.group(3))
+            if tokens1 and tokens2:
+                parsed_query['near'].append((tokens1[-1], tokens2[0], int(match.group(2))))
+        
+        query_text = self.NEAR_PATTERN.sub(r'\1 \3', query).replace('"', ' ')
+        parsed_query['tokens'] = self.text_processor.process_query(query_text)
+        return parsed_query
+    
+    def _match_positional_constraints(self, parsed_query: Dict[str, Any]):
+        """
+        找到满足所有短语和邻近条件的文档
+        
+        Returns:
+            满足条件的文档ID集合；查询中没有短语和邻近条件时返回None
+        """
+        if not parsed_query['phrases'] and not parsed_query['near']:
+            return None
+        
+        if self.positional_index is None:
+            print("未启用位置索引，短语和邻近条件按普通查询词处理")
+            return None
+        
+        matching_docs = None
+        for phrase_tokens in parsed_query['phrases']:
+            docs = set(self.positional_index.search_phrase(phrase_tokens))
+            matching_docs = docs if matching_docs is None else matching_docs & docs
+        
+        for term1, term2, max_distance in parsed_query['near']:
+            docs = set(self.positional_index.search_near(term1, term2, max_distance))
+            matching_docs = docs if matching_docs is None else matching_docs & docs
+        
+        return matching_docs
     
-    def search(self, query: str, top_k: int = 10, algorithm: str = "enhanced") -> List[SearchResult]:
+    def search(self, query: str, top_k: int = 10, algorithm: str = "enhanced",
+               since: Any = None, until: Any = None) -> List[SearchResult]:
         """
         执行搜索
         
@@ -149,6 +366,8 @@ class EnhancedQueryProcessor:
             query: 查询字符串
             top_k: 返回结果数量
             algorithm: 搜索算法 ('tfidf', 'bm25', 'enhanced')
+            since: 发布时间下限（含），datetime、date、ISO-8601字符串或timedelta（如最近30天）
+            until: 发布时间上限（含），为日期时包含当天全天
             
         Returns:
             搜索结果列表
@@ -157,77 +376,164 @@ class EnhancedQueryProcessor:
             raise Exception("查询处理器未初始化，请先调用initialize()方法")
         
         # 处理查询
-        query_tokens = self.process_query(query)
+        if not query.strip():
+            return []
+        parsed_query = self.parse_query(query)
+        query_tokens = parsed_query['tokens']
         if not query_tokens:
             return []
         
         print(f"处理后的查询词汇: {query_tokens}")
         
-        # 根据算法选择计算相似度
-        if algorithm == "tfidf":
-            similarities = self._calculate_tfidf_similarities(query_tokens)
-        elif algorithm == "bm25":
-            similarities = self._calculate_bm25_similarities(query_tokens)
-        elif algorithm == "enhanced":
-            similarities = self._calculate_enhanced_similarities(query_tokens)
+        # 短语和邻近条件（没有这类条件时为None）
+        matching_docs = self._match_positional_constraints(parsed_query)
+        
+        # 发布时间范围内的文档ID（按文档ID升序，没有时间条件时为None），范围外的文档不参与任何评分
+        candidate_ids = None
+        if since is not None or until is not None:
+            # 相对时间范围（timedelta）以时间新鲜度评分的当前日期为准，与时间分数一致
+            now = self.temporal_scorer.get_reference_date() if self.temporal_scorer else None
+            candidate_ids = self.date_index.get_sorted_doc_ids(since, until, now)
+            print(f"时间范围过滤: {len(candidate_ids)}/{self.date_index.document_count} 个文档")
+            if not len(candidate_ids):
+                return []
+        
+        # 根据算法选择计算相似度，排序阶段得到的分数数组保存在评分上下文中
+        context = QueryScoringContext(query_tokens)
+        if algorithm == "bm25" and self.bm25_model and matching_docs is None:
+            # BM25直接从分数数组中选出Top-K，无需归一化所有文档的分数
+            top_docs = self._search_bm25_top_k(query_tokens, top_k, context, candidate_ids)
         else:
-            raise ValueError(f"不支持的算法: {algorithm}")
-        
-        # 获取Top-K结果
-        top_docs = self.similarity_calculator.get_top_k_documents(similarities, top_k)
+            if algorithm == "tfidf":
+                similarities = self._calculate_tfidf_similarities(query_tokens, context, candidate_ids)
+            elif algorithm == "bm25":
+                similarities = self._calculate_bm25_similarities(query_tokens, context, candidate_ids)
+            elif algorithm == "enhanced":
+                similarities = self._calculate_enhanced_similarities(query_tokens, context, candidate_ids)
+            else:
+                raise ValueError(f"不支持的算法: {algorithm}")
+            
+            # 过滤不满足短语和邻近条件的文档
+            if matching_docs is not None:
+                similarities = [similarity if doc_id in matching_docs else 0.0
+                                for doc_id, similarity in enumerate(similarities)]
+            
+            # 获取Top-K结果
+            top_docs = self.similarity_calculator.get_top_k_documents(similarities, top_k)
         
         # 创建搜索结果对象
         search_results = []
         for doc_id, similarity in top_docs:
             if similarity > 0:  # 只返回有相似度的结果
-                result = self._create_search_result(query_tokens, doc_id, similarity)
+                result = self._create_search_result(context, doc_id, similarity)
                 search_results.append(result)
         
         return search_results
     
-    def _calculate_tfidf_similarities(self, query_tokens: List[str]) -> List[float]:
-        """计算TF-IDF相似度"""
-        query_vector = self.vector_space_model.get_query_vector(query_tokens)
-        similarities = self.similarity_calculator.calculate_similarities(
-            query_vector, self.vector_space_model.document_vectors, "cosine"
-        )
+    def _calculate_tfidf_similarities(self, query_tokens: List[str], context: QueryScoringContext = None,
+                                      candidate_ids: np.ndarray = None) -> List[float]:
+        """计算TF-IDF相似度，指定candidate_ids时只为其中的文档计分"""
+        if self.vector_space_model.use_sparse:
+            similarities = self.vector_space_model.calculate_cosine_scores(query_tokens, candidate_ids)
+        elif candidate_ids is None:
+            query_vector = self.vector_space_model.get_query_vector(query_tokens)
+            similarities = self.similarity_calculator.calculate_similarities(
+                query_vector, self.vector_space_model.document_vectors, "cosine"
+            )
+        else:
+            query_vector = self.vector_space_model.get_query_vector(query_tokens)
+            candidate_list = candidate_ids.tolist()
+            candidate_similarities = self.similarity_calculator.calculate_similarities(
+                query_vector, [self.vector_space_model.document_vectors[doc_id] for doc_id in candidate_list], "cosine"
+            )
+            similarities = [0.0] * self.vector_space_model.document_count
+            for doc_id, similarity in zip(candidate_list, candidate_similarities):
+                similarities[doc_id] = similarity
+        
+        if context is not None:
+            context.tfidf_scores = similarities
         return similarities
     
-    def _calculate_bm25_similarities(self, query_tokens: List[str]) -> List[float]:
-        """计算BM25相似度"""
+    def _calculate_bm25_similarities(self, query_tokens: List[str], context: QueryScoringContext = None,
+                                     candidate_ids: np.ndarray = None) -> List[float]:
+        """计算BM25相似度，指定candidate_ids时只为其中的文档计分"""
         if not self.bm25_model:
-            return self._calculate_tfidf_similarities(query_tokens)
+            return self._calculate_tfidf_similarities(query_tokens, context, candidate_ids)
         
-        bm25_scores = self.bm25_model.get_query_document_scores(query_tokens)
+        bm25_scores = self.bm25_model.get_query_score_array(query_tokens, candidate_ids)
+        if context is not None:
+            context.bm25_scores = bm25_scores
         
         # 归一化BM25分数到[0,1]范围
-        if bm25_scores and max(bm25_scores) > 0:
-            max_score = max(bm25_scores)
-            similarities = [score / max_score for score in bm25_scores]
+        if len(bm25_scores) and bm25_scores.max() > 0:
+            similarities = bm25_scores / bm25_scores.max()
         else:
             similarities = bm25_scores
         
-        return similarities
+        return similarities.tolist()
+    
+    def _search_bm25_top_k(self, query_tokens: List[str], top_k: int, context: QueryScoringContext = None,
+                           candidate_ids: np.ndarray = None) -> List[Tuple[int, float]]:
+        """BM25 Top-K检索，分数按最高分归一化到[0,1]范围"""
+        bm25_scores = self.bm25_model.get_query_score_array(query_tokens, candidate_ids)
+        if context is not None:
+            context.bm25_scores = bm25_scores
+        top_docs = self.similarity_calculator.select_top_k(bm25_scores, top_k)
+        
+        max_score = top_docs[0][1] if top_docs else 0.0
+        if max_score > 0:
+            top_docs = [(doc_id, score / max_score) for doc_id, score in top_docs]
+        
+        return top_docs
+    
+    def _calculate_enhanced_similarities(self, query_tokens: List[str], context: QueryScoringContext = None,
+                                         candidate_ids: np.ndarray = None) -> List[float]:
+        """计算增强的综合相似度，指定candidate_ids时各项分数只在其中的文档上计算和归一化"""
+        if self.enhanced_scorer is None:
+            return self._calculate_enhanced_similarities_by_component(query_tokens, context, candidate_ids)
+        
+        # 融合评分器一次遍历得到全文和各字段BM25分数，再混合邻近度和时间新鲜度
+        proximity_scores = {}
+        if self.positional_index is not None:
+            proximity_scores = self._calculate_proximity_scores(query_tokens, candidate_ids)
+        temporal_scores = None
+        if self.use_temporal and self.temporal_scorer:
+            temporal_scores = self.temporal_scorer.get_temporal_score_array()
+            if candidate_ids is not None:
+                candidate_temporal_scores = temporal_scores[candidate_ids]
+                temporal_scores = np.zeros(len(temporal_scores), dtype=np.float64)
+                temporal_scores[candidate_ids] = candidate_temporal_scores
+        
+        components = self.enhanced_scorer.score_components(query_tokens, candidate_ids)
+        if context is not None:
+            context.bm25_scores = components['all']
+        
+        return self.enhanced_scorer.combine(components, proximity_scores, self.PROXIMITY_WEIGHT, temporal_scores).tolist()
     
-    def _calculate_enhanced_similarities(self, query_tokens: List[str]) -> List[float]:
-        """计算增强的综合相似度"""
+    def _calculate_enhanced_similarities_by_component(self, query_tokens: List[str],
+                                                      context: QueryScoringContext = None,
+                                                      candidate_ids: np.ndarray = None) -> List[float]:
+        """逐项计算增强的综合相似度（TF-IDF基础分数或多字段TF-IDF时使用），指定candidate_ids时只为其中的文档计分"""
         # 1. 基础内容相关性分数
         if self.use_bm25 and self.bm25_model:
-            content_scores = self._calculate_bm25_similarities(query_tokens)
+            content_scores = self._calculate_bm25_similarities(query_tokens, context, candidate_ids)
         else:
-            content_scores = self._calculate_tfidf_similarities(query_tokens)
+            content_scores = self._calculate_tfidf_similarities(query_tokens, context, candidate_ids)
         
         # 2. 多字段权重分数
         if self.use_multi_field and self.multi_field_scorer:
-            if self.bm25_field_models:
+            if self.bm25f_model:
+                # 使用BM25F
+                multi_field_scores = self.bm25f_model.get_query_score_array(query_tokens, candidate_ids).tolist()
+            elif self.bm25_field_models:
                 # 使用多字段BM25
                 multi_field_scores = self.multi_field_scorer.calculate_field_scores_bm25(
-                    query_tokens, self.documents, self.bm25_field_models
+                    query_tokens, self.documents, self.bm25_field_models, candidate_ids
                 )
             else:
                 # 使用多字段TF-IDF
                 multi_field_scores = self.multi_field_scorer.calculate_field_scores_tfidf(
-                    query_tokens, self.documents, self.vector_space_model
+                    query_tokens, self.documents, self.vector_space_model, candidate_ids
                 )
             
             # 归一化多字段分数
@@ -241,8 +547,26 @@ class EnhancedQueryProcessor:
                 for content, multi_field in zip(content_scores, multi_field_scores)
             ]
         
-        # 3. 时间新鲜度加权
-        if self.use_temporal and self.temporal_scorer:
+        # 3. 邻近度加分：查询词在文档中距离越近分数越高
+        if self.positional_index is not None:
+            proximity_scores = self._calculate_proximity_scores(query_tokens, candidate_ids)
+            if proximity_scores:
+                content_scores = [
+                    score + self.PROXIMITY_WEIGHT * proximity_scores.get(doc_id, 0.0)
+                    for doc_id, score in enumerate(content_scores)
+                ]
+        
+        # 4. 时间新鲜度加权
+        if self.use_temporal and self.temporal_scorer and candidate_ids is not None:
+            # 只为时间范围内的文档混合时间分数，范围外文档分数为0
+            candidate_list = candidate_ids.tolist()
+            candidate_scores = self.temporal_scorer.combine_content_and_temporal_scores(
+                [content_scores[doc_id] for doc_id in candidate_list], candidate_list, temporal_weight=0.2
+            )
+            enhanced_scores = [0.0] * len(content_scores)
+            for doc_id, score in zip(candidate_list, candidate_scores):
+                enhanced_scores[doc_id] = score
+        elif self.use_temporal and self.temporal_scorer:
             document_indices = list(range(len(content_scores)))
             enhanced_scores = self.temporal_scorer.combine_content_and_temporal_scores(
                 content_scores, document_indices, temporal_weight=0.2
@@ -252,8 +576,38 @@ class EnhancedQueryProcessor:
         
         return enhanced_scores
     
-    def _create_search_result(self, query_tokens: List[str], doc_id: int, similarity: float) -> SearchResult:
+    def _calculate_proximity_scores(self, query_tokens: List[str],
+                                    candidate_ids: np.ndarray = None) -> Dict[int, float]:
+        """
+        计算邻近度分数
+        
+        对查询中相邻的每对不同词汇，取它们在文档中的最小距离d，得分1/d，
+        再对所有词对取平均。单词查询返回空字典。指定candidate_ids时只计算其中的文档。
+        
+        Returns:
+            {doc_id: 邻近度分数(0-1]}，只包含至少有一对词汇同时出现的文档
+        """
+        terms = list(dict.fromkeys(query_tokens))
+        if len(terms) < 2 or self.positional_index is None:
+            return {}
+        
+        term_positions = [self.positional_index.get_term_positions(term) for term in terms]
+        candidates = set(candidate_ids.tolist()) if candidate_ids is not None else None
+        pair_count = len(terms) - 1
+        proximity_scores = defaultdict(float)
+        for positions1, positions2 in zip(term_positions, term_positions[1:]):
+            doc_ids = positions1.keys() & positions2.keys()
+            if candidates is not None:
+                doc_ids &= candidates
+            for doc_id in doc_ids:
+                distance = InvertedIndex.get_min_distance(positions1[doc_id], positions2[doc_id])
+                proximity_scores[doc_id] += 1.0 / max(distance, 1) / pair_count
+        
+        return proximity_scores
+    
+    def _create_search_result(self, context: QueryScoringContext, doc_id: int, similarity: float) -> SearchResult:
         """创建搜索结果对象"""
+        query_tokens = context.query_tokens
         doc = self.documents[doc_id]
         
         result = SearchResult(
@@ -269,36 +623,45 @@ class EnhancedQueryProcessor:
         result.matched_terms = self._find_matched_terms(query_tokens, doc.all_tokens)
         
         # 生成内容摘要片段
-        result.snippet = self._generate_snippet(doc.content, query_tokens)
+        result.snippet = self._generate_snippet(result.content, query_tokens)
         
         # 计算详细分数信息
-        self._calculate_detailed_scores(result, query_tokens)
+        self._calculate_detailed_scores(result, context)
         
         return result
     
-    def _calculate_detailed_scores(self, result: SearchResult, query_tokens: List[str]) -> None:
-        """计算详细的分数信息"""
+    def _calculate_detailed_scores(self, result: SearchResult, context: QueryScoringContext) -> None:
+        """
+        计算详细的分数信息
+        
+        优先读取评分上下文中排序阶段保存的分数数组；排序阶段没有计算的分数（如tfidf算法下的BM25分数）
+        每个查询只计算一次并保存到上下文中，供其余结果复用。
+        """
         doc_id = result.doc_id
+        query_tokens = context.query_tokens
         
         # 内容相关性分数
         if self.use_bm25 and self.bm25_model:
-            bm25_scores = self.bm25_model.get_query_document_scores(query_tokens)
-            result.content_score = bm25_scores[doc_id] if doc_id < len(bm25_scores) else 0.0
+            if context.bm25_scores is None:
+                context.bm25_scores = self.bm25_model.get_query_score_array(query_tokens)
+            result.content_score = float(context.bm25_scores[doc_id]) if doc_id < len(context.bm25_scores) else 0.0
         else:
-            tfidf_similarities = self._calculate_tfidf_similarities(query_tokens)
-            result.content_score = tfidf_similarities[doc_id] if doc_id < len(tfidf_similarities) else 0.0
+            if context.tfidf_scores is None:
+                context.tfidf_scores = self._calculate_tfidf_similarities(query_tokens)
+            result.content_score = context.tfidf_scores[doc_id] if doc_id < len(context.tfidf_scores) else 0.0
         
         # 时间新鲜度分数
         if self.use_temporal and self.temporal_scorer:
-            temporal_scores = self.temporal_scorer.calculate_temporal_scores([doc_id])
-            result.temporal_score = temporal_scores[0] if temporal_scores else 0.0
+            temporal_scores = self.temporal_scorer.get_temporal_score_array()
+            result.temporal_score = float(temporal_scores[doc_id]) if doc_id < len(temporal_scores) else 0.0
         
-        # 多字段分数
+        # 多字段分数：字段词频取自全局词典，查询TF权重每个查询只计算一次
         if self.use_multi_field and self.multi_field_scorer:
-            explanation = self.multi_field_scorer.get_field_score_explanation(
-                query_tokens, doc_id, self.documents, self.vector_space_model
+            if context.query_tf_weights is None:
+                context.query_tf_weights = self.multi_field_scorer.get_query_tf_weights(query_tokens)
+            result.field_scores = self.multi_field_scorer.get_field_scores(
+                query_tokens, doc_id, self.term_dictionary, self.vector_space_model, context.query_tf_weights
             )
-            result.field_scores = explanation.get("字段分数", {})
     
     def _find_matched_terms(self, query_tokens: List[str], doc_tokens: List[str]) -> List[str]:
         """找到查询与文档中的匹配词汇"""
@@ -382,9 +745,11 @@ class EnhancedQueryProcessor:
         
         # 基础TF-IDF解释
         if self.vector_space_model:
-            query_vector = self.vector_space_model.get_query_vector(query_tokens)
-            doc_vector = self.vector_space_model.get_document_vector(doc_id)
-            tfidf_similarity = self.similarity_calculator.cosine_similarity(query_vector, doc_vector)
+            query_vector = self.vector_space_model.get_sparse_query_vector(query_tokens)
+            doc_vector = self.vector_space_model.get_sparse_document_vector(doc_id)
+            tfidf_similarity = self.similarity_calculator.sparse_cosine_similarity(
+                query_vector, doc_vector, norm2=self.vector_space_model.get_document_norm(doc_id)
+            )
             
             explanation["TF-IDF相似度"] = tfidf_similarity
         
@@ -400,6 +765,10 @@ class EnhancedQueryProcessor:
             )
             explanation["多字段详情"] = multi_field_explanation
         
+        # 邻近度解释
+        if self.positional_index is not None:
+            explanation["邻近度分数"] = self._calculate_proximity_scores(query_tokens).get(doc_id, 0.0)
+        
         # 时间新鲜度解释
         if self.use_temporal and self.temporal_scorer:
             temporal_explanation = self.temporal_scorer.get_temporal_explanation(doc_id)
@@ -428,6 +797,9 @@ class EnhancedQueryProcessor:
             if self.temporal_scorer:
                 info["时间统计"] = self.temporal_scorer.get_temporal_stats()
         
+        if self.use_positions:
+            info["使用的算法"].append("邻近度")
+        
         if self.use_multi_field:
             info["使用的算法"].append("多字段权重")
             if self.multi_field_scorer:
@@ -440,6 +812,9 @@ class EnhancedQueryProcessor:
         if not info["使用的算法"]:
             info["使用的算法"].append("TF-IDF")
         
+        if self.date_index:
+            info["日期索引"] = self.date_index.get_stats()
+        
         return info
 
 
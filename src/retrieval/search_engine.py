@@ -6,6 +6,7 @@ from typing import List, Dict, Any
 from preprocessing.data_loader import DataLoader
 from preprocessing.document_processor import DocumentProcessor
 from retrieval.query_processor import EnhancedQueryProcessor, SearchResult
+from indexing.index_snapshot import IndexSnapshot
 import time
 
 class EnhancedSearchEngine:
@@ -21,7 +22,6 @@ class EnhancedSearchEngine:
         """
         self.data_file_path = data_file_path
         self.data_loader = DataLoader(data_file_path)
-        self.document_processor = DocumentProcessor()
         
         # 配置参数
         if config is None:
@@ -36,18 +36,40 @@ class EnhancedSearchEngine:
             }
         
         self.config = config
+        self.document_processor = DocumentProcessor(num_workers=config.get('num_workers', 1),
+                                                    tokenizer=config.get('tokenizer', 'auto'))
         self.query_processor = EnhancedQueryProcessor(
             use_bm25=config.get('use_bm25', True),
             use_temporal=config.get('use_temporal', True),
-            use_multi_field=config.get('use_multi_field', True)
+            use_multi_field=config.get('use_multi_field', True),
+            compress_postings=config.get('compress_postings', False),
+            use_positions=config.get('use_positions', False),
+            use_bm25f=config.get('use_bm25f', False),
+            bm25f_params={
+                'k1': config.get('bm25f_k1', EnhancedQueryProcessor.BM25F_PARAMS['k1']),
+                'field_weights': config.get('bm25f_field_weights'),
+                'field_b': config.get('bm25f_field_b')
+            },
+            text_processor=self.document_processor.text_processor
         )
         
+        # 索引快照：数据文件和处理配置未变化时直接加载，跳过文档处理和模型构建
+        self.use_index_snapshot = config.get('use_index_snapshot', True)
+        self.index_snapshot = IndexSnapshot(config.get('snapshot_dir', 'data/index_cache'))
+        
         self.documents = []
+        self.article_info = {}
         self.is_initialized = False
+        self.loaded_from_snapshot = False
         self.index_build_time = 0
     
-    def initialize(self) -> bool:
-        """初始化搜索引擎：加载数据、处理文档、构建索引"""
+    def initialize(self, rebuild_index: bool = False) -> bool:
+        """
+        初始化搜索引擎：加载数据、处理文档、构建索引
+        
+        Args:
+            rebuild_index: 是否忽略已有的索引快照强制重建
+        """
         print("=" * 50)
         print("初始化增强搜索引擎...")
         print("=" * 50)
@@ -55,23 +77,31 @@ class EnhancedSearchEngine:
         start_time = time.time()
         
         try:
-            # 1. 加载数据
-            print("\n步骤1: 加载数据")
-            articles = self.data_loader.load_articles()
-            if not articles:
-                print("❌ 错误：无法加载文章数据")
-                return False
+            if self.use_index_snapshot and not rebuild_index and self._restore_from_snapshot():
+                self.index_build_time = time.time() - start_time
+                self.is_initialized = True
+                
+                print(f"\n✅ 增强搜索引擎初始化完成！（使用索引快照）")
+                print(f"⏱️ 总耗时: {self.index_build_time:.2f} 秒")
+                self._print_system_stats()
+                return True
             
-            # 2. 处理文档
-            print("\n步骤2: 处理文档")
-            self.documents = self.document_processor.process_articles(articles)
+            # 1-2. 流式加载数据并处理文档，不同时保留全部原始文章
+            print("\n步骤1-2: 加载数据并处理文档")
+            self.documents = self.document_processor.process_articles(self.data_loader.iter_articles())
             if not self.documents:
-                print("❌ 错误：文档处理失败")
+                print("❌ 错误：无法加载文章数据")
                 return False
             
             # 3. 初始化增强查询处理器
             print("\n步骤3: 构建增强索引和模型")
             self.query_processor.initialize(self.documents)
+            self.article_info = self.data_loader.get_article_info()
+            
+            # 4. 保存索引快照
+            if self.use_index_snapshot:
+                print("\n步骤4: 保存索引快照")
+                self._save_snapshot()
             
             self.index_build_time = time.time() - start_time
             self.is_initialized = True
@@ -88,7 +118,38 @@ class EnhancedSearchEngine:
             traceback.print_exc()
             return False
     
-    def search(self, query: str, top_k: int = 10, algorithm: str = "enhanced") -> List[SearchResult]:
+    def _get_snapshot_config(self) -> Dict[str, Any]:
+        """获取决定索引内容的配置，作为快照键的一部分"""
+        return {
+            'text_processing': self.document_processor.text_processor.get_processing_config(),
+            'index': self.query_processor.get_index_config()
+        }
+    
+    def _restore_from_snapshot(self) -> bool:
+        """尝试从索引快照恢复文档和模型"""
+        print("\n检查索引快照...")
+        payload = self.index_snapshot.load(self.data_file_path, self._get_snapshot_config())
+        if payload is None:
+            return False
+        
+        self.documents = payload['documents']
+        self.document_processor.documents = self.documents
+        self.article_info = payload['article_info']
+        self.query_processor.restore_state(self.documents, payload['query_processor_state'])
+        self.loaded_from_snapshot = True
+        return True
+    
+    def _save_snapshot(self) -> None:
+        """将处理后的文档和已构建的模型保存为索引快照"""
+        payload = {
+            'documents': self.documents,
+            'article_info': self.article_info,
+            'query_processor_state': self.query_processor.export_state()
+        }
+        self.index_snapshot.save(self.data_file_path, self._get_snapshot_config(), payload)
+    
+    def search(self, query: str, top_k: int = 10, algorithm: str = "enhanced",
+               since: Any = None, until: Any = None) -> List[SearchResult]:
         """
         执行搜索
         
@@ -96,6 +157,9 @@ class EnhancedSearchEngine:
             query: 查询字符串
             top_k: 返回结果数量
             algorithm: 搜索算法 ('tfidf', 'bm25', 'enhanced')
+            since: 只搜索此时间之后发布的文章（含），datetime、date、ISO-8601字符串，
+                   或timedelta表示最近一段时间，如 timedelta(days=30)
+            until: 只搜索此时间之前发布的文章（含），为日期时包含当天全天
         """
         if not self.is_initialized:
             print("❌ 错误：搜索引擎未初始化")
@@ -106,10 +170,12 @@ class EnhancedSearchEngine:
             return []
         
         print(f"\n🔍 搜索查询: '{query}' (算法: {algorithm})")
+        if since is not None or until is not None:
+            print(f"📅 时间范围: {since if since is not None else '不限'} ~ {until if until is not None else '不限'}")
         start_time = time.time()
         
         try:
-            results = self.query_processor.search(query, top_k, algorithm)
+            results = self.query_processor.search(query, top_k, algorithm, since=since, until=until)
             search_time = time.time() - start_time
             
             print(f"⚡ 搜索完成，耗时: {search_time:.3f} 秒")
@@ -229,7 +295,7 @@ class EnhancedSearchEngine:
             return {"状态": "未初始化"}
         
         # 获取数据统计
-        data_stats = self.data_loader.get_article_info()
+        data_stats = self.article_info
         doc_stats = self.document_processor.get_document_stats()
         model_stats = self.query_processor.get_model_info()
         
@@ -237,8 +303,10 @@ class EnhancedSearchEngine:
             "系统状态": "已初始化",
             "配置参数": self.config,
             "索引构建时间": f"{self.index_build_time:.2f} 秒",
+            "索引来源": "索引快照" if self.loaded_from_snapshot else "重新构建",
             "数据统计": data_stats,
             "文档统计": doc_stats,
+            "词干缓存": self.document_processor.text_processor.get_cache_stats(),
             "模型统计": model_stats
         }
     
@@ -360,6 +428,8 @@ class EnhancedSearchEngine:
         print("  • 多字段权重：标题 > 摘要 > 内容")
         print("  • 时间新鲜度：新文章权重更高")
         print("  • 综合评分：内容相关性 + 时间新鲜度")
+        print("  • 短语查询：\"climate change\"（需启用位置索引 use_positions）")
+        print("  • 邻近查询：trade NEAR/5 china（两词相距不超过5个词）")
         
         print("\n⚙️ 命令:")
         print("  • 'compare <查询>' - 比较TF-IDF、BM25、增强算法")
@@ -1,6 +1,6 @@
 import math
 import numpy as np
-from typing import List, Tuple
+from typing import List, Tuple, Dict
 
 class SimilarityCalculator:
     """相似度计算器：计算查询与文档之间的相似度"""
@@ -41,6 +41,28 @@ class SimilarityCalculator:
         
         return dot_product / (norm1 * norm2)
     
+    def sparse_cosine_similarity(self, vector1: Dict[int, float], vector2: Dict[int, float],
+                                 norm1: float = None, norm2: float = None) -> float:
+        """计算稀疏向量 {维度: 权重} 的余弦相似度，只遍历较短向量的非零维度"""
+        if len(vector1) > len(vector2):
+            vector1, vector2 = vector2, vector1
+            norm1, norm2 = norm2, norm1
+        
+        # 计算点积
+        dot_product = sum(weight * vector2.get(dim, 0.0) for dim, weight in vector1.items())
+        
+        # 计算向量模长（如未提供）
+        if norm1 is None:
+            norm1 = math.sqrt(sum(w * w for w in vector1.values()))
+        if norm2 is None:
+            norm2 = math.sqrt(sum(w * w for w in vector2.values()))
+        
+        # 避免除零
+        if norm1 == 0 or norm2 == 0:
+            return 0.0
+        
+        return dot_product / (norm1 * norm2)
+    
     def euclidean_distance(self, vector1: List[float], vector2: List[float]) -> float:
         """计算欧几里得距离"""
         if len(vector1) != len(vector2):
@@ -127,8 +149,32 @@ class SimilarityCalculator:
     
     def get_top_k_documents(self, similarities: List[float], k: int = 10) -> List[Tuple[int, float]]:
         """获取相似度最高的前k个文档"""
-        ranked_docs = self.rank_documents(similarities)
-        return ranked_docs[:k]
+        return self.select_top_k(similarities, k)
+    
+    def select_top_k(self, similarities: List[float], k: int = 10) -> List[Tuple[int, float]]:
+        """
+        部分选择Top-K文档，无需对所有文档排序
+        
+        先用线性时间的partition找到第k大的分数作为阈值，只对高于阈值的文档排序，
+        与阈值并列的文档按文档ID升序补足，结果与rank_documents(similarities)[:k]一致。
+        复杂度 O(N + k log k)。
+        """
+        doc_count = len(similarities)
+        if k <= 0 or doc_count == 0:
+            return []
+        
+        scores = np.asarray(similarities, dtype=np.float64)
+        k = min(k, doc_count)
+        
+        # 第k大的分数
+        kth_score = np.partition(scores, doc_count - k)[doc_count - k]
+        
+        above = np.flatnonzero(scores > kth_score)
+        above = above[np.lexsort((above, -scores[above]))]
+        ties = np.flatnonzero(scores == kth_score)[:k - len(above)]
+        
+        top_doc_ids = np.concatenate([above, ties])
+        return list(zip(top_doc_ids.tolist(), scores[top_doc_ids].tolist()))
     
     def calculate_similarity_stats(self, similarities: List[float]) -> dict:
         """计算相似度统计信息"""
@@ -237,6 +283,12 @@ if __name__ == "__main__":
     for doc_id, sim in ranked_docs:
         print(f"  文档{doc_id}: {sim:.3f}")
     
+    # 测试Top-K部分选择
+    print(f"\n=== Top-K部分选择测试 ===")
+    top_docs = sim_calc.get_top_k_documents(similarities, k=2)
+    print(f"Top-2 (文档ID, 相似度): {top_docs}")
+    print(f"与完整排序一致: {top_docs == ranked_docs[:2]}")
+    
     # 测试统计信息
     print(f"\n=== 相似度统计 ===")
     stats = sim_calc.calculate_similarity_stats(similarities)
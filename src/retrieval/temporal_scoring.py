@@ -1,35 +1,60 @@
 import math
+import re
 import datetime
+import numpy as np
 from typing import List, Dict, Any, Tuple
-from dateutil import parser
 
 class TemporalScoring:
     """时间新鲜度评分：根据文档发布时间调整相关性分数"""
     
-    def __init__(self, decay_factor: float = 0.1, max_days: int = 365):
+    # 爬虫time标签datetime属性的ISO-8601格式：日期，可选时间、小数秒和时区
+    ISO_DATE_PATTERN = re.compile(
+        r'(\d{4})-(\d{2})-(\d{2})'
+        r'(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:[.,](\d+))?)?)?'
+        r'(Z|[+-]\d{2}:?\d{2})?$'
+    )
+    # 爬虫从正文中提取的日期格式及其他常见格式
+    DATE_FORMATS = ['%B %d, %Y', '%m/%d/%Y', '%d/%m/%Y', '%Y/%m/%d']
+    
+    def __init__(self, decay_factor: float = 0.1, max_days: int = 365,
+                 refresh_interval: datetime.timedelta = datetime.timedelta(days=1)):
         """
         初始化时间新鲜度评分器
         
         Args:
             decay_factor: 时间衰减因子，控制时间衰减的速度 (0.1-1.0)
             max_days: 最大考虑天数，超过此天数的文档权重为最小值
+            refresh_interval: 时间分数数组的刷新间隔，距上次计算超过此间隔时以当前时间重新计算
         """
         self.decay_factor = decay_factor
         self.max_days = max_days
+        self.refresh_interval = refresh_interval
         self.current_date = datetime.datetime.now()
+        self._fixed_current_date = False  # 通过set_parameters指定了当前日期时不随时钟刷新
         
         # 统计信息
         self.document_dates = []
         self.date_range_days = 0
         self.oldest_date = None
         self.newest_date = None
+        
+        # 日期解析缓存 {原字符串: datetime}，以及使用dateutil回退解析的次数
+        self._parse_cache = {}
+        self.fallback_parse_count = 0
+        
+        # 所有文档的时间分数数组（按文档ID排列），分析日期时计算，时钟刷新或参数变化时重新计算
+        self._temporal_score_array = None
     
     def analyze_document_dates(self, publish_times: List[str]) -> None:
         """分析文档日期分布，用于优化时间衰减参数"""
         print("分析文档时间分布...")
-        
-        self.document_dates = []
-        valid_dates = []
+        self.document_dates = self.parse_document_dates(publish_times)
+        self._update_date_statistics()
+    
+    def parse_document_dates(self, publish_times: List[str]) -> List[datetime.datetime]:
+        """解析每个文档的发布时间字符串，无法解析的为None"""
+        document_dates = []
+        fallback_parse_count = self.fallback_parse_count
         
         for i, time_str in enumerate(publish_times):
             try:
@@ -37,57 +62,123 @@ class TemporalScoring:
                     # 解析日期字符串
                     doc_date = self._parse_date(time_str)
                     if doc_date:
-                        self.document_dates.append(doc_date)
-                        valid_dates.append(doc_date)
+                        document_dates.append(doc_date)
                     else:
-                        self.document_dates.append(None)
+                        document_dates.append(None)
                 else:
-                    self.document_dates.append(None)
+                    document_dates.append(None)
             except Exception as e:
                 print(f"解析日期失败 (文档{i}): {time_str} - {e}")
-                self.document_dates.append(None)
+                document_dates.append(None)
+        
+        print(f"  日期解析: {len(self._parse_cache)}个不同日期字符串，"
+              f"dateutil回退解析 {self.fallback_parse_count - fallback_parse_count} 次")
+        return document_dates
+    
+    def restore_document_dates(self, document_dates: List[datetime.datetime]) -> None:
+        """从已解析的日期列表（如索引快照）恢复，无需重新解析日期字符串"""
+        self.document_dates = list(document_dates)
+        self._update_date_statistics()
+    
+    def _update_date_statistics(self) -> None:
+        """根据已解析的文档日期更新日期范围统计，并预先计算所有文档的时间分数"""
+        valid_dates = [d for d in self.document_dates if d is not None]
         
         if valid_dates:
-            self.oldest_date = min(valid_dates)
-            self.newest_date = max(valid_dates)
-            self.date_range_days = (self.newest_date - self.oldest_date).days
+            self.oldest_date = min(valid_dates, key=self._wall_time)
+            self.newest_date = max(valid_dates, key=self._wall_time)
+            self.date_range_days = (self._wall_time(self.newest_date) - self._wall_time(self.oldest_date)).days
             
             print(f"日期分析完成:")
-            print(f"  有效日期数: {len(valid_dates)}/{len(publish_times)}")
+            print(f"  有效日期数: {len(valid_dates)}/{len(self.document_dates)}")
             print(f"  最早日期: {self.oldest_date.strftime('%Y-%m-%d')}")
             print(f"  最新日期: {self.newest_date.strftime('%Y-%m-%d')}")
             print(f"  日期跨度: {self.date_range_days} 天")
         else:
             print("⚠️ 没有找到有效的日期信息")
+        
+        self._calculate_temporal_score_array()
+    
+    def set_parameters(self, decay_factor: float = None, max_days: int = None,
+                       current_date: datetime.datetime = None) -> None:
+        """调整衰减参数或指定当前日期，并重新计算时间分数数组。指定当前日期后不再随时钟刷新"""
+        if decay_factor is not None:
+            self.decay_factor = decay_factor
+        if max_days is not None:
+            self.max_days = max_days
+        if current_date is not None:
+            self.current_date = current_date
+            self._fixed_current_date = True
+        self._calculate_temporal_score_array()
     
     def _parse_date(self, date_str: str) -> datetime.datetime:
-        """解析各种日期格式"""
+        """
+        解析各种日期格式，结果按原字符串缓存
+        
+        依次尝试：爬虫输出的ISO-8601格式（正则快速路径）、常见的固定格式（strptime），
+        最后才使用dateutil的启发式解析，并记录回退次数。
+        """
         if not date_str or not date_str.strip():
             return None
         
+        if date_str in self._parse_cache:
+            return self._parse_cache[date_str]
+        
+        text = date_str.strip()
+        doc_date = self._parse_iso_date(text)
+        if doc_date is None:
+            doc_date = self._parse_date_with_formats(text)
+        if doc_date is None:
+            doc_date = self._parse_date_with_dateutil(text)
+        
+        self._parse_cache[date_str] = doc_date
+        return doc_date
+    
+    @classmethod
+    def _parse_iso_date(cls, text: str) -> datetime.datetime:
+        """快速解析ISO-8601日期（time标签的datetime属性），如 2025-06-03、2025-06-03T05:00:00-04:00"""
+        match = cls.ISO_DATE_PATTERN.match(text)
+        if not match:
+            return None
+        
+        year, month, day, hour, minute, second, fraction, zone = match.groups()
+        tzinfo = None
+        if zone == 'Z':
+            tzinfo = datetime.timezone.utc
+        elif zone:
+            sign = -1 if zone[0] == '-' else 1
+            zone_digits = zone[1:].replace(':', '')
+            offset = datetime.timedelta(hours=int(zone_digits[:2]), minutes=int(zone_digits[2:]))
+            tzinfo = datetime.timezone(sign * offset)
+        
         try:
-            # 尝试使用dateutil解析（支持多种格式）
-            return parser.parse(date_str)
-        except:
+            return datetime.datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0),
+                                     int(second or 0), int((fraction or '0')[:6].ljust(6, '0')), tzinfo)
+        except ValueError:
+            return None
+    
+    @classmethod
+    def _parse_date_with_formats(cls, text: str) -> datetime.datetime:
+        """按爬虫正文日期和常见固定格式依次尝试strptime"""
+        for fmt in cls.DATE_FORMATS:
             try:
-                # 尝试常见格式
-                formats = [
-                    '%Y-%m-%d',
-                    '%Y-%m-%dT%H:%M:%S',
-                    '%Y-%m-%d %H:%M:%S',
-                    '%m/%d/%Y',
-                    '%d/%m/%Y'
-                ]
-                
-                for fmt in formats:
-                    try:
-                        return datetime.datetime.strptime(date_str, fmt)
-                    except:
-                        continue
-                
-                return None
-            except:
-                return None
+                return datetime.datetime.strptime(text, fmt)
+            except ValueError:
+                continue
+        return None
+    
+    def _parse_date_with_dateutil(self, text: str) -> datetime.datetime:
+        """使用dateutil的启发式解析作为最后手段，未安装dateutil时返回None"""
+        try:
+            from dateutil import parser
+        except ImportError:
+            return None
+        
+        self.fallback_parse_count += 1
+        try:
+            return parser.parse(text)
+        except (ValueError, OverflowError):
+            return None
     
     def calculate_temporal_scores(self, document_indices: List[int] = None) -> List[float]:
         """
@@ -103,20 +194,58 @@ class TemporalScoring:
             print("⚠️ 未分析文档日期，请先调用 analyze_document_dates()")
             return []
         
+        temporal_scores = self.get_temporal_score_array()
         if document_indices is None:
-            document_indices = list(range(len(self.document_dates)))
+            return temporal_scores.tolist()
+        return self._take_temporal_scores(temporal_scores, document_indices).tolist()
+    
+    def get_temporal_score_array(self) -> np.ndarray:
+        """获取所有文档的时间新鲜度分数数组（按文档ID排列），距上次计算超过刷新间隔时以当前时间重新计算"""
+        if self._temporal_score_array is None:
+            self._calculate_temporal_score_array()
+        elif not self._fixed_current_date:
+            now = datetime.datetime.now()
+            if now - self.current_date >= self.refresh_interval:
+                self.current_date = now
+                self._calculate_temporal_score_array()
+        return self._temporal_score_array
+    
+    def get_reference_date(self) -> datetime.datetime:
+        """获取时间新鲜度评分使用的当前日期（按get_temporal_score_array的规则刷新），"最近N天"的范围也以它为准"""
+        self.get_temporal_score_array()
+        return self.current_date
+    
+    def _calculate_temporal_score_array(self) -> None:
+        """按当前日期和衰减参数向量化计算所有文档的时间分数，规则与_calculate_single_temporal_score一致"""
+        document_count = len(self.document_dates)
+        has_date = np.array([d is not None for d in self.document_dates], dtype=bool)
         
-        temporal_scores = []
+        # 天数差：与timedelta.days一致，向下取整
+        current_date = np.datetime64(self._wall_time(self.current_date), 'us')
+        dates = np.array([self._wall_time(d) for d in self.document_dates if d is not None], dtype='datetime64[us]')
+        days_diff = ((current_date - dates) // np.timedelta64(1, 'D')).astype(np.float64)
         
-        for doc_idx in document_indices:
-            if doc_idx < len(self.document_dates):
-                doc_date = self.document_dates[doc_idx]
-                score = self._calculate_single_temporal_score(doc_date)
-                temporal_scores.append(score)
-            else:
-                temporal_scores.append(0.0)
+        scores = np.exp(-self.decay_factor * (days_diff / self.max_days))
+        scores = np.clip(scores, 0.01, 1.0)
+        scores[days_diff < 0] = 1.0  # 未来日期（可能是数据错误），给予最高分数
+        scores[days_diff > self.max_days] = 0.01  # 超过最大考虑天数，给予最低分数
         
-        return temporal_scores
+        self._temporal_score_array = np.full(document_count, 0.1, dtype=np.float64)  # 无日期信息的文档给予最低分数
+        self._temporal_score_array[has_date] = scores
+    
+    @staticmethod
+    def _wall_time(date: datetime.datetime) -> datetime.datetime:
+        """去掉时区信息，按发布地的本地时间比较，避免带时区与不带时区的日期无法相减"""
+        return date.replace(tzinfo=None)
+    
+    @staticmethod
+    def _take_temporal_scores(temporal_scores: np.ndarray, document_indices: List[int]) -> np.ndarray:
+        """按文档索引取时间分数，超出范围的索引分数为0"""
+        document_indices = np.asarray(document_indices, dtype=np.int64)
+        scores = np.zeros(len(document_indices), dtype=np.float64)
+        in_range = document_indices < len(temporal_scores)
+        scores[in_range] = temporal_scores[document_indices[in_range]]
+        return scores
     
     def _calculate_single_temporal_score(self, doc_date: datetime.datetime) -> float:
         """计算单个文档的时间新鲜度分数"""
@@ -124,7 +253,7 @@ class TemporalScoring:
             return 0.1  # 无日期信息的文档给予最低分数
         
         # 计算天数差
-        days_diff = (self.current_date - doc_date).days
+        days_diff = (self._wall_time(self.current_date) - self._wall_time(doc_date)).days
         
         if days_diff < 0:
             # 未来日期（可能是数据错误），给予最高分数
@@ -177,20 +306,19 @@ class TemporalScoring:
         if len(content_scores) != len(document_indices):
             raise ValueError("内容分数和文档索引列表长度不匹配")
         
-        temporal_scores = self.calculate_temporal_scores(document_indices)
+        # 一次向量化运算完成候选文档的线性组合
+        if self.document_dates:
+            temporal_scores = self._take_temporal_scores(self.get_temporal_score_array(), document_indices)
+        else:
+            print("⚠️ 未分析文档日期，请先调用 analyze_document_dates()")
+            temporal_scores = np.zeros(0, dtype=np.float64)
         
         if len(temporal_scores) != len(content_scores):
             raise ValueError("时间分数和内容分数列表长度不匹配")
         
-        combined_scores = []
         content_weight = 1.0 - temporal_weight
-        
-        for content_score, temporal_score in zip(content_scores, temporal_scores):
-            # 线性组合
-            combined_score = content_weight * content_score + temporal_weight * temporal_score
-            combined_scores.append(combined_score)
-        
-        return combined_scores
+        combined_scores = content_weight * np.asarray(content_scores, dtype=np.float64) + temporal_weight * temporal_scores
+        return combined_scores.tolist()
     
     def get_temporal_explanation(self, doc_index: int) -> Dict[str, Any]:
         """解释时间新鲜度分数计算过程"""
@@ -206,7 +334,7 @@ class TemporalScoring:
                 "说明": "缺少日期信息，给予最低分数"
             }
         
-        days_diff = (self.current_date - doc_date).days
+        days_diff = (self._wall_time(self.current_date) - self._wall_time(doc_date)).days
         temporal_score = self._calculate_single_temporal_score(doc_date)
         
         return {
@@ -239,6 +367,7 @@ class TemporalScoring:
             "最早日期": self.oldest_date.strftime('%Y-%m-%d'),
             "最新日期": self.newest_date.strftime('%Y-%m-%d'),
             "日期跨度天数": self.date_range_days,
+            "dateutil回退解析次数": self.fallback_parse_count,
             "当前衰减因子": self.decay_factor,
             "自适应衰减因子": self.get_adaptive_decay_factor(),
             "平均时间分数": sum(all_temporal_scores) / len(all_temporal_scores),
@@ -1,66 +1,101 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
 import math
 import numpy as np
 from typing import List, Dict, Tuple
 from collections import defaultdict
+from indexing.term_dictionary import TermDictionary
 
 class VectorSpaceModel:
     """向量空间模型：将文档和查询表示为向量，计算TF-IDF权重"""
     
-    def __init__(self):
+    def __init__(self, use_sparse: bool = True):
+        """
+        初始化向量空间模型
+        
+        Args:
+            use_sparse: 是否使用稀疏存储（CSR矩阵），为False时使用稠密向量列表
+        """
+        self.use_sparse = use_sparse
+        
         self.vocabulary = []  # 词汇表
-        self.document_vectors = []  # 文档向量列表
+        self.term_to_id = {}  # {term: term_id}，term_id即词汇表下标
+        self.document_vectors = []  # 文档向量列表（仅稠密模式）
         self.idf_weights = {}  # IDF权重
         self.document_count = 0
         self.document_norms = []  # 文档向量的模长
+        
+        # 稀疏模式：按文档存储的CSR矩阵 (indptr, indices, data)
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.zeros(0, dtype=np.int32)
+        self.data = np.zeros(0, dtype=np.float64)
+        
+        # 稀疏模式：按词汇转置的倒排表示，查询时只访问查询词汇对应的列
+        self.term_indptr = np.zeros(1, dtype=np.int64)
+        self.term_doc_ids = np.zeros(0, dtype=np.int32)
+        self.term_weights = np.zeros(0, dtype=np.float64)
     
     def build_model(self, documents_tokens: List[List[str]]) -> None:
         """构建向量空间模型"""
-        self.document_count = len(documents_tokens)
+        self.build_from_dictionary(TermDictionary.from_token_lists(documents_tokens))
+    
+    def build_from_dictionary(self, term_dictionary: TermDictionary) -> None:
+        """
+        从全局词典构建向量空间模型，词汇表、文档频率和词频直接取自词典（使用'all'字段）
+        
+        Args:
+            term_dictionary: 已构建的全局词典
+        """
+        self.document_count = term_dictionary.document_count
         print(f"开始构建向量空间模型，共{self.document_count}个文档...")
         
-        # 1. 构建词汇表
-        self._build_vocabulary(documents_tokens)
+        # 1. 词汇表：与词典共享，词汇ID一致
+        terms, indptr, doc_ids, term_frequencies = term_dictionary.get_field_postings(TermDictionary.ALL_FIELDS)
+        self.vocabulary = terms
+        if terms is term_dictionary.terms:
+            self.term_to_id = term_dictionary.term_ids
+        else:
+            self.term_to_id = {term: term_id for term_id, term in enumerate(terms)}
+        print(f"词汇表构建完成，包含{len(self.vocabulary)}个唯一词汇")
         
         # 2. 计算IDF权重
-        self._calculate_idf_weights(documents_tokens)
+        idf_array = self._calculate_idf_weights(np.diff(indptr).tolist())
         
-        # 3. 构建文档向量
-        self._build_document_vectors(documents_tokens)
+        # 3. 构建文档向量（CSR行按文档组织，行内按词汇ID排序）
+        entry_term_ids = np.repeat(np.arange(len(terms), dtype=np.int32), np.diff(indptr))
+        order = np.lexsort((entry_term_ids, doc_ids))
+        row_indices = entry_term_ids[order]
+        row_tfs = term_frequencies[order]
+        row_indptr = np.zeros(self.document_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(doc_ids, minlength=self.document_count), out=row_indptr[1:])
+        
+        # 对数TF查表：1 + log(tf)
+        max_tf = int(row_tfs.max()) if len(row_tfs) else 0
+        log_tf = np.array([0.0] + [1 + math.log(freq) for freq in range(1, max_tf + 1)], dtype=np.float64)
+        row_weights = log_tf[row_tfs] * idf_array[row_indices]
+        
+        if self.use_sparse:
+            self._build_sparse_document_vectors(row_indptr, row_indices, row_weights)
+        else:
+            self._build_document_vectors(row_indptr, row_indices, row_weights)
         
-        print(f"向量空间模型构建完成！")
+        print(f"向量空间模型构建完成！（{'稀疏' if self.use_sparse else '稠密'}存储）")
         print(f"词汇表大小: {len(self.vocabulary)}")
         print(f"文档向量维度: {len(self.vocabulary)}")
     
-    def _build_vocabulary(self, documents_tokens: List[List[str]]) -> None:
-        """构建词汇表"""
-        vocab_set = set()
-        for tokens in documents_tokens:
-            vocab_set.update(tokens)
-        
-        # 按字母顺序排序，保证一致性
-        self.vocabulary = sorted(list(vocab_set))
-        print(f"词汇表构建完成，包含{len(self.vocabulary)}个唯一词汇")
-    
-    def _calculate_idf_weights(self, documents_tokens: List[List[str]]) -> None:
-        """计算IDF权重"""
-        # 计算每个词汇的文档频率
-        document_frequency = defaultdict(int)
-        
-        for tokens in documents_tokens:
-            unique_tokens = set(tokens)
-            for token in unique_tokens:
-                document_frequency[token] += 1
-        
-        # 计算IDF权重
+    def _calculate_idf_weights(self, document_frequencies: List[int]) -> np.ndarray:
+        """根据词汇表中每个词汇的文档频率计算IDF权重，返回按词汇ID排列的数组"""
         self.idf_weights = {}
-        for term in self.vocabulary:
-            df = document_frequency[term]
-            if df > 0:
-                self.idf_weights[term] = math.log(self.document_count / df)
-            else:
-                self.idf_weights[term] = 0
+        idf_list = []
+        for term, df in zip(self.vocabulary, document_frequencies):
+            idf = math.log(self.document_count / df) if df > 0 else 0
+            self.idf_weights[term] = idf
+            idf_list.append(idf)
         
         print(f"IDF权重计算完成")
+        return np.array(idf_list, dtype=np.float64)
     
     def _calculate_tf(self, tokens: List[str]) -> Dict[str, float]:
         """计算TF权重（使用对数TF）"""
@@ -80,32 +115,106 @@ class VectorSpaceModel:
         
         return tf_dict
     
-    def _build_document_vectors(self, documents_tokens: List[List[str]]) -> None:
-        """构建文档TF-IDF向量"""
+    def _build_document_vectors(self, row_indptr: np.ndarray, row_indices: np.ndarray,
+                                row_weights: np.ndarray) -> None:
+        """构建稠密文档TF-IDF向量"""
         self.document_vectors = []
         self.document_norms = []
         
-        for doc_id, tokens in enumerate(documents_tokens):
-            # 计算TF权重
-            tf_weights = self._calculate_tf(tokens)
+        for doc_id in range(self.document_count):
+            start, end = row_indptr[doc_id], row_indptr[doc_id + 1]
             
-            # 构建TF-IDF向量
-            tfidf_vector = []
-            for term in self.vocabulary:
-                tf = tf_weights.get(term, 0)
-                idf = self.idf_weights[term]
-                tfidf = tf * idf
-                tfidf_vector.append(tfidf)
+            # 构建TF-IDF向量，未出现的词汇权重为0
+            tfidf_vector = [0.0] * len(self.vocabulary)
+            weights = row_weights[start:end].tolist()
+            for term_id, weight in zip(row_indices[start:end].tolist(), weights):
+                tfidf_vector[term_id] = weight
             
             self.document_vectors.append(tfidf_vector)
             
             # 计算向量模长（用于余弦相似度）
-            norm = math.sqrt(sum(x * x for x in tfidf_vector))
+            norm = math.sqrt(sum(x * x for x in weights))
             self.document_norms.append(norm)
             
             if (doc_id + 1) % 100 == 0:
                 print(f"已构建 {doc_id + 1}/{self.document_count} 个文档向量")
     
+    def _build_sparse_document_vectors(self, row_indptr: np.ndarray, row_indices: np.ndarray,
+                                       row_weights: np.ndarray) -> None:
+        """构建稀疏TF-IDF矩阵（CSR），只存储非零权重"""
+        nonzero = row_weights != 0
+        kept_per_doc = np.bincount(np.repeat(np.arange(self.document_count), np.diff(row_indptr))[nonzero],
+                                   minlength=self.document_count)
+        self.indptr = np.zeros(self.document_count + 1, dtype=np.int64)
+        np.cumsum(kept_per_doc, out=self.indptr[1:])
+        self.indices = row_indices[nonzero].astype(np.int32)
+        self.data = row_weights[nonzero]
+        
+        # 模长：按行对权重平方求和（reduceat只能处理非空行，空行模长为0）
+        norms_sq = np.zeros(self.document_count, dtype=np.float64)
+        nonempty_docs = np.flatnonzero(kept_per_doc)
+        if len(nonempty_docs):
+            norms_sq[nonempty_docs] = np.add.reduceat(self.data * self.data, self.indptr[nonempty_docs])
+        self.document_norms = np.sqrt(norms_sq)
+        
+        self._build_term_columns()
+        print(f"稀疏矩阵构建完成，非零元素数: {len(self.data)}")
+    
+    def _build_term_columns(self) -> None:
+        """将CSR矩阵转置为按词汇组织的列存储（CSC），供查询时按词汇访问"""
+        row_lengths = np.diff(self.indptr)
+        entry_doc_ids = np.repeat(np.arange(self.document_count, dtype=np.int32), row_lengths)
+        
+        order = np.argsort(self.indices, kind='stable')
+        self.term_doc_ids = entry_doc_ids[order]
+        self.term_weights = self.data[order]
+        
+        column_sizes = np.bincount(self.indices, minlength=len(self.vocabulary))
+        self.term_indptr = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(column_sizes, out=self.term_indptr[1:])
+    
+    def get_sparse_query_vector(self, query_tokens: List[str]) -> Dict[int, float]:
+        """将查询转换为稀疏TF-IDF向量 {term_id: weight}，只包含非零权重"""
+        tf_weights = self._calculate_tf(query_tokens)
+        
+        query_vector = {}
+        for term, tf in tf_weights.items():
+            term_id = self.term_to_id.get(term)
+            if term_id is None:
+                continue
+            weight = tf * self.idf_weights[term]
+            if weight != 0:
+                query_vector[term_id] = weight
+        
+        return query_vector
+    
+    def calculate_cosine_scores(self, query_tokens: List[str], candidate_ids: np.ndarray = None) -> List[float]:
+        """
+        计算查询与所有文档的余弦相似度（稀疏模式）
+        
+        只遍历查询中非零词汇对应的倒排列，计算量与命中的非零元素数成正比，
+        与词汇表大小无关。指定candidate_ids（按文档ID升序）时只为其中的文档计分。
+        """
+        query_vector = self.get_sparse_query_vector(query_tokens)
+        scores = np.zeros(self.document_count, dtype=np.float64)
+        if not query_vector:
+            return scores.tolist()
+        
+        for term_id, query_weight in query_vector.items():
+            start, end = self.term_indptr[term_id], self.term_indptr[term_id + 1]
+            doc_ids, weights = self.term_doc_ids[start:end], self.term_weights[start:end]
+            if candidate_ids is not None:
+                positions = TermDictionary.select_postings(doc_ids, candidate_ids)
+                doc_ids, weights = doc_ids[positions], weights[positions]
+            scores[doc_ids] += query_weight * weights
+        
+        query_norm = math.sqrt(sum(w * w for w in query_vector.values()))
+        denominators = self.document_norms * query_norm
+        
+        similarities = np.zeros(self.document_count, dtype=np.float64)
+        np.divide(scores, denominators, out=similarities, where=denominators > 0)
+        return similarities.tolist()
+    
     def get_query_vector(self, query_tokens: List[str]) -> List[float]:
         """将查询转换为TF-IDF向量"""
         # 计算查询的TF权重
@@ -122,11 +231,37 @@ class VectorSpaceModel:
         return query_vector
     
     def get_document_vector(self, doc_id: int) -> List[float]:
-        """获取指定文档的TF-IDF向量"""
+        """获取指定文档的TF-IDF向量（稀疏模式下临时展开为稠密向量）"""
+        if self.use_sparse:
+            if not 0 <= doc_id < self.document_count:
+                return []
+            vector = [0.0] * len(self.vocabulary)
+            for term_id, weight in self.get_sparse_document_vector(doc_id).items():
+                vector[term_id] = weight
+            return vector
+        
         if 0 <= doc_id < len(self.document_vectors):
             return self.document_vectors[doc_id]
         return []
     
+    def get_sparse_document_vector(self, doc_id: int) -> Dict[int, float]:
+        """获取指定文档的稀疏TF-IDF向量 {term_id: weight}"""
+        if not self.use_sparse:
+            vector = self.get_document_vector(doc_id)
+            return {term_id: weight for term_id, weight in enumerate(vector) if weight != 0}
+        
+        if not 0 <= doc_id < self.document_count:
+            return {}
+        
+        start, end = self.indptr[doc_id], self.indptr[doc_id + 1]
+        return dict(zip(self.indices[start:end].tolist(), self.data[start:end].tolist()))
+    
+    def get_document_norm(self, doc_id: int) -> float:
+        """获取指定文档向量的模长"""
+        if 0 <= doc_id < len(self.document_norms):
+            return float(self.document_norms[doc_id])
+        return 0.0
+    
     def get_vector_info(self, vector: List[float]) -> Dict[str, any]:
         """获取向量的信息"""
         non_zero_count = sum(1 for x in vector if x > 0)
@@ -149,18 +284,24 @@ class VectorSpaceModel:
     
     def get_model_stats(self) -> Dict[str, any]:
         """获取模型统计信息"""
-        if not self.document_vectors:
-            return {}
-        
-        # 计算文档向量的统计信息
-        all_weights = []
-        for vector in self.document_vectors:
-            all_weights.extend([w for w in vector if w > 0])
+        if self.use_sparse:
+            if self.document_count == 0:
+                return {}
+            all_weights = self.data[self.data > 0].tolist()
+        else:
+            if not self.document_vectors:
+                return {}
+            
+            # 计算文档向量的统计信息
+            all_weights = []
+            for vector in self.document_vectors:
+                all_weights.extend([w for w in vector if w > 0])
         
         avg_doc_norm = sum(self.document_norms) / len(self.document_norms)
         
         return {
             "文档数量": self.document_count,
+            "存储方式": "稀疏CSR" if self.use_sparse else "稠密",
             "词汇表大小": len(self.vocabulary),
             "向量维度": len(self.vocabulary),
             "平均文档向量模长": avg_doc_norm,
@@ -245,4 +386,18 @@ if __name__ == "__main__":
     print(f"查询的重要词汇:")
     query_top_terms = vsm.get_top_terms_in_vector(query_vector, 5)
     for term, weight in query_top_terms:
-        print(f"  {term}: {weight:.3f}")
\ No newline at end of file
+        print(f"  {term}: {weight:.3f}")
+    
+    # 测试稀疏与稠密模式的一致性
+    print(f"\n=== 稀疏/稠密模式一致性测试 ===")
+    dense_vsm = VectorSpaceModel(use_sparse=False)
+    dense_vsm.build_model(documents)
+    sparse_scores = vsm.calculate_cosine_scores(test_query)
+    dense_query_vector = dense_vsm.get_query_vector(test_query)
+    for doc_id, sparse_score in enumerate(sparse_scores):
+        doc_vector = dense_vsm.get_document_vector(doc_id)
+        dot_product = sum(a * b for a, b in zip(dense_query_vector, doc_vector))
+        query_norm = math.sqrt(sum(a * a for a in dense_query_vector))
+        doc_norm = dense_vsm.document_norms[doc_id]
+        dense_score = dot_product / (query_norm * doc_norm) if query_norm and doc_norm else 0.0
+        print(f"文档{doc_id}: 稀疏={sparse_score:.6f}, 稠密={dense_score:.6f}")
\ No newline at end of file
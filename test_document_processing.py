@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文档处理测试：验证优化后的文档处理流程与原始串行处理结果一致
+"""
+
+import sys
+import os
+import json
+import time
+import string
+import tempfile
+import pickle
+from collections import Counter
+sys.path.append('src')
+
+from src.preprocessing.data_loader import DataLoader
+from src.preprocessing.document_processor import DocumentProcessor, Document, DocumentTextStore
+from src.preprocessing.text_processor import TextProcessor
+from src.retrieval.query_processor import EnhancedQueryProcessor
+
+
+def load_test_articles(limit: int = 40):
+    """加载部分NPR文章作为测试数据"""
+    with open('data/npr_articles.json', 'r', encoding='utf-8') as f:
+        return json.load(f)[:limit]
+
+
+def _document_signature(documents):
+    """收集文档处理结果用于比较"""
+    return [
+        (doc.doc_id, doc.title, doc.processed_title, doc.processed_content,
+         doc.processed_summary, doc.all_tokens)
+        for doc in documents
+    ]
+
+
+def test_parallel_processing_matches_serial():
+    """测试多进程文档处理：结果和顺序与串行处理一致"""
+    print("=== 测试并行文档处理 ===")
+    
+    articles = load_test_articles()
+    serial_documents = DocumentProcessor().process_articles(articles)
+    expected = _document_signature(serial_documents)
+    
+    for num_workers in [2, 3]:
+        parallel_documents = DocumentProcessor(num_workers=num_workers).process_articles(articles)
+        assert _document_signature(parallel_documents) == expected
+    
+    # 流式输入分成多块，排队的块数受限：结果顺序仍与串行处理一致
+    streaming_processor = DocumentProcessor(num_workers=2)
+    streaming_processor.PARALLEL_CHUNK_SIZE = 3
+    assert _document_signature(streaming_processor.process_articles(iter(articles))) == expected
+    
+    # 文章数少于进程数
+    assert _document_signature(DocumentProcessor(num_workers=4).process_articles(articles[:2])) == expected[:2]
+    assert DocumentProcessor(num_workers=2).process_articles([]) == []
+    print("✓ 并行处理结果与串行处理一致")
+
+
+def test_stem_cache_matches_stemmer():
+    """测试词干缓存：结果与直接调用词干提取器一致，命中统计正确，文档处理与查询处理共享缓存"""
+    print("=== 测试词干缓存 ===")
+    
+    text_processor = TextProcessor()
+    token_lists = []
+    for article in load_test_articles():
+        cleaned = text_processor.clean_text(article.get('content', ''))
+        token_lists.append(text_processor.remove_stopwords(text_processor.tokenize(cleaned)))
+    
+    for tokens in token_lists:
+        term_ids = text_processor.get_term_ids(tokens)
+        assert [text_processor.get_term(term_id) for term_id in term_ids] == \
+            [text_processor.stemmer.stem(token) for token in tokens]
+    
+    stats = text_processor.get_cache_stats()
+    total_tokens = sum(len(tokens) for tokens in token_lists)
+    assert stats["命中次数"] + stats["未命中次数"] == total_tokens
+    assert stats["未命中次数"] == stats["缓存词形数"] == len({t for tokens in token_lists for t in tokens})
+    assert stats["命中次数"] > stats["未命中次数"]
+    
+    # 不同词形的相同词干共用词汇ID
+    term_ids = text_processor.get_term_ids(["running", "runs", "run"])
+    assert len(set(term_ids)) == 1 and text_processor.get_term(term_ids[0]) == "run"
+    print(f"✓ 词干缓存结果正确，命中率 {stats['命中率']:.1%}")
+    
+    # 查询处理复用文档处理的缓存
+    document_processor = DocumentProcessor()
+    document_processor.process_articles(load_test_articles(5))
+    query_processor = EnhancedQueryProcessor(text_processor=document_processor.text_processor)
+    hits_before = document_processor.text_processor.cache_hits
+    query_tokens = query_processor.process_query(document_processor.documents[0].title)
+    assert query_tokens == document_processor.documents[0].processed_title
+    assert document_processor.text_processor.cache_hits - hits_before == len(query_tokens)
+    print("✓ 查询处理共享文档处理的词干缓存")
+    
+    # 查询中的新词形只提取词干，不登记词汇ID，词汇表和缓存不增长
+    text_processor = document_processor.text_processor
+    vocabulary_size, cache_size = len(text_processor.terms), len(text_processor._token_cache)
+    novel_query = "zyxwvutsrunning quixotically flabbergasted"
+    assert query_processor.process_query(novel_query) == TextProcessor().process_text(novel_query)
+    
+    # 非构建调用（process_text、stem_words）同样只读取缓存
+    novel_tokens = novel_query.split()
+    assert text_processor.process_text(novel_query) == text_processor.stem_words(novel_tokens) == \
+        [text_processor.stemmer.stem(token) for token in novel_tokens]
+    assert len(text_processor.terms) == len(text_processor.term_ids) == vocabulary_size
+    assert len(text_processor._token_cache) == cache_size
+    print("✓ 查询和非构建调用不会使词汇表增长")
+    
+    # 重新构建时使用新的词汇表，之前构建的文档不受影响
+    first_documents = document_processor.documents
+    first_titles = [doc.processed_title for doc in first_documents]
+    document_processor.process_articles(load_test_articles(2))
+    assert len(text_processor.terms) < vocabulary_size
+    assert [doc.processed_title for doc in first_documents] == first_titles
+    print("✓ 每次构建重新开始词汇表")
+
+
+def test_fused_tokenizer_matches_staged_pipeline():
+    """测试单次遍历的文本处理：与逐步清洗、分词、去停用词、词干提取的结果一致，并比较耗时"""
+    print("=== 测试单次遍历文本处理 ===")
+    
+    text_processor = TextProcessor()
+    
+    def staged(text):
+        tokens = text_processor.tokenize(text_processor.clean_text(text))
+        return text_processor.stem_words(text_processor.remove_stopwords(tokens))
+    
+    edge_cases = [
+        "", "   ", "A I x", "The President SAID: \"Hello\" -- ok?!",
+        "Visit https://example.com/a?b=1 or HTTP://X.ORG now",
+        "<b>Bold</b> text<br/>joined and <a href='x'>link</a>",
+        "mail me@example.com, or foo<b>@bar.com",
+        "tabs\tand\nnewlines\r\n  spaces",
+        # 正则分词逐词处理的边界：句末缩写、引号、合写词出现在文本中间和末尾
+        "we wanna go and they wanna", "wanna", "A. B. Smith met J. Doe. Then left.",
+        "\"quoted\" words 'single' \"end\"", "'tis cannot gonna more'n d'ye don't",
+        "wait... what -- (really) [yes] cost $1,000.50: done, ok."
+    ]
+    texts = edge_cases + [article.get(field) or '' for article in load_test_articles(None)
+                          for field in ('title', 'content', 'summary')]
+    for tokenizer in TextProcessor.TOKENIZERS:
+        processor = TextProcessor(tokenizer=tokenizer)
+        for text in texts:
+            tokens = processor.tokenize(processor.clean_text(text))
+            assert processor.process_text(text) == processor.stem_words(processor.remove_stopwords(tokens)), text
+            assert processor.process_text(text, use_stemming=False) == processor.remove_stopwords(tokens)
+            assert processor.process_query(text) == processor.process_text(text)
+            assert [processor.get_term(term_id) for term_id in processor.process_text_ids(text)] == \
+                processor.process_text(text)
+        print(f"✓ {processor.get_active_tokenizer()}分词: {len(texts)} 段文本的处理结果一致")
+    for text in texts:
+        text_processor.process_text_ids(text)
+    
+    # 词干缓存已预热，只比较清洗和分词流程的耗时
+    start = time.perf_counter()
+    for text in texts:
+        staged(text)
+    staged_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    for text in texts:
+        text_processor.process_text(text)
+    fused_time = time.perf_counter() - start
+    print(f"逐步处理: {staged_time * 1000:.1f}ms, 单次遍历: {fused_time * 1000:.1f}ms, "
+          f"加速 {staged_time / fused_time:.1f}x")
+
+
+def _reference_word_tokenize(text):
+    """NLTK参考分词：优先使用word_tokenize；缺少punkt数据时用未训练的Punkt分句加Treebank分词近似"""
+    from nltk.tokenize import word_tokenize, NLTKWordTokenizer
+    from nltk.tokenize.punkt import PunktSentenceTokenizer
+    try:
+        return word_tokenize(text), "word_tokenize"
+    except LookupError:
+        tokenizer = NLTKWordTokenizer()
+        sentences = PunktSentenceTokenizer().tokenize(text)
+        return [token for sentence in sentences for token in tokenizer.tokenize(sentence)], "Punkt+Treebank（近似）"
+
+
+def test_regex_tokenizer_agreement_with_nltk():
+    """测试内置正则分词：不依赖NLTK数据，与NLTK分词结果的一致率不低于99%"""
+    print("=== 测试正则分词器 ===")
+    
+    text_processor = TextProcessor('regex')
+    assert text_processor.get_processing_config()['tokenizer'] == 'regex'
+    assert text_processor.regex_tokenize("they don't can't i'm") == \
+        ['they', 'do', "n't", 'ca', "n't", 'i', "'m"]
+    assert text_processor.regex_tokenize('he said "hello, world." then left.') == \
+        ['he', 'said', '``', 'hello', ',', 'world', '.', "''", 'then', 'left', '.']
+    assert text_processor.regex_tokenize("cost $1,000.50 (approx) -- cannot") == \
+        ['cost', '$', '1,000.50', '(', 'approx', ')', '--', 'can', 'not']
+    
+    try:
+        TextProcessor('spacy')
+        assert False, "应拒绝未知的分词器"
+    except ValueError:
+        pass
+    
+    def significant(tokens):
+        return Counter(token for token in tokens if token not in string.punctuation and len(token) > 1)
+    
+    matched = reference_total = regex_total = 0
+    differences = Counter()
+    reference_name = None
+    for article in load_test_articles(None):
+        for field in ('title', 'content', 'summary'):
+            cleaned = text_processor.clean_text(article.get(field) or '')
+            reference_tokens, reference_name = _reference_word_tokenize(cleaned)
+            reference = significant(reference_tokens)
+            regex = significant(text_processor.regex_tokenize(cleaned))
+            matched += sum((reference & regex).values())
+            reference_total += sum(reference.values())
+            regex_total += sum(regex.values())
+            differences.update({f"-{token}": count for token, count in (reference - regex).items()})
+            differences.update({f"+{token}": count for token, count in (regex - reference).items()})
+    
+    agreement = 2 * matched / (reference_total + regex_total)
+    print(f"参考分词: {reference_name}，词数 {reference_total}，正则分词词数 {regex_total}")
+    print(f"一致率: {agreement:.2%}")
+    print(f"主要差异: {differences.most_common(10)}")
+    assert agreement >= 0.99
+    
+    # 正则模式下的完整处理流程与逐步处理一致
+    for article in load_test_articles(5):
+        text = article.get('content', '')
+        tokens = text_processor.remove_stopwords(text_processor.tokenize(text_processor.clean_text(text)))
+        assert text_processor.process_text(text) == text_processor.stem_words(tokens)
+    print("✓ 正则分词与NLTK分词基本一致")
+
+
+def test_streaming_loader_matches_json_load():
+    """测试流式加载：JSON数组（任意分块大小）和JSON Lines的结果与json.load一致，格式错误时报错"""
+    print("=== 测试流式加载 ===")
+    
+    articles = load_test_articles(None)
+    chunk_size = DataLoader.CHUNK_SIZE
+    try:
+        for size in [1, 7, 500, chunk_size]:
+            DataLoader.CHUNK_SIZE = size
+            loader = DataLoader('data/npr_articles.json')
+            assert loader.load_articles() == articles, size
+    finally:
+        DataLoader.CHUNK_SIZE = chunk_size
+    assert loader.get_article_info()["总文章数"] == len(articles)
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        jsonl_file = os.path.join(temp_dir, 'articles.jsonl')
+        with open(jsonl_file, 'w', encoding='utf-8') as f:
+            for article in articles:
+                f.write(json.dumps(article, ensure_ascii=False) + '\n\n')
+        loader = DataLoader(jsonl_file)
+        assert list(loader.iter_articles()) == articles
+        assert loader.get_article_info()["总文章数"] == len(articles)
+        
+        # 流式处理的文档与先加载全部文章再处理一致
+        streamed = DocumentProcessor().process_articles(DataLoader(jsonl_file).iter_articles())
+        assert _document_signature(streamed) == _document_signature(DocumentProcessor().process_articles(articles))
+        
+        bad_file = os.path.join(temp_dir, 'bad.json')
+        for text in ['[{"a": 1} {"b": 2}]', '[{"a": 1},', '[{"a": 1}, {"b": }]', '[1]', '{"a": 1}\n{bad}\n']:
+            with open(bad_file, 'w', encoding='utf-8') as f:
+                f.write(text)
+            try:
+                list(DataLoader(bad_file).iter_articles())
+                assert False, text
+            except ValueError:
+                pass
+            assert DataLoader(bad_file).load_articles() == []
+        
+        for text in ['[]', ' [ ] ', '']:
+            with open(bad_file, 'w', encoding='utf-8') as f:
+                f.write(text)
+            assert DataLoader(bad_file).load_articles() == []
+    print("✓ 流式加载结果与json.load一致")
+
+
+def test_compact_document_representation():
+    """测试紧凑文档表示：词汇ID数组还原的词汇与文本处理结果一致，原文可按需读取，可序列化"""
+    print("=== 测试紧凑文档表示 ===")
+    
+    articles = load_test_articles()
+    processor = DocumentProcessor()
+    documents = processor.process_articles(articles)
+    text_processor = TextProcessor()
+    for doc, article in zip(documents, articles):
+        assert not hasattr(doc, '__dict__')
+        assert doc.content_ids.typecode == 'I'
+        assert doc.content == article['content'] and doc.summary == article['summary']
+        assert doc.processed_title == text_processor.process_text(article['title'])
+        assert doc.processed_content == text_processor.process_text(article['content'])
+        
+        expected = doc.processed_title + doc.processed_content + doc.processed_summary
+        all_tokens = doc.all_tokens
+        assert all_tokens == expected and list(all_tokens) == expected and len(all_tokens) == len(expected)
+        assert all_tokens[:10] == expected[:10] and all_tokens[-1] == expected[-1]
+        assert all_tokens[len(doc.title_ids)] == expected[len(doc.title_ids)]
+    
+    # 所有文档共享同一个文本存储和词汇表
+    assert all(doc.text_store is processor.text_store and doc.terms is processor.text_processor.terms
+               for doc in documents)
+    assert len(processor.text_store) == 2 * len(documents)
+    
+    restored = pickle.loads(pickle.dumps(documents, protocol=pickle.HIGHEST_PROTOCOL))
+    assert _document_signature(restored) == _document_signature(documents)
+    assert restored[3].content == documents[3].content
+    
+    # 单独创建的文档，空文本和非ASCII文本
+    doc = Document(7, "Title", "Café — “quoted” ✓", None, "", "")
+    assert doc.content == "Café — “quoted” ✓" and doc.summary == "" and list(doc.all_tokens) == []
+    store = DocumentTextStore()
+    assert [store.add(text) for text in ["a", "", "b" * 1000]] == [0, 1, 2]
+    assert store.get(1) == "" and store.get(2) == "b" * 1000 and len(store.data) < 100
+    print("✓ 紧凑文档表示与原始处理结果一致")
+
+
+if __name__ == "__main__":
+    test_parallel_processing_matches_serial()
+    test_stem_cache_matches_stemmer()
+    test_fused_tokenizer_matches_staged_pipeline()
+    test_regex_tokenizer_agreement_with_nltk()
+    test_streaming_loader_matches_json_load()
+    test_compact_document_representation()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+索引存储测试：索引快照、二进制倒排索引文件、压缩倒排列表
+"""
+
+import sys
+import os
+import json
+import shutil
+import pickle
+import random
+import tempfile
+sys.path.append('src')
+
+from src.retrieval.search_engine import EnhancedSearchEngine
+from src.indexing.index_snapshot import IndexSnapshot
+from src.indexing.inverted_index import InvertedIndex, CompressedPostingList, vbyte_encode, vbyte_decode
+
+TEST_QUERIES = ["climate change", "health care medical", "trump tariffs trade"]
+
+
+def _create_test_data_file(directory: str, limit: int = 30) -> str:
+    """从NPR数据中截取部分文章作为测试数据文件"""
+    with open('data/npr_articles.json', 'r', encoding='utf-8') as f:
+        articles = json.load(f)[:limit]
+    
+    data_file = os.path.join(directory, 'articles.json')
+    with open(data_file, 'w', encoding='utf-8') as f:
+        json.dump(articles, f, ensure_ascii=False)
+    return data_file
+
+
+def _load_test_tokens(limit: int = 60):
+    """加载部分NPR文章并简单分词"""
+    with open('data/npr_articles.json', 'r', encoding='utf-8') as f:
+        articles = json.load(f)[:limit]
+    return [f"{a.get('title', '')} {a.get('content', '')}".lower().split() for a in articles]
+
+
+def _search_signature(engine: EnhancedSearchEngine):
+    """收集各算法的搜索结果用于比较"""
+    signature = []
+    for query in TEST_QUERIES:
+        for algorithm in ["tfidf", "bm25", "enhanced"]:
+            results = engine.search(query, top_k=5, algorithm=algorithm)
+            signature.append([(r.doc_id, round(r.similarity, 9), round(r.content_score, 9)) for r in results])
+    return signature
+
+
+def test_index_snapshot_warm_start():
+    """测试索引快照：热启动结果与冷启动一致，数据变化后自动重建"""
+    print("=== 测试索引快照 ===")
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        data_file = _create_test_data_file(temp_dir)
+        config = {'snapshot_dir': os.path.join(temp_dir, 'cache')}
+        
+        cold_engine = EnhancedSearchEngine(data_file, config)
+        assert cold_engine.initialize()
+        assert not cold_engine.loaded_from_snapshot
+        cold_signature = _search_signature(cold_engine)
+        
+        warm_engine = EnhancedSearchEngine(data_file, config)
+        assert warm_engine.initialize()
+        assert warm_engine.loaded_from_snapshot
+        assert _search_signature(warm_engine) == cold_signature
+        print("✓ 热启动搜索结果与冷启动一致")
+        
+        # 强制重建
+        rebuilt_engine = EnhancedSearchEngine(data_file, config)
+        assert rebuilt_engine.initialize(rebuild_index=True)
+        assert not rebuilt_engine.loaded_from_snapshot
+        
+        # 数据文件变化后快照失效
+        _create_test_data_file(temp_dir, limit=20)
+        changed_engine = EnhancedSearchEngine(data_file, config)
+        assert changed_engine.initialize()
+        assert not changed_engine.loaded_from_snapshot
+        assert len(changed_engine.documents) == 20
+        print("✓ 数据文件变化后快照自动重建")
+        
+        # 版本变化后快照失效
+        snapshot = IndexSnapshot(config['snapshot_dir'])
+        snapshot_config = changed_engine._get_snapshot_config()
+        assert snapshot.load(data_file, snapshot_config) is not None
+        IndexSnapshot.SNAPSHOT_VERSION += 1
+        try:
+            assert snapshot.load(data_file, snapshot_config) is None
+        finally:
+            IndexSnapshot.SNAPSHOT_VERSION -= 1
+        print("✓ 快照版本变化后不再复用")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_inverted_index_binary_round_trip():
+    """测试二进制索引文件：内存映射加载后倒排列表、布尔检索和BM25评分与原索引一致"""
+    print("=== 测试二进制倒排索引文件 ===")
+    
+    documents_tokens = _load_test_tokens()
+    inverted_index = InvertedIndex()
+    inverted_index.build_index(documents_tokens)
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        index_path = os.path.join(temp_dir, 'index.bin')
+        inverted_index.save_index(index_path)
+        
+        mapped_index = InvertedIndex()
+        mapped_index.load_index(index_path)
+        assert mapped_index.document_count == inverted_index.document_count
+        assert mapped_index.vocabulary == inverted_index.vocabulary
+        assert mapped_index.document_lengths == inverted_index.document_lengths
+        for term in inverted_index.vocabulary:
+            assert mapped_index.search_term(term) == inverted_index.search_term(term)
+        assert mapped_index.search_term("nonexistentterm") == []
+        print("✓ 倒排列表一致")
+        
+        for query in TEST_QUERIES:
+            terms = query.split()
+            assert mapped_index.search_and(terms) == inverted_index.search_and(terms)
+            assert mapped_index.search_or(terms) == inverted_index.search_or(terms)
+        print("✓ 布尔检索一致")
+        
+        # 序列化只记录文件路径，反序列化后重新映射
+        restored_index = pickle.loads(pickle.dumps(mapped_index))
+        assert restored_index.search_term("the") == inverted_index.search_term("the")
+        restored_index.close()
+        mapped_index.close()
+        
+        # 兼容旧版pickle格式
+        legacy_path = os.path.join(temp_dir, 'index.pkl')
+        with open(legacy_path, 'wb') as f:
+            pickle.dump({'index': inverted_index.index, 'document_count': inverted_index.document_count,
+                         'vocabulary': inverted_index.vocabulary,
+                         'document_lengths': inverted_index.document_lengths}, f)
+        legacy_index = InvertedIndex()
+        legacy_index.load_index(legacy_path)
+        assert legacy_index.search_term("the") == inverted_index.search_term("the")
+        print("✓ 兼容旧版索引文件")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_compressed_postings_match_uncompressed():
+    """测试压缩倒排列表：解码结果、跳表指针、布尔检索和BM25评分与未压缩索引一致"""
+    print("=== 测试压缩倒排列表 ===")
+    
+    values = [0, 1, 127, 128, 255, 16383, 16384, 2 ** 21, 2 ** 32 - 1]
+    assert vbyte_decode(bytes(vbyte_encode(values))).tolist() == values
+    assert vbyte_decode(bytes(vbyte_encode(range(100)))).tolist() == list(range(100))
+    print("✓ 变长字节编码往返一致")
+    
+    # 重复文档使常见词的倒排列表超过一块
+    documents_tokens = _load_test_tokens() * 3
+    inverted_index = InvertedIndex()
+    inverted_index.build_index(documents_tokens)
+    compressed_index = InvertedIndex(compress_postings=True)
+    compressed_index.build_index(documents_tokens)
+    
+    assert sorted(compressed_index.get_terms()) == sorted(inverted_index.get_terms())
+    for term in inverted_index.vocabulary:
+        assert compressed_index.search_term(term) == inverted_index.search_term(term)
+    assert compressed_index.search_term("nonexistentterm") == []
+    print("✓ 倒排列表解码一致")
+    
+    posting_list = compressed_index.get_posting_list("the")
+    assert isinstance(posting_list, CompressedPostingList)
+    assert posting_list.get_block_count() > 1
+    block_doc_ids = []
+    for block in range(posting_list.get_block_count()):
+        block_doc_ids.extend(posting_list.get_block_document_ids(block))
+    assert block_doc_ids == inverted_index.get_documents_containing_term("the")
+    for doc_id in [0, 57, 130, 179]:
+        block = posting_list.find_block(doc_id)
+        assert doc_id in posting_list.get_block_document_ids(block)
+    print("✓ 跳表指针定位正确")
+    
+    for query in TEST_QUERIES:
+        terms = query.split()
+        assert sorted(compressed_index.search_and(terms)) == sorted(inverted_index.search_and(terms))
+        assert sorted(compressed_index.search_or(terms)) == sorted(inverted_index.search_or(terms))
+    print("✓ 布尔检索一致")
+    
+    # 压缩索引可以序列化，也可以保存为二进制索引文件
+    restored_index = pickle.loads(pickle.dumps(compressed_index))
+    assert restored_index.search_term("the") == inverted_index.search_term("the")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        index_path = os.path.join(temp_dir, 'index.bin')
+        compressed_index.save_index(index_path)
+        mapped_index = InvertedIndex()
+        mapped_index.load_index(index_path)
+        assert mapped_index.search_term("the") == inverted_index.search_term("the")
+        mapped_index.close()
+    finally:
+        shutil.rmtree(temp_dir)
+    print("✓ 压缩索引序列化和保存正确")
+
+
+def test_search_and_matches_set_intersection():
+    """测试AND搜索：倍增/跳表求交集与集合求交集结果一致"""
+    print("=== 测试AND搜索求交集 ===")
+    
+    documents_tokens = _load_test_tokens() * 3
+    indexes = [InvertedIndex(), InvertedIndex(compress_postings=True)]
+    for inverted_index in indexes:
+        inverted_index.build_index(documents_tokens)
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        index_path = os.path.join(temp_dir, 'index.bin')
+        indexes[0].save_index(index_path)
+        mapped_index = InvertedIndex()
+        mapped_index.load_index(index_path)
+        indexes.append(mapped_index)
+        
+        # 混合常见词与少见词，覆盖重复词汇和不存在的词汇
+        rng = random.Random(7)
+        reference_index = indexes[0]
+        terms = sorted(reference_index.vocabulary)
+        common_terms = sorted(terms, key=lambda t: -reference_index.get_posting_list(t).document_frequency)[:30]
+        queries = [["the"], ["the", "the"], ["the", "nonexistentterm"]]
+        for _ in range(200):
+            queries.append(rng.sample(common_terms, rng.randint(2, 4)) + rng.sample(terms, rng.randint(0, 1)))
+        
+        for query in queries:
+            expected = set(reference_index.get_documents_containing_term(query[0]))
+            for term in query[1:]:
+                expected &= set(reference_index.get_documents_containing_term(term))
+            for inverted_index in indexes:
+                assert inverted_index.search_and(query) == sorted(expected), query
+        mapped_index.close()
+    finally:
+        shutil.rmtree(temp_dir)
+    print("✓ 原始、压缩、内存映射索引的AND搜索结果均与集合求交集一致")
+
+
+if __name__ == "__main__":
+    test_index_snapshot_warm_start()
+    test_inverted_index_binary_round_trip()
+    test_compressed_postings_match_uncompressed()
+    test_search_and_matches_set_intersection()
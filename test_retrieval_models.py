@@ -0,0 +1,728 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检索模型测试：验证优化后的检索实现与原始实现结果一致
+"""
+
+import sys
+import os
+import json
+import math
+import datetime
+from collections import Counter
+import numpy as np
+import shutil
+import tempfile
+sys.path.append('src')
+
+from src.retrieval.vector_space_model import VectorSpaceModel
+from src.retrieval.similarity_calculator import SimilarityCalculator
+from src.retrieval.bm25_model import BM25Model
+from src.retrieval.bm25f_model import BM25FModel
+from src.retrieval.search_engine import EnhancedSearchEngine
+from src.retrieval.multi_field_scoring import MultiFieldScoring
+from src.retrieval.temporal_scoring import TemporalScoring
+from src.indexing.inverted_index import InvertedIndex
+from src.indexing.term_dictionary import TermDictionary
+from src.indexing.date_index import DateIndex
+
+TEST_QUERIES = [
+    ["climate", "change"],
+    ["health", "care", "medical"],
+    ["trump", "tariffs", "trade", "china"],
+    ["the", "president"],
+    ["xyznotaword"],
+]
+
+
+def create_test_data_file(directory: str, limit: int = 40) -> str:
+    """从NPR数据中截取部分文章，写入临时目录作为搜索引擎的测试数据文件"""
+    with open('data/npr_articles.json', 'r', encoding='utf-8') as f:
+        articles = json.load(f)[:limit]
+    
+    data_file = os.path.join(directory, 'articles.json')
+    with open(data_file, 'w', encoding='utf-8') as f:
+        json.dump(articles, f, ensure_ascii=False)
+    return data_file
+
+
+def create_test_engine(data_file: str, config: dict) -> EnhancedSearchEngine:
+    """创建并初始化测试用搜索引擎"""
+    engine = EnhancedSearchEngine(data_file, config)
+    assert engine.initialize()
+    return engine
+
+
+def load_test_corpus(limit: int = 60):
+    """加载NPR文章并做简单分词，作为测试语料"""
+    with open('data/npr_articles.json', 'r', encoding='utf-8') as f:
+        articles = json.load(f)[:limit]
+    
+    return [
+        (article.get('title', '') + ' ' + article.get('content', '')).lower().split()
+        for article in articles
+    ]
+
+
+def test_sparse_vsm_matches_dense():
+    """测试稀疏向量空间模型与稠密模型的余弦相似度一致"""
+    print("=== 测试稀疏/稠密向量空间模型一致性 ===")
+    
+    documents_tokens = load_test_corpus()
+    sim_calc = SimilarityCalculator()
+    
+    dense_vsm = VectorSpaceModel(use_sparse=False)
+    dense_vsm.build_model(documents_tokens)
+    sparse_vsm = VectorSpaceModel(use_sparse=True)
+    sparse_vsm.build_model(documents_tokens)
+    
+    for doc_id in range(len(documents_tokens)):
+        assert math.isclose(dense_vsm.document_norms[doc_id], sparse_vsm.document_norms[doc_id],
+                            rel_tol=1e-12, abs_tol=1e-12)
+    
+    for query in TEST_QUERIES:
+        query_vector = dense_vsm.get_query_vector(query)
+        dense_scores = sim_calc.calculate_similarities(query_vector, dense_vsm.document_vectors, "cosine")
+        sparse_scores = sparse_vsm.calculate_cosine_scores(query)
+        
+        assert len(dense_scores) == len(sparse_scores)
+        for dense_score, sparse_score in zip(dense_scores, sparse_scores):
+            assert math.isclose(dense_score, sparse_score, rel_tol=1e-9, abs_tol=1e-12)
+        
+        print(f"✓ 查询 {query}: {len(sparse_scores)} 个文档分数一致")
+    
+    # 单文档向量接口
+    doc_id = 3
+    assert dense_vsm.get_document_vector(doc_id) == sparse_vsm.get_document_vector(doc_id)
+    sparse_similarity = sim_calc.sparse_cosine_similarity(
+        sparse_vsm.get_sparse_query_vector(TEST_QUERIES[0]),
+        sparse_vsm.get_sparse_document_vector(doc_id)
+    )
+    dense_similarity = sim_calc.cosine_similarity(
+        dense_vsm.get_query_vector(TEST_QUERIES[0]), dense_vsm.get_document_vector(doc_id)
+    )
+    assert math.isclose(sparse_similarity, dense_similarity, rel_tol=1e-9, abs_tol=1e-12)
+    print("✓ 单文档稀疏向量与稠密向量一致")
+
+
+
+def test_bm25_postings_scoring_matches_exhaustive():
+    """测试基于倒排列表的BM25计分与逐文档计分结果一致"""
+    print("=== 测试BM25倒排列表计分 ===")
+    
+    documents_tokens = load_test_corpus()
+    bm25 = BM25Model(k1=1.5, b=0.75)
+    bm25.build_model(documents_tokens)
+    
+    for query in TEST_QUERIES + [["climate", "climate", "change"]]:
+        scores = bm25.get_query_document_scores(query)
+        expected = [bm25._calculate_bm25_score(query, doc_id) for doc_id in range(bm25.document_count)]
+        
+        assert scores == expected
+        
+        # 候选文档即包含任一查询词汇的文档
+        candidates = bm25.score_candidates(query)
+        assert sorted(candidates) == [doc_id for doc_id, tokens in enumerate(documents_tokens)
+                                      if any(term in tokens for term in query)]
+        assert all(scores[doc_id] == score for doc_id, score in candidates.items())
+        print(f"✓ 查询 {query}: {sum(1 for s in scores if s != 0)} 个候选文档分数一致")
+
+
+
+def test_bm25_search_matches_full_sort():
+    """测试BM25 Top-K检索与全量计分后完整排序的结果一致（含负IDF词汇和结果不足k篇的情况）"""
+    print("=== 测试BM25 Top-K检索 ===")
+    
+    documents_tokens = load_test_corpus()
+    bm25 = BM25Model(k1=1.5, b=0.75)
+    bm25.build_model(documents_tokens)
+    
+    queries = TEST_QUERIES + [
+        ["the", "and", "of", "climate"],  # 含负IDF的高频词
+        ["alaska", "oil", "drilling", "trump", "officials", "the"],
+    ]
+    
+    for query in queries:
+        for top_k in [1, 3, 10, len(documents_tokens) + 5]:
+            scores = [bm25._calculate_bm25_score(query, doc_id) for doc_id in range(len(documents_tokens))]
+            expected = sorted(enumerate(scores), key=lambda x: (-x[1], x[0]))[:top_k]
+            assert bm25.search(query, top_k=top_k) == expected, (query, top_k)
+        print(f"✓ 查询 {query}: Top-K结果与全量排序一致")
+
+
+
+def test_top_k_selection_matches_full_ranking():
+    """测试部分选择Top-K与完整排序结果一致（并列时按文档ID升序）"""
+    print("=== 测试Top-K部分选择 ===")
+    
+    import random
+    random.seed(42)
+    sim_calc = SimilarityCalculator()
+    
+    for trial in range(200):
+        doc_count = random.randint(0, 50)
+        # 使用少量离散取值，制造大量并列分数
+        similarities = [random.choice([0.0, 0.0, 0.25, 0.5, 0.75, 1.0, -0.5]) for _ in range(doc_count)]
+        for k in [1, 3, 10, doc_count, doc_count + 3]:
+            assert sim_calc.get_top_k_documents(similarities, k) == sim_calc.rank_documents(similarities)[:k]
+    
+    print("✓ 200组随机分数的Top-K结果与完整排序一致")
+
+
+def test_phrase_and_near_search_match_brute_force():
+    """测试位置索引：短语和邻近搜索与逐篇扫描结果一致，词频与普通索引一致"""
+    print("=== 测试位置索引 ===")
+    
+    documents_tokens = load_test_corpus()
+    inverted_index = InvertedIndex()
+    inverted_index.build_index(documents_tokens)
+    positional_index = InvertedIndex(store_positions=True)
+    positional_index.build_index(documents_tokens)
+    for term in inverted_index.vocabulary:
+        assert positional_index.search_term(term) == inverted_index.search_term(term)
+    
+    def brute_force_phrase(phrase):
+        counts = {}
+        for doc_id, tokens in enumerate(documents_tokens):
+            count = sum(1 for i in range(len(tokens) - len(phrase) + 1) if tokens[i:i + len(phrase)] == phrase)
+            if count:
+                counts[doc_id] = count
+        return counts
+    
+    def brute_force_near(term1, term2, max_distance):
+        distances = {}
+        for doc_id, tokens in enumerate(documents_tokens):
+            positions1 = [i for i, token in enumerate(tokens) if token == term1]
+            positions2 = [i for i, token in enumerate(tokens) if token == term2]
+            if positions1 and positions2:
+                distance = min(abs(i - j) for i in positions1 for j in positions2)
+                if distance <= max_distance:
+                    distances[doc_id] = distance
+        return distances
+    
+    for phrase in [["climate", "change"], ["the", "president"], ["of", "the", "united"], ["the", "the"]]:
+        assert positional_index.search_phrase(phrase) == brute_force_phrase(phrase), phrase
+    for term1, term2, max_distance in [("trade", "china", 10), ("health", "care", 1), ("the", "of", 3)]:
+        assert positional_index.search_near(term1, term2, max_distance) == brute_force_near(term1, term2, max_distance)
+    
+    print("✓ 短语和邻近搜索结果与逐篇扫描一致")
+    
+    # 按字段构建时，短语和邻近匹配不跨越字段边界，词频和文档长度按所有字段合计
+    field_index = InvertedIndex(store_positions=True)
+    field_index.build_field_index([(["trade", "war"], ["china", "trade"], []), (["trade", "china"],)])
+    assert field_index.search_phrase(["war", "china"]) == {}
+    assert field_index.search_phrase(["china", "trade"]) == {0: 1}
+    assert field_index.search_phrase(["trade", "china"]) == {1: 1}
+    assert field_index.search_near("war", "china", 100) == {}
+    assert field_index.search_near("trade", "china", 1) == {0: 1, 1: 1}
+    assert field_index.search_term("trade") == [(0, 2), (1, 1)]
+    assert field_index.document_lengths == {0: 4, 1: 2}
+    print("✓ 短语和邻近匹配不跨越字段边界")
+
+
+def test_positional_queries_in_search_engine():
+    """测试搜索引擎中的短语/邻近查询；普通单词查询结果不受位置索引影响"""
+    print("=== 测试短语与邻近查询 ===")
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        data_file = create_test_data_file(temp_dir)
+        
+        engines = {}
+        for use_positions in [False, True]:
+            engines[use_positions] = create_test_engine(
+                data_file, {'use_index_snapshot': False, 'use_positions': use_positions})
+        
+        processor = engines[True].query_processor
+        parsed_query = processor.parse_query('"climate change" trade NEAR/5 china')
+        assert parsed_query['phrases'] == [processor.process_query('climate change')]
+        assert len(parsed_query['near']) == 1 and parsed_query['near'][0][2] == 5
+        assert parsed_query['tokens'] == processor.process_query('climate change trade china')
+        
+        # 单词查询没有邻近度加分，结果与未启用位置索引时完全一致
+        for algorithm in ["tfidf", "bm25", "enhanced"]:
+            for query in ["climate", "tariffs"]:
+                expected = [(r.doc_id, r.similarity) for r in engines[False].search(query, top_k=10, algorithm=algorithm)]
+                actual = [(r.doc_id, r.similarity) for r in engines[True].search(query, top_k=10, algorithm=algorithm)]
+                assert actual == expected
+        print("✓ 单词查询结果不变")
+        
+        # 标题末尾和正文开头的词不组成短语（除非同一字段内也相邻出现）
+        for doc in engines[True].documents:
+            fields = (doc.processed_title, doc.processed_content, doc.processed_summary)
+            if not (fields[0] and fields[1]):
+                continue
+            boundary = [fields[0][-1], fields[1][0]]
+            within_field = any(tokens[i:i + 2] == boundary for tokens in fields for i in range(len(tokens) - 1))
+            assert (doc.doc_id in processor.positional_index.search_phrase(boundary)) == within_field
+        print("✓ 短语不跨越字段边界")
+        
+        phrase_tokens = processor.process_query('climate change')
+        for algorithm in ["tfidf", "bm25", "enhanced"]:
+            results = engines[True].search('"climate change"', top_k=10, algorithm=algorithm)
+            for result in results:
+                tokens = engines[True].documents[result.doc_id].all_tokens
+                assert any(tokens[i:i + len(phrase_tokens)] == phrase_tokens for i in range(len(tokens)))
+        print("✓ 短语查询只返回包含该短语的文章")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_term_dictionary_matches_per_field_models():
+    """测试全局词典的各字段统计与按字段词汇列表单独构建的模型一致"""
+    print("=== 测试全局词典 ===")
+    
+    class FieldDocument:
+        def __init__(self, title, content, summary):
+            self.processed_title = title
+            self.processed_content = content
+            self.processed_summary = summary
+    
+    documents_tokens = load_test_corpus(40)
+    # 标题取前几个词，摘要取第10个词之后的一段，部分文档摘要为空
+    documents = [FieldDocument(tokens[:5], tokens[5:], tokens[10:20] if i % 4 else [])
+                 for i, tokens in enumerate(documents_tokens)]
+    dictionary = TermDictionary()
+    dictionary.build(documents)
+    
+    fields_tokens = {field: [getattr(doc, f'processed_{field}') for doc in documents] for field in TermDictionary.FIELDS}
+    fields_tokens[TermDictionary.ALL_FIELDS] = [doc.processed_title + doc.processed_content + doc.processed_summary
+                                                for doc in documents]
+    total_counts = Counter(token for tokens in fields_tokens[TermDictionary.ALL_FIELDS] for token in tokens)
+    
+    for field, tokens_list in fields_tokens.items():
+        assert dictionary.field_lengths[field] == [len(tokens) for tokens in tokens_list]
+        for term in ["climate", "the", "trump", "xyznotaword"]:
+            expected = [(doc_id, Counter(tokens)[term]) for doc_id, tokens in enumerate(tokens_list) if term in tokens]
+            doc_ids, tfs = dictionary.get_postings(term, field)
+            assert list(zip(doc_ids.tolist(), tfs.tolist())) == expected
+            assert dictionary.get_document_frequency(term, field) == len(expected)
+            assert dictionary.get_collection_frequency(term) == total_counts[term]
+        
+        # 从词典构建的BM25模型与从词汇列表构建的模型完全一致
+        expected_model = BM25Model(k1=1.2, b=0.75)
+        expected_model.build_model(tokens_list)
+        model = BM25Model(k1=1.2, b=0.75)
+        model.build_from_dictionary(dictionary, field)
+        assert model.vocabulary == expected_model.vocabulary
+        assert model.idf_values == expected_model.idf_values
+        assert model.document_lengths == expected_model.document_lengths
+        for query in TEST_QUERIES:
+            assert model.get_query_document_scores(query) == expected_model.get_query_document_scores(query)
+        print(f"✓ 字段 {field}: 词频、文档频率和BM25分数一致")
+    
+    # 向量空间模型与词典共享词汇表和词汇ID
+    vsm = VectorSpaceModel()
+    vsm.build_from_dictionary(dictionary)
+    expected_vsm = VectorSpaceModel()
+    expected_vsm.build_model(fields_tokens[TermDictionary.ALL_FIELDS])
+    assert vsm.vocabulary is dictionary.terms and vsm.term_to_id is dictionary.term_ids
+    assert vsm.document_norms.tolist() == expected_vsm.document_norms.tolist()
+    for query in TEST_QUERIES:
+        assert vsm.calculate_cosine_scores(query) == expected_vsm.calculate_cosine_scores(query)
+    print("✓ 向量空间模型与词典共享词汇表，分数一致")
+
+
+def test_fused_enhanced_scoring_matches_component_scoring():
+    """测试融合评分器的增强算法分数与逐项计算（全文BM25、多字段BM25、邻近度、时间）一致"""
+    print("=== 测试融合评分器 ===")
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        data_file = create_test_data_file(temp_dir)
+        
+        for use_positions in [False, True]:
+            engine = create_test_engine(data_file, {'use_index_snapshot': False, 'use_positions': use_positions})
+            processor = engine.query_processor
+            assert processor.enhanced_scorer is not None
+            
+            for query in ["climate change global warming", "trump tariffs china trade", "the the president",
+                          "xyznotaword"]:
+                query_tokens = processor.process_query(query)
+                fused = processor._calculate_enhanced_similarities(query_tokens)
+                expected = processor._calculate_enhanced_similarities_by_component(query_tokens)
+                assert len(fused) == len(expected)
+                for fused_score, expected_score in zip(fused, expected):
+                    assert math.isclose(fused_score, expected_score, rel_tol=1e-12, abs_tol=1e-12)
+            print(f"✓ 位置索引{'开启' if use_positions else '关闭'}: 融合分数与逐项计算一致")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_search_result_details_from_scoring_context():
+    """测试搜索结果的详细分数（内容、时间、字段分数）与逐个结果重新计算的结果一致"""
+    print("=== 测试评分上下文 ===")
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        data_file = create_test_data_file(temp_dir)
+        
+        engine = create_test_engine(data_file, {'use_index_snapshot': False})
+        processor = engine.query_processor
+        
+        for algorithm in ["tfidf", "bm25", "enhanced"]:
+            for query in ["climate change global warming", "trump trade trade china"]:
+                query_tokens = processor.process_query(query)
+                bm25_scores = processor.bm25_model.get_query_document_scores(query_tokens)
+                results = processor.search(query, top_k=10, algorithm=algorithm)
+                assert results
+                for result in results:
+                    assert result.content_score == bm25_scores[result.doc_id]
+                    assert result.temporal_score == processor.temporal_scorer.calculate_temporal_scores([result.doc_id])[0]
+                    explanation = processor.multi_field_scorer.get_field_score_explanation(
+                        query_tokens, result.doc_id, processor.documents, processor.vector_space_model)
+                    assert result.field_scores == explanation["字段分数"]
+            print(f"✓ 算法 {algorithm}: 结果详情与逐个计算一致")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_multi_field_tfidf_postings_match_per_document_scoring():
+    """测试基于字段倒排数据的多字段TF-IDF分数、覆盖度奖励和分数解释与逐文档计算一致"""
+    print("=== 测试多字段TF-IDF候选集计分 ===")
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        data_file = create_test_data_file(temp_dir)
+        
+        # 不使用BM25时增强算法的多字段分数走TF-IDF
+        engine = create_test_engine(data_file, {'use_index_snapshot': False, 'use_bm25': False})
+        processor = engine.query_processor
+        assert processor.enhanced_scorer is None and processor.multi_field_scorer.field_postings
+        
+        per_document_scorer = MultiFieldScoring(title_weight=3.0, summary_weight=2.0, content_weight=1.0)
+        for query in ["climate change global warming", "trump trade trade china", "the", "xyznotaword", ""]:
+            query_tokens = processor.process_query(query)
+            expected = per_document_scorer.calculate_field_scores_tfidf(
+                query_tokens, processor.documents, processor.vector_space_model)
+            actual = processor.multi_field_scorer.calculate_field_scores_tfidf(
+                query_tokens, processor.documents, processor.vector_space_model)
+            assert actual == expected
+            
+            # 覆盖度奖励、字段重要性和分数解释从字段倒排数据查找，与还原词汇列表的结果一致
+            assert (processor.multi_field_scorer.calculate_field_coverage_bonus(query_tokens, processor.documents) ==
+                    per_document_scorer.calculate_field_coverage_bonus(query_tokens, processor.documents))
+            assert (processor.multi_field_scorer.analyze_field_importance(query_tokens, processor.documents) ==
+                    per_document_scorer.analyze_field_importance(query_tokens, processor.documents))
+            for doc_id in range(0, len(processor.documents), 7):
+                assert (processor.multi_field_scorer.get_field_score_explanation(
+                            query_tokens, doc_id, processor.documents, processor.vector_space_model) ==
+                        per_document_scorer.get_field_score_explanation(
+                            query_tokens, doc_id, processor.documents, processor.vector_space_model))
+            print(f"✓ 查询 '{query}': {sum(1 for score in actual if score != 0)} 个文档分数非零，与逐文档计算一致")
+        
+        assert engine.search("climate change", top_k=5, algorithm="enhanced")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_bm25f_matches_brute_force_formula():
+    """测试BM25F分数与按公式逐文档计算的结果一致，融合评分器使用BM25F时与逐项计算一致"""
+    print("=== 测试BM25F模型 ===")
+    
+    class FieldDocument:
+        def __init__(self, title, content, summary):
+            self.processed_title = title
+            self.processed_content = content
+            self.processed_summary = summary
+    
+    documents_tokens = load_test_corpus(40)
+    documents = [FieldDocument(tokens[:5], tokens[5:], tokens[10:20] if i % 4 else [])
+                 for i, tokens in enumerate(documents_tokens)]
+    dictionary = TermDictionary()
+    dictionary.build(documents)
+    
+    field_weights = {'title': 3.0, 'summary': 2.0, 'content': 1.0}
+    field_b = {'title': 0.3, 'summary': 0.6, 'content': 0.75}
+    bm25f = BM25FModel(k1=1.2, field_weights=field_weights, field_b=field_b)
+    bm25f.build_from_dictionary(dictionary)
+    
+    fields = ('title', 'summary', 'content')
+    field_tokens = {field: [getattr(doc, f'processed_{field}') for doc in documents] for field in fields}
+    average_lengths = {field: sum(map(len, field_tokens[field])) / len(documents) for field in fields}
+    document_count = len(documents)
+    
+    def brute_force_scores(query):
+        scores = []
+        for doc_id in range(document_count):
+            score = 0.0
+            for term, query_tf in Counter(query).items():
+                df = sum(1 for i in range(document_count) if any(term in field_tokens[field][i] for field in fields))
+                pseudo_tf = sum(
+                    field_weights[field] * field_tokens[field][doc_id].count(term) /
+                    (1 - field_b[field] + field_b[field] * len(field_tokens[field][doc_id]) / average_lengths[field])
+                    for field in fields)
+                if df == 0 or pseudo_tf == 0:
+                    continue
+                idf = math.log((document_count - df + 0.5) / (df + 0.5))
+                score += idf * pseudo_tf * 2.2 / (1.2 + pseudo_tf) * query_tf
+            scores.append(score)
+        return scores
+    
+    for query in TEST_QUERIES + [["climate", "climate", "change"]]:
+        expected = brute_force_scores(query)
+        actual = bm25f.get_query_document_scores(query)
+        explained = [bm25f.explain_score(query, doc_id)['total_score'] for doc_id in range(document_count)]
+        for actual_score, explained_score, expected_score in zip(actual, explained, expected):
+            assert math.isclose(actual_score, expected_score, rel_tol=1e-9, abs_tol=1e-12)
+            assert math.isclose(explained_score, expected_score, rel_tol=1e-9, abs_tol=1e-12)
+        print(f"✓ 查询 {query}: BM25F分数与公式一致")
+    
+    # 修改参数后只重新计算条目得分
+    field_weights.update({'title': 6.0, 'summary': 0.0})
+    field_b['content'] = 0.5
+    bm25f.set_parameters(field_weights=field_weights, field_b=field_b)
+    for query in TEST_QUERIES:
+        for actual_score, expected_score in zip(bm25f.get_query_document_scores(query), brute_force_scores(query)):
+            assert math.isclose(actual_score, expected_score, rel_tol=1e-9, abs_tol=1e-12)
+    print("✓ 调整字段权重后分数随之更新")
+
+
+def test_bm25f_in_search_engine():
+    """测试启用BM25F后的增强算法：融合评分与逐项计算一致，索引快照可恢复"""
+    print("=== 测试搜索引擎中的BM25F ===")
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        data_file = create_test_data_file(temp_dir)
+        config = {'use_bm25f': True, 'snapshot_dir': os.path.join(temp_dir, 'cache')}
+        
+        engine = create_test_engine(data_file, config)
+        processor = engine.query_processor
+        assert processor.bm25f_model is not None and not processor.bm25_field_models
+        assert processor.enhanced_scorer.use_bm25f
+        
+        for query in ["climate change global warming", "trump tariffs china trade", "xyznotaword"]:
+            query_tokens = processor.process_query(query)
+            fused = processor._calculate_enhanced_similarities(query_tokens)
+            expected = processor._calculate_enhanced_similarities_by_component(query_tokens)
+            for fused_score, expected_score in zip(fused, expected):
+                assert math.isclose(fused_score, expected_score, rel_tol=1e-12, abs_tol=1e-12)
+        print("✓ BM25F融合分数与逐项计算一致")
+        
+        expected_results = [(r.doc_id, r.similarity) for r in engine.search("climate change", top_k=10)]
+        restored = EnhancedSearchEngine(data_file, config)
+        assert restored.initialize() and restored.loaded_from_snapshot
+        assert [(r.doc_id, r.similarity) for r in restored.search("climate change", top_k=10)] == expected_results
+        print("✓ 从索引快照恢复后结果一致")
+        
+        # 调整BM25F参数后融合评分器立即使用新的条目得分
+        query_tokens = processor.process_query("climate change global warming")
+        before = processor._calculate_enhanced_similarities(query_tokens)
+        processor.bm25f_model.set_parameters(field_weights={'title': 8.0}, field_b={'content': 0.3})
+        fused = processor._calculate_enhanced_similarities(query_tokens)
+        expected = processor._calculate_enhanced_similarities_by_component(query_tokens)
+        assert fused != before
+        for fused_score, expected_score in zip(fused, expected):
+            assert math.isclose(fused_score, expected_score, rel_tol=1e-12, abs_tol=1e-12)
+        print("✓ 调整BM25F参数后融合分数随之更新")
+        
+        # 字段权重和b参数来自配置，并参与索引快照的配置键
+        tuned_config = dict(config, bm25f_k1=1.5, bm25f_field_weights={'title': 5.0}, bm25f_field_b={'summary': 0.5})
+        tuned = EnhancedSearchEngine(data_file, tuned_config)
+        assert tuned.initialize() and not tuned.loaded_from_snapshot
+        tuned_model = tuned.query_processor.bm25f_model
+        assert tuned_model.k1 == 1.5
+        assert tuned_model.field_weights == {'title': 5.0, 'summary': 2.0, 'content': 1.0}
+        assert tuned_model.field_b == {'title': 0.75, 'summary': 0.5, 'content': 0.75}
+        print("✓ BM25F参数可通过配置调整")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_temporal_score_array_matches_per_document_scores():
+    """测试预先计算的时间分数数组与逐文档计算一致，并在参数变化或时钟刷新时更新"""
+    print("=== 测试时间分数数组 ===")
+    
+    current_date = datetime.datetime(2025, 6, 3, 9, 30)
+    publish_times = ["2025-06-03", "2025-06-02T23:59:59", "2025-05-15", "2025-01-01", "2024-06-03",
+                     "2024-06-04 10:00:00", "2023-01-01", "2025-07-01", "", "invalid"]
+    temporal_scorer = TemporalScoring(decay_factor=0.2, max_days=365)
+    temporal_scorer.analyze_document_dates(publish_times)
+    
+    def per_document_scores():
+        return [temporal_scorer._calculate_single_temporal_score(d) for d in temporal_scorer.document_dates]
+    
+    for decay_factor, max_days in [(0.2, 365), (1.0, 30), (0.5, 400)]:
+        temporal_scorer.set_parameters(decay_factor=decay_factor, max_days=max_days, current_date=current_date)
+        temporal_scores = temporal_scorer.get_temporal_score_array()
+        for actual, expected in zip(temporal_scores.tolist(), per_document_scores()):
+            assert math.isclose(actual, expected, rel_tol=1e-12)
+        assert temporal_scorer.calculate_temporal_scores([9, 0, 100]) == [0.1, temporal_scores[0], 0.0]
+        
+        content_scores = [0.9, 0.5, 0.0]
+        combined = temporal_scorer.combine_content_and_temporal_scores(content_scores, [0, 3, 100], temporal_weight=0.3)
+        expected = [0.7 * 0.9 + 0.3 * temporal_scores[0], 0.7 * 0.5 + 0.3 * temporal_scores[3], 0.0]
+        assert combined == expected
+    print("✓ 时间分数数组与逐文档计算一致")
+    
+    # 未指定当前日期时，超过刷新间隔后以当前时间重新计算
+    clock_scorer = TemporalScoring(decay_factor=0.2, max_days=365, refresh_interval=datetime.timedelta(days=1))
+    clock_scorer.analyze_document_dates(["2025-06-01"])
+    first_scores = clock_scorer.get_temporal_score_array()
+    assert clock_scorer.get_temporal_score_array() is first_scores
+    clock_scorer.current_date -= datetime.timedelta(days=2)
+    clock_scorer._calculate_temporal_score_array()
+    assert clock_scorer.get_temporal_score_array() is not first_scores
+    assert (datetime.datetime.now() - clock_scorer.current_date) < datetime.timedelta(days=1)
+    print("✓ 超过刷新间隔后重新计算")
+
+
+def test_fast_date_parsing_matches_dateutil():
+    """测试日期解析快速路径与dateutil结果一致，只有无法快速解析的字符串才回退到dateutil"""
+    print("=== 测试日期解析快速路径 ===")
+    from dateutil import parser
+    
+    fast_dates = ["2025-06-03", "2025-06-03T05:00:00-04:00", "2025-06-03T05:00:00Z", "2025-06-03 10:11",
+                  "2025-06-03T05:00:00.5+0530", " 2025-06-02 ", "June 3, 2025", "6/3/2025", "13/05/2025"]
+    fallback_dates = ["Tue, 03 Jun 2025 05:00:00 GMT", "invalid"]
+    temporal_scorer = TemporalScoring()
+    temporal_scorer.analyze_document_dates(fast_dates * 3 + ["", None])
+    assert temporal_scorer.fallback_parse_count == 0
+    assert temporal_scorer.document_dates[-2:] == [None, None]
+    for date_str, doc_date in zip(fast_dates, temporal_scorer.document_dates):
+        expected = parser.parse(date_str)
+        assert doc_date == expected and doc_date.utcoffset() == expected.utcoffset()
+    print("✓ 快速路径解析结果与dateutil一致，重复字符串只解析一次")
+    
+    temporal_scorer.analyze_document_dates(fallback_dates * 2)
+    assert temporal_scorer.fallback_parse_count == len(fallback_dates)
+    assert temporal_scorer.document_dates == [parser.parse(fallback_dates[0]), None] * 2
+    assert temporal_scorer.get_temporal_stats()["dateutil回退解析次数"] == len(fallback_dates)
+    print("✓ 回退解析次数统计正确")
+
+
+def test_date_index_matches_brute_force_filter():
+    """测试日期索引的时间范围查询与逐文档比较的结果一致"""
+    print("=== 测试日期索引 ===")
+    
+    base_date = datetime.datetime(2025, 5, 1)
+    document_dates = [base_date + datetime.timedelta(hours=(doc_id * 37) % 900) if doc_id % 7 else None
+                      for doc_id in range(60)]
+    date_index = DateIndex()
+    date_index.build(document_dates)
+    
+    ranges = [
+        ("2025-05-10", None, datetime.datetime(2025, 5, 10), None),
+        (None, "2025-05-20", None, datetime.datetime(2025, 5, 21) - datetime.timedelta(microseconds=1)),
+        (datetime.date(2025, 5, 5), datetime.date(2025, 5, 5),
+         datetime.datetime(2025, 5, 5), datetime.datetime(2025, 5, 6) - datetime.timedelta(microseconds=1)),
+        (datetime.datetime(2025, 5, 3, 12), "2025-05-30T06:00:00", datetime.datetime(2025, 5, 3, 12),
+         datetime.datetime(2025, 5, 30, 6)),
+        ("2025-06-01", "2025-05-01", datetime.datetime(2025, 6, 1), datetime.datetime(2025, 5, 1)),
+        (None, None, None, None),
+    ]
+    for since, until, start, end in ranges:
+        expected = {doc_id for doc_id, date in enumerate(document_dates)
+                    if date is not None and (start is None or date >= start) and (end is None or date <= end)}
+        doc_ids = date_index.get_doc_ids(since, until)
+        assert set(doc_ids.tolist()) == expected and len(doc_ids) == len(expected)
+        assert [document_dates[doc_id] for doc_id in doc_ids] == sorted(document_dates[doc_id] for doc_id in expected)
+        assert date_index.get_sorted_doc_ids(since, until).tolist() == sorted(expected)
+    print("✓ 时间范围查询与逐文档比较一致")
+    
+    # 相对时间范围以指定的当前时间为准
+    now = datetime.datetime(2025, 5, 20, 12)
+    expected = sorted(doc_id for doc_id, date in enumerate(document_dates)
+                      if date is not None and now - datetime.timedelta(days=3) <= date)
+    assert date_index.get_sorted_doc_ids(datetime.timedelta(days=3), now=now).tolist() == expected
+    print("✓ 相对时间范围使用指定的当前时间")
+    
+    try:
+        date_index.get_doc_ids("last month")
+        assert False, "无效的时间范围应抛出ValueError"
+    except ValueError:
+        print("✓ 无效的时间范围抛出ValueError")
+
+
+def test_date_range_search_scores_only_documents_in_range():
+    """测试按时间范围搜索：只返回范围内的文档，且分数等于只对范围内文档计分的结果"""
+    print("=== 测试按时间范围搜索 ===")
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        data_file = create_test_data_file(temp_dir, limit=60)
+        config = {'use_positions': True, 'snapshot_dir': os.path.join(temp_dir, 'cache')}
+        
+        engine = create_test_engine(data_file, config)
+        processor = engine.query_processor
+        documents = engine.documents
+        since, until = "2025-05-30", "2025-06-01"
+        in_range = {doc.doc_id for doc in documents if since <= doc.publish_time <= until}
+        candidate_ids = processor.date_index.get_sorted_doc_ids(since, until)
+        assert candidate_ids.tolist() == sorted(in_range)
+        in_range_mask = np.zeros(len(documents), dtype=bool)
+        in_range_mask[candidate_ids] = True
+        
+        for query in ["climate change global warming", "trump tariffs china trade", "health care"]:
+            query_tokens = processor.process_query(query)
+            
+            # BM25和TF-IDF：范围内文档的分数与不过滤时相同，范围外文档不计分
+            candidate_scores = processor.bm25_model.get_query_score_array(query_tokens, candidate_ids)
+            full_scores = processor.bm25_model.get_query_score_array(query_tokens)
+            assert np.array_equal(candidate_scores, np.where(in_range_mask, full_scores, 0.0))
+            candidate_tfidf = processor.vector_space_model.calculate_cosine_scores(query_tokens, candidate_ids)
+            full_tfidf = processor.vector_space_model.calculate_cosine_scores(query_tokens)
+            assert candidate_tfidf == np.where(in_range_mask, full_tfidf, 0.0).tolist()
+            
+            # 增强算法：融合评分与逐项计算一致，范围外文档（含时间分数）均为0
+            fused = processor._calculate_enhanced_similarities(query_tokens, candidate_ids=candidate_ids)
+            expected = processor._calculate_enhanced_similarities_by_component(query_tokens,
+                                                                               candidate_ids=candidate_ids)
+            for doc_id in range(len(documents)):
+                assert math.isclose(fused[doc_id], expected[doc_id], rel_tol=1e-12, abs_tol=1e-12)
+                if doc_id not in in_range:
+                    assert fused[doc_id] == 0.0
+            
+            for algorithm in ["tfidf", "bm25", "enhanced"]:
+                results = engine.search(query, top_k=10, algorithm=algorithm, since=since, until=until)
+                assert results and all(result.doc_id in in_range for result in results)
+                assert all(since <= result.publish_time <= until for result in results)
+            
+            bm25_results = engine.search(query, top_k=5, algorithm="bm25", since=since, until=until)
+            ranked = sorted(in_range, key=lambda doc_id: (-full_scores[doc_id], doc_id))[:5]
+            assert [result.doc_id for result in bm25_results] == [doc_id for doc_id in ranked if full_scores[doc_id] > 0]
+        print("✓ 只返回时间范围内的文档，分数与只对范围内文档计分一致")
+        
+        assert engine.search("climate change", since="2030-01-01") == []
+        assert engine.search("climate change", since="not a date") == []
+        recent = engine.search("climate change", since=datetime.timedelta(days=30))
+        assert all(result.doc_id in set(processor.date_index.get_doc_ids(datetime.timedelta(days=30)).tolist())
+                   for result in recent)
+        print("✓ 空范围和无效范围返回空结果")
+        
+        restored = EnhancedSearchEngine(data_file, config)
+        assert restored.initialize() and restored.loaded_from_snapshot
+        expected_results = [(r.doc_id, r.similarity) for r in engine.search("trade", since=since, until=until)]
+        assert [(r.doc_id, r.similarity) for r in restored.search("trade", since=since, until=until)] == expected_results
+        print("✓ 从索引快照恢复后日期索引可用")
+        
+        # 固定时间评分的当前日期后，"最近N天"以该日期为准，与时间新鲜度一致
+        processor.temporal_scorer.set_parameters(current_date=datetime.datetime(2025, 6, 1, 12))
+        recent = engine.search("trade", top_k=len(documents), since=datetime.timedelta(days=2))
+        expected = {doc.doc_id for doc in documents if doc.publish_time >= "2025-05-30T12"}
+        assert recent and {result.doc_id for result in recent} <= expected
+        assert processor.date_index.get_sorted_doc_ids(
+            datetime.timedelta(days=2), now=processor.temporal_scorer.get_reference_date()).tolist() == sorted(expected)
+        print("✓ 相对时间范围以时间评分的当前日期为准")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    test_sparse_vsm_matches_dense()
+    test_bm25_postings_scoring_matches_exhaustive()
+    test_bm25_search_matches_full_sort()
+    test_top_k_selection_matches_full_ranking()
+    test_phrase_and_near_search_match_brute_force()
+    test_positional_queries_in_search_engine()
+    test_term_dictionary_matches_per_field_models()
+    test_fused_enhanced_scoring_matches_component_scoring()
+    test_search_result_details_from_scoring_context()
+    test_multi_field_tfidf_postings_match_per_document_scoring()
+    test_bm25f_matches_brute_force_formula()
+    test_bm25f_in_search_engine()
+    test_temporal_score_array_matches_per_document_scores()
+    test_fast_date_parsing_matches_dateutil()
+    test_date_index_matches_brute_force_filter()
+    test_date_range_search_scores_only_documents_in_range()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动测试：验证命令行入口延迟导入重量级依赖，以及启动耗时统计
+"""
+
+import sys
+import os
+import json
+import shutil
+import tempfile
+import subprocess
+sys.path.append('src')
+
+
+def _imported_modules(code: str):
+    """在新的解释器中执行代码，返回执行后已导入的模块名"""
+    output = subprocess.run([sys.executable, '-c', code + '\nimport sys; print(" ".join(sys.modules))'],
+                            capture_output=True, text=True, check=True).stdout
+    return set(output.splitlines()[-1].split())
+
+
+def test_cli_defers_heavy_imports():
+    """测试导入main模块时不加载NLTK、numpy、pandas和dateutil"""
+    print("=== 测试延迟导入 ===")
+    
+    modules = _imported_modules("import main")
+    for heavy in ['nltk', 'numpy', 'pandas', 'dateutil', 'src.retrieval.search_engine']:
+        assert heavy not in modules, heavy
+    
+    # 正则分词模式下创建文本处理器和处理文本都不需要NLTK
+    modules = _imported_modules("from src.preprocessing.text_processor import TextProcessor\n"
+                                "TextProcessor('regex').tokenize('Hello, world')")
+    assert 'nltk' not in modules
+    print("✓ 命令行入口未导入重量级依赖")
+
+
+def test_snapshot_startup_defers_nltk():
+    """测试默认分词配置下从索引快照启动时不导入NLTK，第一次查询时才加载"""
+    print("=== 测试快照启动延迟加载NLTK ===")
+    
+    from src.retrieval.search_engine import EnhancedSearchEngine
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        with open('data/npr_articles.json', 'r', encoding='utf-8') as f:
+            articles = json.load(f)[:20]
+        data_file = os.path.join(temp_dir, 'articles.json')
+        with open(data_file, 'w', encoding='utf-8') as f:
+            json.dump(articles, f, ensure_ascii=False)
+        config = {'snapshot_dir': os.path.join(temp_dir, 'cache')}
+        assert EnhancedSearchEngine(data_file, config).initialize()
+        
+        startup = (f"from src.retrieval.search_engine import EnhancedSearchEngine\n"
+                   f"engine = EnhancedSearchEngine({data_file!r}, {config!r})\n"
+                   f"assert engine.initialize() and engine.loaded_from_snapshot")
+        assert 'nltk' not in _imported_modules(startup)
+        assert 'nltk' in _imported_modules(startup + "\nengine.search('climate change')")
+        print("✓ 从快照启动未导入NLTK，第一次查询时加载")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_import_time_profiler():
+    """测试导入耗时统计：记录嵌套导入，自身耗时与子模块耗时之和等于累计耗时"""
+    print("=== 测试导入耗时统计 ===")
+    
+    from main import ImportTimeProfiler
+    for name in [name for name in sys.modules if name == 'xml.dom' or name.startswith('xml.dom.')]:
+        del sys.modules[name]
+    
+    profiler = ImportTimeProfiler()
+    profiler.install()
+    try:
+        import xml.dom.minidom
+    finally:
+        profiler.uninstall()
+    assert profiler not in sys.meta_path
+    
+    records = {name: (self_us, cumulative_us, depth) for name, self_us, cumulative_us, depth in profiler.records}
+    assert 'xml.dom.minidom' in records and 'xml.dom' in records
+    
+    # 每个模块的累计耗时 = 自身耗时 + 直接子模块的累计耗时
+    stack = []
+    for name, self_us, cumulative_us, depth in profiler.records:
+        children = [record for record in stack if record[3] == depth + 1]
+        stack = [record for record in stack if record[3] <= depth]
+        assert abs(cumulative_us - self_us - sum(record[2] for record in children)) < 1e-6
+        assert self_us >= 0
+        stack.append((name, self_us, cumulative_us, depth))
+    profiler.print_report(min_cumulative_ms=0)
+    print("✓ 导入耗时统计正确")
+
+
+if __name__ == "__main__":
+    test_cli_defers_heavy_imports()
+    test_snapshot_startup_defers_nltk()
+    test_import_time_profiler()